@@ -0,0 +1,204 @@
+"""asyncio SSH Client to handle connections to Jump Server and remote host,
+and run commands on a remote host without blocking the event loop.
+"""
+from __future__ import annotations
+
+import asyncio
+from typing import AsyncIterator, TYPE_CHECKING, Union
+
+from logger import logger
+from sshconfig import SSHConfigResolver, default_resolver
+from utils import lazy_import
+
+if TYPE_CHECKING:
+    import asyncssh
+
+# asyncssh is only required once a session is connected
+asyncssh = lazy_import('asyncssh')
+exception = lazy_import('jumpssh.exception')
+jumpssh_session = lazy_import('jumpssh.session')
+
+
+class AsyncRemoteClient:
+    """asyncio SSH client to interact with a remote host via a jump server
+
+    Mirrors the `RemoteClient` surface with coroutines built on `asyncssh`.
+
+    :param jump_session: jump server `asyncssh.SSHClientConnection`
+    :param remote_session: remote host `asyncssh.SSHClientConnection`
+    :param max_concurrency: maximum number of commands in flight at once
+        across all sessions of this client
+    :param ssh_config: a `SSHConfigResolver`, default resolves `setting.cfg`
+        merged with `~/.ssh/config`
+    :param remote_user: a `str` user logging in the remote hosts
+    """
+
+    def __init__(self, max_concurrency: int=1000,
+                 ssh_config: Union[SSHConfigResolver, None]=None,
+                 remote_user: str='root'):
+        self.jump_session = None
+        self.remote_session = None
+        self.ssh_config = ssh_config if ssh_config is not None else default_resolver
+        self.remote_user = remote_user
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    def get_ssh_config(self, host: str) -> Union[dict, None]:
+        """Get SSH config, same as `RemoteClient.get_ssh_config`"""
+        return self.ssh_config.connect_config(host)
+
+    async def connect_jump_session(
+            self, jump_host: str) -> Union[asyncssh.SSHClientConnection, None]:
+        """Connect a SSH connection to jump server
+
+        :param jump_host: a `str` jump server host
+        :return: a `asyncssh.SSHClientConnection` or `None` if failed to
+            connect SSH to the jump server.
+        """
+        # Get SSH config from setting.cfg
+        ssh_config = self.get_ssh_config(host=jump_host)
+
+        if not ssh_config:
+            return None
+
+        try:
+            logger.info(
+                f"Connecting SSH session to - {ssh_config['user']}@{jump_host}")
+            self.jump_session = await asyncssh.connect(
+                ssh_config['hostname'],
+                port=int(ssh_config['port']),
+                username=ssh_config['user'],
+                client_keys=ssh_config['identityfile'],
+                known_hosts=None
+                )
+            logger.info(f'Successful connected to jump host - {jump_host}')
+            return self.jump_session
+        except (OSError, asyncssh.Error) as err:
+            logger.error(err)
+        return None
+
+    async def connect_remote_session(
+            self,
+            jump_session: asyncssh.SSHClientConnection,
+            remote_host: str
+            ) -> Union[asyncssh.SSHClientConnection, None]:
+        """Open SSH connection to remote session from jump server
+
+        :param jump_session: jump server `asyncssh.SSHClientConnection`
+        :param remote_host: a remote host IP address
+        :return: a `asyncssh.SSHClientConnection` or `None` if failed to
+            connect SSH to the remote host.
+        """
+        if jump_session:
+            try:
+                logger.info(
+                    f'Connecting SSH session to remote host - {remote_host}')
+                self.remote_session = await asyncssh.connect(
+                    remote_host,
+                    username=self.remote_user,
+                    tunnel=jump_session,
+                    known_hosts=None
+                    )
+                logger.info(f'Successful connected to remote host - {remote_host}')
+                return self.remote_session
+            except (OSError, asyncssh.Error) as err:
+                logger.error(err)
+        return None
+
+    async def run_cmd(
+            self,
+            ssh_session: asyncssh.SSHClientConnection,
+            commands: list,
+            logging=False,
+            raise_if_error=True,
+            timeout=None
+            ) -> list:
+        """Run a specific or multiple commands from SSH session
+
+        Commands of one call run in order; concurrent calls are bounded by
+        the client's `max_concurrency`.
+
+        :param ssh_session: a `asyncssh.SSHClientConnection`
+        :param commands: a `list` of commands
+        :param logging: if `True`, logging command's error/info
+        :param raise_if_error: if `True`, a non-zero exit code is returned as
+            a `RunCmdError` instead of a `RunCmdResult`
+        :param timeout: length in seconds allowed for each command
+        :return: a `list` of RunCmdResult/RunCmdError, same as `RemoteClient.run_cmd`
+        """
+        outputs = []
+        for cmd in commands:
+            try:
+                if logging:
+                    logger.info(f'Executing command: {cmd}')
+
+                async with self._semaphore:
+                    async with ssh_session.create_process(
+                            cmd, stderr=asyncssh.STDOUT) as process:
+                        result = await process.wait(timeout=timeout)
+
+                output = (result.stdout or '').strip()
+                if result.exit_status != 0 and raise_if_error:
+                    raise exception.RunCmdError(
+                        exit_code=result.exit_status,
+                        success_exit_code=[0],
+                        command=cmd,
+                        error=output
+                        )
+                outputs.append(jumpssh_session.RunCmdResult(
+                    exit_code=result.exit_status,
+                    output=output,
+                    result_list=[],
+                    command=cmd,
+                    success_exit_code=[0],
+                    runs_nb=1
+                    ))
+            except asyncssh.TimeoutError:
+                logger.error(f"Timeout of {timeout}s reached when calling command '{cmd}'")
+                break
+            except (OSError, asyncssh.Error) as err:
+                logger.error(str(err))
+                break
+            except exception.RunCmdError as err:
+                if logging:
+                    logger.error(
+                        f"Command '{err.command}' returned exit status ({err.exit_code}), "
+                        f"expected {err.success_exit_code}: {err.error}"
+                        )
+                outputs.append(err)
+        return outputs
+
+    async def stream_cmd(
+            self,
+            ssh_session: asyncssh.SSHClientConnection,
+            cmd: str
+            ) -> AsyncIterator[str]:
+        """Stream the output lines of a command as they arrive
+
+        The remote channel is closed once the output ends or the consuming
+        task is cancelled. A loop left early with `break` only closes it when
+        the generator is closed, wrap it in `contextlib.aclosing` to close it
+        at once. The command holds a `max_concurrency` slot until then.
+
+        :param ssh_session: a `asyncssh.SSHClientConnection`
+        :param cmd: a `str` command
+        :return: an async iterator of `str` output lines
+
+        :Example:
+
+            async with aclosing(client.stream_cmd(remote_session, 'tail -f /var/log/messages')) as lines:
+                async for line in lines:
+                    if 'ERROR' in line:
+                        break
+        """
+        async with self._semaphore:
+            async with ssh_session.create_process(
+                    cmd, stderr=asyncssh.STDOUT) as process:
+                async for line in process.stdout:
+                    yield line
+
+    async def disconnect(self, ssh_session: asyncssh.SSHClientConnection):
+        """Disconnect SSH session"""
+        if ssh_session:
+            logger.info(f'Disconnecting {ssh_session}')
+            ssh_session.close()
+            await ssh_session.wait_closed()
@@ -0,0 +1,505 @@
+"""Benchmark suite for the RemoteClient, Validator and TextFormatter hot paths
+and the import time of the modules
+
+The SSH benchmarks run against a local stand-in SSH server started in-process,
+the remote host hop is tunneled through the same server. Results are written
+as JSON and can be compared against a stored baseline.
+
+Usage:
+    python benchmark.py --output bench.json
+    python benchmark.py --suite micro --save-baseline bench_baseline.json
+    python benchmark.py --baseline bench_baseline.json --threshold 0.2
+    python benchmark.py --sizes 1K,1M,100M,1G
+    python benchmark.py --suite import --baseline bench_baseline.json
+"""
+import argparse
+import json
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import timeit
+
+import paramiko
+
+from utils import TextFormatter, Validator, is_ip_addr, is_number
+
+
+SIZE_UNITS = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+
+# Modules imported by short-lived CLI invocations
+STARTUP_MODULES = ['utils', 'cli', 'logger', 'remoteclient']
+
+
+def parse_size(size: str) -> int:
+    """Convert a `str` size like `1K`, `10M` or `1G` to a number of bytes"""
+    unit = size[-1].upper()
+    if unit in SIZE_UNITS:
+        return int(size[:-1]) * SIZE_UNITS[unit]
+    return int(size)
+
+
+def summarize(samples: list) -> dict:
+    """Summarize timing samples in seconds, lower is better"""
+    samples = sorted(samples)
+    return {
+        'median': statistics.median(samples),
+        'mean': statistics.fmean(samples),
+        'min': samples[0],
+        'p95': samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+        'n': len(samples),
+        }
+
+
+def measure(func, repeat: int) -> dict:
+    """Time `repeat` calls of `func`"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+def micro(func, number: int=10000, repeat: int=5) -> dict:
+    """Time a fast call, the samples are seconds per call"""
+    timer = timeit.Timer(func)
+    return summarize([total / number for total in timer.repeat(repeat, number)])
+
+
+class StandInInterface(paramiko.ServerInterface):
+    """Accept every key, session, pty, exec and tunnel request"""
+
+    def __init__(self):
+        self.tunnels = set()
+        # Like sshd, the error of a command is only merged on a pty
+        self.ptys = set()
+        # Commands started once their request is acknowledged, see `start`
+        self.pending = []
+        self.start_at_once = False
+
+    def get_allowed_auths(self, username):
+        return 'publickey'
+
+    def check_auth_publickey(self, username, key):
+        return paramiko.AUTH_SUCCESSFUL
+
+    def check_channel_request(self, kind, chanid):
+        if kind == 'session':
+            return paramiko.OPEN_SUCCEEDED
+        return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+    def check_channel_direct_tcpip_request(self, chanid, origin, destination):
+        self.tunnels.add(chanid)
+        return paramiko.OPEN_SUCCEEDED
+
+    def check_channel_pty_request(self, channel, *args):
+        self.ptys.add(channel.get_id())
+        return True
+
+    def check_channel_exec_request(self, channel, command):
+        self.pending.append((channel, command.decode(), channel.get_id() in self.ptys))
+        if self.start_at_once:
+            self.start()
+        return True
+
+    def start(self):
+        """Start the pending commands, a fast command would otherwise close
+        its channel before the request is acknowledged"""
+        while self.pending:
+            threading.Thread(target=self._exec, args=self.pending.pop(),
+                             daemon=True).start()
+
+    @staticmethod
+    def _exec(channel, command: str, pty: bool):
+        """Run a command with the local shell and stream its output"""
+        with subprocess.Popen(command, shell=True, stdin=subprocess.PIPE,
+                              stdout=subprocess.PIPE,
+                              stderr=subprocess.STDOUT if pty else subprocess.PIPE
+                              ) as process:
+            def send_input():
+                try:
+                    while data := channel.recv(65536):
+                        process.stdin.write(data)
+                        process.stdin.flush()
+                    process.stdin.close()
+                except (EOFError, OSError, ValueError, paramiko.SSHException):
+                    # The command exited or the client went away
+                    pass
+
+            threading.Thread(target=send_input, daemon=True).start()
+
+            def send_error():
+                try:
+                    channel.sendall_stderr(process.stderr.read())
+                except (EOFError, OSError, paramiko.SSHException):
+                    pass
+
+            error = None
+            if not pty:
+                error = threading.Thread(target=send_error, daemon=True)
+                error.start()
+            try:
+                while data := process.stdout.read1(65536):
+                    channel.sendall(data)
+                if error is not None:
+                    error.join()
+                channel.send_exit_status(process.wait())
+            except (EOFError, OSError, paramiko.SSHException):
+                # The client went away
+                process.kill()
+        channel.close()
+
+
+class StandInSFTPServer(paramiko.SFTPServerInterface):
+    """Serve the local filesystem over SFTP"""
+
+    def canonicalize(self, path):
+        return os.path.realpath(path)
+
+    def stat(self, path):
+        try:
+            return paramiko.SFTPAttributes.from_stat(os.stat(path))
+        except OSError as err:
+            return paramiko.SFTPServer.convert_errno(err.errno)
+
+    def lstat(self, path):
+        try:
+            return paramiko.SFTPAttributes.from_stat(os.lstat(path))
+        except OSError as err:
+            return paramiko.SFTPServer.convert_errno(err.errno)
+
+    def open(self, path, flags, attr):
+        if flags & os.O_WRONLY:
+            mode = 'ab' if flags & os.O_APPEND else 'wb'
+        elif flags & os.O_RDWR:
+            mode = 'a+b' if flags & os.O_APPEND else 'r+b'
+        else:
+            mode = 'rb'
+        try:
+            _file = os.fdopen(os.open(path, flags, 0o644), mode)
+        except OSError as err:
+            return paramiko.SFTPServer.convert_errno(err.errno)
+        handle = paramiko.SFTPHandle(flags)
+        handle.filename = path
+        handle.readfile = handle.writefile = _file
+        return handle
+
+    def remove(self, path):
+        try:
+            os.remove(path)
+        except OSError as err:
+            return paramiko.SFTPServer.convert_errno(err.errno)
+        return paramiko.SFTP_OK
+
+
+class StandInSSHServer:
+    """In-process SSH server executing commands with the local shell and
+    serving the local filesystem over SFTP
+
+    Any public key is accepted and every `direct-tcpip` tunnel is connected
+    back to this server, so it stands in for both the jump server and the
+    remote hosts.
+    """
+
+    def __init__(self):
+        self.host_key = paramiko.RSAKey.generate(2048)
+        self._sock = socket.create_server(('127.0.0.1', 0))
+        self.port = self._sock.getsockname()[1]
+        self._transports = []
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    def close(self):
+        """Stop accepting connections and close all transports"""
+        self._sock.close()
+        for transport in self._transports:
+            transport.close()
+
+    def _serve(self):
+        while True:
+            try:
+                client_sock, _ = self._sock.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._handle, args=(client_sock,),
+                             daemon=True).start()
+
+    def _handle(self, client_sock):
+        # Like sshd, do not delay small packets
+        client_sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        interface = StandInInterface()
+        transport = paramiko.Transport(client_sock)
+        transport.add_server_key(self.host_key)
+        transport.set_subsystem_handler('sftp', paramiko.SFTPServer, StandInSFTPServer)
+        # paramiko has no public hook run after a channel request is
+        # acknowledged. The reply goes through the private
+        # `Transport._send_user_message` (paramiko 2.x to 5.x), wrapped to
+        # start the pending commands once it is sent. Without it the commands
+        # start at once and a fast one may close its channel first.
+        send = getattr(transport, '_send_user_message', None)
+        if send is None:
+            interface.start_at_once = True
+        else:
+            def send_then_start(message):
+                send(message)
+                # The transport thread replies to a request right after checking it
+                if threading.current_thread() is transport:
+                    interface.start()
+
+            transport._send_user_message = send_then_start
+        self._transports.append(transport)
+        transport.start_server(server=interface)
+        # paramiko closes an unreferenced channel, keep the sessions until
+        # their command is done
+        sessions = []
+        while transport.is_active():
+            channel = transport.accept(timeout=1)
+            if channel is None:
+                continue
+            if channel.get_id() in interface.tunnels:
+                threading.Thread(target=self._forward, args=(channel,),
+                                 daemon=True).start()
+            else:
+                sessions = [session for session in sessions if not session.closed]
+                sessions.append(channel)
+
+    def _forward(self, channel):
+        """Pipe a tunnel channel to a new connection to this server"""
+        upstream = socket.create_connection(('127.0.0.1', self.port))
+        upstream.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        def pipe(read, write):
+            try:
+                while data := read(65536):
+                    write(data)
+            except OSError:
+                pass
+            upstream.close()
+            try:
+                channel.close()
+            except EOFError:
+                # The client connection is already closed
+                pass
+
+        threading.Thread(target=pipe, args=(upstream.recv, channel.sendall),
+                         daemon=True).start()
+        pipe(channel.recv, upstream.sendall)
+
+
+def bench_micro() -> dict:
+    """Microbenchmarks of the Validator and TextFormatter hot paths"""
+    valid_values = [f'site-{i}' for i in range(1000)]
+    addresses = [f'10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}' for i in range(10000)]
+
+    enabled = TextFormatter.enabled
+    try:
+        TextFormatter.set_color(False)
+        no_color = micro(lambda: TextFormatter.format('menu', 'underline'))
+        TextFormatter.set_color(True)
+        results = {
+            'text_formatter_format': micro(
+                lambda: TextFormatter.format('menu', 'underline')),
+            'text_formatter_combined': micro(
+                lambda: TextFormatter.format('menu', 'bold+red')),
+            }
+    finally:
+        TextFormatter.set_color(enabled)
+    return {
+        'validate_ipv4': micro(lambda: Validator.validate('10.20.30.40', 'ipv4')),
+        'validate_ipv6': micro(lambda: Validator.validate('2001:db8::1', 'ipv6')),
+        'validate_integer': micro(lambda: Validator.validate('12345', 'integer')),
+        'validate_input_1k': micro(lambda: Validator.validate(
+            'site-999', 'input', valid_values=valid_values)),
+        'validate_many_ipv4_10k': micro(
+            lambda: Validator.validate_many(addresses, 'ipv4'), number=10),
+        'is_ip_addr': micro(lambda: is_ip_addr('192.168.1.1')),
+        'is_number': micro(lambda: is_number('3.14', 'float')),
+        **results,
+        'text_formatter_no_color': no_color,
+        }
+
+
+def bench_ssh(sizes: list, repeat: int) -> dict:
+    """Benchmarks of the RemoteClient against a local stand-in SSH server"""
+    from logger import logger
+    from remoteclient import RemoteClient
+    from sessionpool import SessionPool
+    from sshconfig import SSHConfigResolver
+
+    # Keep the benchmark output clean
+    logger.remove()
+
+    server = StandInSSHServer()
+    results = {}
+    with tempfile.TemporaryDirectory() as home:
+        # The remote hop authenticates with the default key of ~/.ssh
+        os.makedirs(os.path.join(home, '.ssh'))
+        key_file = os.path.join(home, '.ssh', 'id_rsa')
+        paramiko.RSAKey.generate(2048).write_private_key_file(key_file)
+        config_file = os.path.join(home, 'setting.cfg')
+        with open(config_file, 'w') as _file:
+            _file.write(f'User bench\nIdentityFile {key_file}\nPort {server.port}\n')
+        previous_home = os.environ.get('HOME')
+        os.environ['HOME'] = home
+
+        host = '127.0.0.1'
+        ssh_config = SSHConfigResolver(paths=[config_file])
+        try:
+            def handshake_jump():
+                client = RemoteClient(pool=SessionPool(), ssh_config=ssh_config)
+                client.disconnect(client.connect_jump_session(host))
+
+            results['connect_jump_session'] = measure(handshake_jump, repeat)
+
+            client = RemoteClient(pool=SessionPool(), ssh_config=ssh_config)
+            jump_session = client.connect_jump_session(host)
+
+            def handshake_remote():
+                handshake_client = RemoteClient(
+                    pool=SessionPool(), ssh_config=ssh_config)
+                remote_session = handshake_client.connect_remote_session(
+                    jump_session, host)
+                handshake_client.disconnect(remote_session)
+                jump_session.ssh_remote_sessions.clear()
+
+            results['connect_remote_session'] = measure(handshake_remote, repeat)
+
+            remote_session = client.connect_remote_session(jump_session, host)
+            results['run_cmd_latency'] = measure(
+                lambda: client.run_cmd(remote_session, ['true']), repeat * 5)
+
+            for concurrency in (1, 10, 100):
+                commands = ['echo ok'] * concurrency
+                results[f'run_cmd_concurrent_{concurrency}'] = measure(
+                    lambda commands=commands, concurrency=concurrency:
+                        client.run_cmd_pipelined(
+                            remote_session, commands, max_channels=concurrency),
+                    repeat)
+
+            for size in sizes:
+                def drain(size=size):
+                    client.stream_cmd(remote_session, f'head -c {parse_size(size)} /dev/zero',
+                                      sink=lambda chunk: None, encoding=None)
+
+                results[f'output_{size}'] = measure(drain, max(1, repeat // 2))
+
+            # Compressible text output, raw and gzip compressed on the remote side
+            for size in sizes:
+                cmd = f'yes 2024-01-01T00:00:00 kernel: link up | head -c {parse_size(size)}'
+                for codec in (None, 'gzip'):
+                    def drain_text(cmd=cmd, codec=codec):
+                        client.stream_cmd(remote_session, cmd, sink=lambda chunk: None,
+                                          encoding=None, codec=codec)
+
+                    name = f'output_text_{size}' + (f'_{codec}' if codec else '')
+                    results[name] = measure(drain_text, max(1, repeat // 2))
+
+            client.pool.clear()
+        finally:
+            if previous_home is None:
+                del os.environ['HOME']
+            else:
+                os.environ['HOME'] = previous_home
+            server.close()
+    return results
+
+
+def import_time(module: str) -> float:
+    """Get the cumulative import time of a module in a fresh interpreter
+
+    :return: seconds reported by `python -X importtime`
+    """
+    process = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True, text=True, check=True)
+    for line in reversed(process.stderr.splitlines()):
+        # import time: self [us] | cumulative | imported package
+        fields = [field.strip() for field in line.split('|')]
+        if len(fields) == 3 and fields[2] == module:
+            return int(fields[1]) / 1e6
+    raise ValueError(f'No import time reported for {module}')
+
+
+def bench_import(repeat: int) -> dict:
+    """Import time of the modules used by short-lived CLI invocations"""
+    return {f'import_{module}': summarize([import_time(module) for _ in range(repeat)])
+            for module in STARTUP_MODULES}
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """Compare the median of each benchmark with a baseline
+
+    :return: a `list` of `str` regressions slower than `1 + threshold` times
+        the baseline median
+    """
+    regressions = []
+    for name, current in results['benchmarks'].items():
+        previous = baseline.get('benchmarks', {}).get(name)
+        if not previous:
+            continue
+        ratio = current['median'] / previous['median']
+        current['baseline_ratio'] = ratio
+        if ratio > 1 + threshold:
+            regressions.append(
+                f'{name}: {current["median"]:.6g}s vs baseline '
+                f'{previous["median"]:.6g}s ({ratio:.2f}x)')
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--suite', choices=['all', 'micro', 'import', 'ssh'], default='all')
+    parser.add_argument('--sizes', default='1K,1M,100M',
+                        help='comma separated output sizes, e.g. 1K,1M,1G')
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--output', help='JSON result file, default is stdout')
+    parser.add_argument('--baseline', help='JSON baseline file to compare with')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='allowed slowdown ratio over the baseline')
+    parser.add_argument('--save-baseline', help='save the results as a baseline')
+    args = parser.parse_args(argv)
+
+    benchmarks = {}
+    if args.suite in ('all', 'micro'):
+        benchmarks.update(bench_micro())
+    if args.suite in ('all', 'import'):
+        benchmarks.update(bench_import(args.repeat))
+    if args.suite in ('all', 'ssh'):
+        benchmarks.update(bench_ssh(args.sizes.split(','), args.repeat))
+
+    results = {
+        'python': platform.python_version(),
+        'paramiko': paramiko.__version__,
+        'platform': platform.platform(),
+        'benchmarks': benchmarks,
+        }
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, 'r') as _file:
+            regressions = compare(results, json.load(_file), args.threshold)
+        results['regressions'] = regressions
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as _file:
+            _file.write(output)
+    else:
+        print(output)
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as _file:
+            _file.write(output)
+
+    for regression in regressions:
+        print(f'REGRESSION {regression}', file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
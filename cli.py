@@ -1,7 +1,11 @@
 """Command Line Input module"""
-from typing import Union, Literal, NamedTuple
+import csv
+import json
+import shlex
+import sys
+from typing import Callable, Iterable, Union, Literal, NamedTuple
 
-from utils import TextFormatter, Validator
+from utils import TextFormatter, Validator, ValueIndex
 
 
 class PromptMenu(NamedTuple):
@@ -21,7 +25,10 @@ class PromptInput(NamedTuple):
     :param datatype: input data types
     :param description: a `str`input description
     :param input_type: a `str` input type, default='info'
-    :param valid_values: a list of valid values used with 'input' datatype
+    :param valid_values: a list of valid values used with 'input' datatype,
+        or a `ValueIndex` for large lists. The list is indexed the first time
+        it is prompted and must not be modified afterwards, assign a new list
+        instead.
     """
     message: str
     datatype: Literal['int', 'ip', 'ipv4', 'ipv6', 'input']
@@ -30,19 +37,106 @@ class PromptInput(NamedTuple):
     input_type: Literal['info', 'warning']='info'
 
 
+class BatchRow(NamedTuple):
+    """BatchRow `namedtuple` class of a valid batch row
+
+    :param line: a row number of the batch, starting at 1
+    :param cmd: a `str` menu command
+    :param inputs: a `list` of `str` inputs of the command's prompts
+    """
+    line: int
+    cmd: str
+    inputs: list
+
+
+class BatchError(NamedTuple):
+    """BatchError `namedtuple` class of an invalid batch row
+
+    :param line: a row number of the batch, starting at 1
+    :param field: `cmd` for an invalid command or malformed row, the
+        `PromptInput` message of the invalid input, or `handler` if the row
+        handler raised an exception
+    :param message: a `str` error message
+    """
+    line: int
+    field: str
+    message: str
+
+
+class BatchResult(NamedTuple):
+    """BatchResult `namedtuple` class returned by the batch methods
+
+    :param rows: a `list` of valid `BatchRow`
+    :param errors: a `list` of `BatchError` sorted by row
+    """
+    rows: list
+    errors: list
+
+    @property
+    def failed(self) -> bool:
+        """`True` if any row is invalid or failed"""
+        return bool(self.errors)
+
+
 class InteractiveCli:
     """Interactive CLI to get the user's input via STDIN
 
     :param title: a `str` menu title
     :param menu: a `list` of menu items with data type of
-        `namedtuple` PromptMenu class
+        `namedtuple` PromptMenu class, stored as a `tuple`. Assign a new list
+        to `menu` to change the items.
     :param prompt_message: a `str` menu's prompt message
+    :param page_size: maximum number of menu items displayed at once. Larger
+        menus are paginated with the navigation commands:
+            - n: next page
+            - p: previous page
+            - /text: only display the items containing `text`, `/` to clear
     """
 
-    def __init__(self, title: str, menu: list, prompt_message: str):
+    def __init__(self, title: str, menu: list, prompt_message: str,
+                 page_size: Union[int, None]=None):
         self.title = title
         self.menu = menu
         self.prompt_message = prompt_message
+        self.page_size = page_size
+        # id(valid_values) -> (valid_values, ValueIndex)
+        self._value_indexes = {}
+        # (filter text, filtered menu items) of the last filter
+        self._filtered = ('', None)
+
+    @property
+    def menu(self) -> tuple:
+        """a `tuple` of menu items, the command index is rebuilt when it is set"""
+        return self._menu
+
+    @menu.setter
+    def menu(self, menu: Iterable):
+        self._menu = tuple(menu)
+        self._menu_index = ValueIndex(menu_item.cmd for menu_item in self._menu)
+        self._filtered = ('', None)
+
+    def complete_command(self, prefix: str) -> list:
+        """Get the menu commands starting with `prefix` for tab-completion
+
+        :param prefix: a `str` prefix entered by the user
+        :return: a sorted `list` of `str` commands
+        """
+        return self._menu_index.complete(prefix)
+
+    def _value_index(self, valid_values: Union[list, ValueIndex]) -> ValueIndex:
+        """Get the `ValueIndex` of a PromptInput's valid values, built once
+
+        The index is keyed by the identity of the list, which is not checked
+        for changes, see `PromptInput`.
+        """
+        if isinstance(valid_values, ValueIndex):
+            return valid_values
+        cached = self._value_indexes.get(id(valid_values))
+        # The list keeps its id reserved while it is cached
+        if cached is None:
+            cached = (valid_values, ValueIndex(valid_values))
+            self._value_indexes[id(valid_values)] = cached
+        return cached[1]
 
     def prompt_menu(self):
         """Display a list of menu and prompt user to enter a menu command
@@ -54,23 +148,103 @@ class InteractiveCli:
         # - r: return to previous menu
         # - q: quit the application
 
+        page = 0
+        filter_text = ''
+        redraw = True
+        error_lines = 0
+
         # Print out the menu until a valid command is entered
         while True:
-            # Print menu title
-            print(f"\n{'':2}{TextFormatter.format(self.title, 'green')}\n")
+            if redraw:
+                items = self.filter_menu(filter_text)
+                pages = self._page_count(items)
+                page = max(0, min(page, pages - 1))
+                _write(self.render_menu(items, page, filter_text))
+                redraw = False
+                error_lines = 0
 
-            # Print out the menu's commands
-            for item in self.menu:
-                if item.cmd == 'q':
-                    print(f"\n{'':2}{TextFormatter.format('Exit', 'green')}\n")
-                print(f"{'':6}{item.cmd:4}{item.message}")
+            prompt = TextFormatter.format(self.prompt_message + ': ', 'bold')
+            command = input(f"\n{prompt}")
+            stripped = command.strip()
 
-            command = input(f"\n{TextFormatter.format(self.prompt_message + ': ', 'bold')}")
+            # Navigation commands, unless the menu defines the same commands
+            if pages > 1 or filter_text:
+                if stripped in ('n', 'p') and stripped not in self._menu_index:
+                    page += 1 if stripped == 'n' else -1
+                    redraw = True
+                    continue
+                if stripped.startswith('/') and stripped not in self._menu_index:
+                    filter_text = stripped[1:]
+                    page = 0
+                    redraw = True
+                    continue
 
             try:
                 return self.validate_command(command)
             except ValueError as err:
-                print(TextFormatter.format(str(err), 'red'))
+                # Only redraw the prompt and error below the menu: move up to
+                # the previous prompt line, clear it and everything below,
+                # then rewrite the prompt with the command just entered
+                message = str(err)
+                if error_lines and sys.stdout.isatty():
+                    _write(f'\033[{error_lines + 3}F\033[J{prompt}{command}\n')
+                _write(TextFormatter.format(message, 'red') + '\n')
+                error_lines = message.count('\n') + 1
+
+    def filter_menu(self, filter_text: str) -> list:
+        """Get the menu items whose command or message contains `filter_text`
+
+        Filtering is incremental: a filter extending the previous one only
+        scans the previously filtered items.
+
+        :param filter_text: a `str` case-insensitive filter, `''` for all items
+        :return: a `list` of `PromptMenu`, the menu `tuple` for `''`
+        """
+        if not filter_text:
+            return self.menu
+        previous_text, previous_items = self._filtered
+        needle = filter_text.lower()
+        candidates = previous_items if (
+            previous_items is not None and previous_text
+            and needle.startswith(previous_text.lower())) else self.menu
+        items = [item for item in candidates
+                 if needle in item.cmd.lower() or needle in item.message.lower()]
+        self._filtered = (filter_text, items)
+        return items
+
+    def render_menu(self, items: Union[list, None]=None, page: int=0,
+                    filter_text: str='') -> str:
+        """Render the menu frame in one string
+
+        :param items: a `list` of `PromptMenu` to render, default is the menu
+        :param page: the page displayed when the menu is paginated
+        :param filter_text: the current filter, displayed in the footer
+        :return: the `str` frame
+        """
+        items = self.menu if items is None else items
+        pages = self._page_count(items)
+        if pages > 1:
+            items = items[page * self.page_size:(page + 1) * self.page_size]
+
+        exit_header = f"\n{'':2}{TextFormatter.format('Exit', 'green')}\n\n"
+        lines = [f"\n{'':2}{TextFormatter.format(self.title, 'green')}\n\n"]
+        for item in items:
+            if item.cmd == 'q':
+                lines.append(exit_header)
+            lines.append(f"{'':6}{item.cmd:4}{item.message}\n")
+
+        if pages > 1 or filter_text:
+            footer = f'Page {page + 1}/{pages} - n: next, p: previous, /text: filter'
+            if filter_text:
+                footer += f" (filter '{filter_text}', / to clear)"
+            lines.append(f"\n{'':2}{TextFormatter.format(footer, 'darkcyan')}\n")
+        return ''.join(lines)
+
+    def _page_count(self, items: list) -> int:
+        """Get the number of pages needed to display `items`"""
+        if not self.page_size:
+            return 1
+        return max(1, -(-len(items) // self.page_size))
 
     def prompt_inputs(
             self,
@@ -120,7 +294,7 @@ class InteractiveCli:
                         inputs.append(Validator.validate(
                             data=_input,
                             datatype=prompt.datatype,
-                            valid_values=prompt.valid_values
+                            valid_values=self._value_index(prompt.valid_values)
                             ))
                     else:
                         inputs.append(Validator.validate(_input, prompt.datatype))
@@ -132,6 +306,121 @@ class InteractiveCli:
                 return None
         return inputs
 
+    def validate_batch(self, batch: Union[str, Iterable],
+                       prompts: Union[dict, None]=None) -> BatchResult:
+        """Validate the rows of a non-interactive batch without rendering
+
+        A batch is a file path or an iterable of rows. A row is either:
+            - a `str` script line: the command followed by its inputs,
+              quoted like a shell command. Empty lines and `#` comments
+              are skipped.
+            - a `list` or `tuple`: the command followed by its inputs
+            - a `dict` with a `cmd` key and either an `inputs` list or the
+              inputs keyed by their `PromptInput` message
+
+        Files ending with `.json` hold a list of rows, `.jsonl` one row per
+        line and `.csv` a header with a `cmd` column, other files are scripts.
+
+        The inputs are validated column by column with
+        `Validator.validate_many`.
+
+        :param batch: a `str` file path or an iterable of rows
+        :param prompts: a `dict` of the `list` of `PromptInput` of each menu
+            command, commands without prompts take no inputs
+        :raise ValueError: if a `.json` file does not hold a list of rows
+        :return: a `BatchResult`
+        :rtype: `BatchResult`
+
+        :Example:
+
+            result = calculator_cli.validate_batch(
+                ['+ 1 2', '* 3 4'],
+                prompts={'+': [num1_prompt, num2_prompt], '*': [num1_prompt, num2_prompt]}
+                )
+        """
+        prompts = prompts or {}
+        rows = []
+        errors = []
+        # (cmd, input index) -> [(row index, value)]
+        columns = {}
+        for line, row in enumerate(_read_batch(batch), 1):
+            try:
+                cmd, values = _split_row(row, prompts)
+                if cmd is None:
+                    continue
+                cmd = self.validate_command(cmd).strip()
+            except ValueError as err:
+                errors.append(BatchError(line, 'cmd', str(err).strip()))
+                continue
+
+            cmd_prompts = prompts.get(cmd, [])
+            if len(values) != len(cmd_prompts) or None in values:
+                errors.append(BatchError(
+                    line, 'cmd', f"The command '{cmd}' expects {len(cmd_prompts)} "
+                    f"inputs {[prompt.message for prompt in cmd_prompts]}, got {values}"))
+                continue
+
+            values = [str(value).strip() for value in values]
+            for index, value in enumerate(values):
+                columns.setdefault((cmd, index), []).append((len(rows), value))
+            rows.append(BatchRow(line, cmd, values))
+
+        invalid = set()
+        for (cmd, index), column in columns.items():
+            prompt = prompts[cmd][index]
+            try:
+                result = Validator.validate_many(
+                    [value for _, value in column], prompt.datatype,
+                    valid_values=self._value_index(prompt.valid_values))
+                column_errors = result.errors
+            except ValueError as err:
+                column_errors = dict.fromkeys(range(len(column)), str(err))
+            for position, message in column_errors.items():
+                row_index = column[position][0]
+                invalid.add(row_index)
+                errors.append(BatchError(rows[row_index].line, prompt.message, message))
+
+        errors.sort(key=lambda error: error.line)
+        return BatchResult(
+            rows=[row for index, row in enumerate(rows) if index not in invalid],
+            errors=errors)
+
+    def run_batch(self, batch: Union[str, Iterable], handler: Callable,
+                  prompts: Union[dict, None]=None,
+                  stop_on_error=True) -> BatchResult:
+        """Run a non-interactive batch at machine speed
+
+        Every row is validated up front with `validate_batch`, then
+        `handler(cmd, inputs)` is called for each valid row in order.
+
+        :param batch: a `str` file path or an iterable of rows, see
+            `validate_batch`
+        :param handler: a callable run with the `str` command and the `list`
+            of inputs of each row, like the results of `prompt_menu` and
+            `prompt_inputs`
+        :param prompts: a `dict` of the `list` of `PromptInput` of each menu
+            command
+        :param stop_on_error: if `True`, do not run any row when a row is
+            invalid, otherwise only skip the invalid rows
+        :return: a `BatchResult` with the rows run and the invalid or failed
+            rows
+        :rtype: `BatchResult`
+        """
+        result = self.validate_batch(batch, prompts)
+        if result.errors and stop_on_error:
+            return BatchResult(rows=[], errors=result.errors)
+
+        rows = []
+        errors = list(result.errors)
+        for row in result.rows:
+            try:
+                handler(row.cmd, row.inputs)
+                rows.append(row)
+            except Exception as err:
+                errors.append(BatchError(row.line, 'handler', str(err)))
+        errors.sort(key=lambda error: error.line)
+        return BatchResult(rows=rows, errors=errors)
+
     def validate_command(self, command: str) -> str:
         """Validate the command entered from the prompt menu
 
@@ -140,10 +429,104 @@ class InteractiveCli:
         :return: `command` entered from the command line
         :rtype: `str`
         """
-        valid_commands = [menu_item.cmd for menu_item in self.menu]
-        if command.strip() in valid_commands:
+        if command.strip() in self._menu_index:
             return command
+        if len(self._menu_index) > 20:
+            suggestions = self._menu_index.suggest(command)
+            if suggestions:
+                raise ValueError(
+                        f"{'':2}The command '{command}' entered is not valid!\n"
+                        f"{'':2}Did you mean {suggestions}?"
+                        )
         raise ValueError(
                 f"{'':2}The command '{command}' entered is not valid!\n"
-                f"{'':2}Valid commands are {valid_commands}."
+                f"{'':2}Valid commands are {self._menu_index}."
                 )
+
+
+def _write(text: str):
+    """Write text to stdout in a single write"""
+    sys.stdout.write(text)
+    sys.stdout.flush()
+
+
+class _JSONLine(str):
+    """A line of a `.jsonl` batch, decoded by `_split_row` so that a
+    malformed line is reported as an invalid row"""
+
+
+def _read_batch(batch: Union[str, Iterable]) -> Iterable:
+    """Iterate over the rows of a batch file or iterable
+
+    :raise ValueError: if a `.json` file does not hold a list of rows
+    """
+    if not isinstance(batch, str):
+        yield from batch
+        return
+
+    with open(batch, 'r', newline='') as _file:
+        if batch.endswith('.json'):
+            rows = json.load(_file)
+            if not isinstance(rows, list):
+                raise ValueError(
+                    f'Invalid batch file {batch}, expected a list of rows, '
+                    f'got a {type(rows).__name__}')
+            yield from rows
+        elif batch.endswith('.jsonl'):
+            for line in _file:
+                yield _JSONLine(line)
+        elif batch.endswith('.csv'):
+            yield from csv.DictReader(_file)
+        else:
+            yield from _file
+
+
+def _split_row(row, prompts: dict) -> tuple:
+    """Split a batch row into its command and inputs
+
+    :raise ValueError: if the row is malformed, e.g. unbalanced quotes,
+        invalid JSON or a command which is not a `str`
+    :return: a `tuple` of the `str` command, `None` for rows to skip, and the
+        `list` of inputs, `None` for missing inputs
+    """
+    if isinstance(row, _JSONLine):
+        if not row.strip():
+            return None, []
+        try:
+            row = json.loads(row)
+        except ValueError as err:
+            raise ValueError(f"Invalid JSON line '{row.strip()}': {err}") from None
+
+    if isinstance(row, str):
+        row = row.strip()
+        if not row or row.startswith('#'):
+            return None, []
+        try:
+            row = shlex.split(row)
+        except ValueError as err:
+            raise ValueError(f"Invalid batch line '{row}': {err}") from None
+
+    if isinstance(row, dict):
+        cmd = row.get('cmd')
+        if cmd is None:
+            return '', []
+        _check_cmd(cmd)
+        if 'inputs' not in row:
+            return cmd, [row.get(prompt.message)
+                         for prompt in prompts.get(cmd.strip(), [])]
+        inputs = row['inputs']
+        if not isinstance(inputs, (list, tuple)):
+            raise ValueError(f'Invalid inputs {inputs!r}, expected a list')
+        return cmd, list(inputs)
+    if not isinstance(row, (list, tuple)):
+        raise ValueError(f'Invalid batch row {row!r}, expected a line, a list or a dict')
+    if not row:
+        return None, []
+    _check_cmd(row[0])
+    return row[0], list(row[1:])
+
+
+def _check_cmd(cmd):
+    """Check that the command of a batch row is a `str`"""
+    if not isinstance(cmd, str):
+        raise ValueError(f'Invalid command {cmd!r}, expected a string')
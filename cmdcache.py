@@ -0,0 +1,231 @@
+"""Result cache for idempotent remote commands run by the RemoteClient
+
+Results are keyed by (host, user, command), expire after a TTL and are
+evicted in least recently used order once the cache is full.
+"""
+from __future__ import annotations
+
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Union
+
+from utils import lazy_import
+
+if TYPE_CHECKING:
+    from jumpssh import SSHSession
+    from jumpssh.session import RunCmdResult
+
+jumpssh = lazy_import('jumpssh')
+
+
+class MemoryBackend:
+    """Process-local cache backend
+
+    :param max_entries: maximum number of cached results
+    :param max_bytes: maximum total size of cached outputs, `None` for no limit
+    """
+
+    def __init__(self, max_entries: int=1024, max_bytes: Union[int, None]=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple) -> Union[tuple, None]:
+        """Get a cached (exit_code, output) value, `None` if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, size, value = entry
+            if expires < time.time():
+                del self._entries[key]
+                self._size -= size
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: tuple, value: tuple, expires: float):
+        """Cache a (exit_code, output) value until `expires`"""
+        size = len(value[1])
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= old[1]
+            self._entries[key] = (expires, size, value)
+            self._size += size
+            while self._entries and (
+                    len(self._entries) > self.max_entries
+                    or (self.max_bytes is not None and self._size > self.max_bytes)):
+                _, (_, old_size, _) = self._entries.popitem(last=False)
+                self._size -= old_size
+                self.evictions += 1
+
+    def invalidate(self, host: Union[str, None]=None):
+        """Drop the cached results of a host, or of all hosts"""
+        with self._lock:
+            for key in list(self._entries):
+                if host is None or key[0] == host:
+                    self._size -= self._entries.pop(key)[1]
+
+
+class SQLiteBackend:
+    """On-disk cache backend, results survive process restarts
+
+    :param path: a `str` SQLite database file path
+    :param max_entries: maximum number of cached results
+    :param max_bytes: maximum total size of cached outputs, `None` for no limit
+    """
+
+    def __init__(self, path: str, max_entries: int=1024,
+                 max_bytes: Union[int, None]=None):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS results ('
+            'key TEXT PRIMARY KEY, host TEXT, expires REAL, last_used REAL, '
+            'size INTEGER, value TEXT)')
+        self._db.execute('CREATE INDEX IF NOT EXISTS results_host ON results (host)')
+        self._db.commit()
+
+    def get(self, key: tuple) -> Union[tuple, None]:
+        """Get a cached (exit_code, output) value, `None` if missing or expired"""
+        db_key = json.dumps(key)
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                'SELECT expires, value FROM results WHERE key = ?',
+                (db_key,)).fetchone()
+            if row is None:
+                return None
+            if row[0] < now:
+                self._db.execute('DELETE FROM results WHERE key = ?', (db_key,))
+                self._db.commit()
+                return None
+            self._db.execute(
+                'UPDATE results SET last_used = ? WHERE key = ?', (now, db_key))
+            self._db.commit()
+        return tuple(json.loads(row[1]))
+
+    def set(self, key: tuple, value: tuple, expires: float):
+        """Cache a (exit_code, output) value until `expires`"""
+        with self._lock:
+            self._db.execute(
+                'INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?)',
+                (json.dumps(key), key[0], expires, time.time(),
+                 len(value[1]), json.dumps(value)))
+            self._evict()
+            self._db.commit()
+
+    def invalidate(self, host: Union[str, None]=None):
+        """Drop the cached results of a host, or of all hosts"""
+        with self._lock:
+            if host is None:
+                self._db.execute('DELETE FROM results')
+            else:
+                self._db.execute('DELETE FROM results WHERE host = ?', (host,))
+            self._db.commit()
+
+    def _evict(self):
+        """Delete expired results, then least recently used ones over the limits"""
+        self._db.execute('DELETE FROM results WHERE expires < ?', (time.time(),))
+        count, size = self._db.execute(
+            'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results').fetchone()
+        if count <= self.max_entries and (
+                self.max_bytes is None or size <= self.max_bytes):
+            return
+        rows = self._db.execute(
+            'SELECT key, size FROM results ORDER BY last_used').fetchall()
+        for key, row_size in rows:
+            if count <= self.max_entries and (
+                    self.max_bytes is None or size <= self.max_bytes):
+                break
+            self._db.execute('DELETE FROM results WHERE key = ?', (key,))
+            count -= 1
+            size -= row_size
+            self.evictions += 1
+
+
+class CommandCache:
+    """Opt-in cache of remote command results
+
+    :param ttl: seconds a result stays valid
+    :param allowlist: a `list` of regex, commands fully matching one of them
+        are cacheable without marking them per call
+    :param backend: a `MemoryBackend` (default) or `SQLiteBackend`
+
+    :Example:
+
+        cache = CommandCache(ttl=30, allowlist=[r'uname -a', r'cat /etc/\\S+'])
+        ssh_client = RemoteClient(cache=cache)
+    """
+
+    def __init__(self, ttl: Union[int, float]=60, allowlist: Union[list, None]=None,
+                 backend: Union[MemoryBackend, SQLiteBackend, None]=None):
+        self.ttl = ttl
+        self.backend = backend if backend is not None else MemoryBackend()
+        self.stats = {'hits': 0, 'misses': 0}
+        self._stats_lock = threading.Lock()
+        self._allowlist = re.compile(
+            '|'.join(f'(?:{pattern})' for pattern in allowlist)) if allowlist else None
+
+    @property
+    def hit_rate(self) -> float:
+        """Ratio of lookups served from the cache"""
+        with self._stats_lock:
+            hits, misses = self.stats['hits'], self.stats['misses']
+        lookups = hits + misses
+        return hits / lookups if lookups else 0.0
+
+    def is_cacheable(self, cmd: str, cacheable: Union[bool, None]=None) -> bool:
+        """Check whether a command result can be cached
+
+        :param cmd: a `str` command
+        :param cacheable: `True`/`False` to force, `None` to use the allowlist
+        """
+        if cacheable is not None:
+            return cacheable
+        return bool(self._allowlist and self._allowlist.fullmatch(cmd))
+
+    def get(self, ssh_session: SSHSession, cmd: str) -> Union[RunCmdResult, None]:
+        """Get the cached result of a command run on a session's host
+
+        :return: a `RunCmdResult` with `runs_nb` of `0` or `None` on a cache miss
+        """
+        value = self.backend.get(self._key(ssh_session, cmd))
+        with self._stats_lock:
+            self.stats['misses' if value is None else 'hits'] += 1
+        if value is None:
+            return None
+        return jumpssh.session.RunCmdResult(
+            exit_code=value[0],
+            output=value[1],
+            result_list=[],
+            command=cmd,
+            success_exit_code=[0],
+            runs_nb=0
+            )
+
+    def set(self, ssh_session: SSHSession, cmd: str, result: RunCmdResult):
+        """Cache the result of a command run on a session's host"""
+        self.backend.set(self._key(ssh_session, cmd),
+                         (result.exit_code, result.output),
+                         time.time() + self.ttl)
+
+    def invalidate(self, host: Union[str, None]=None):
+        """Drop the cached results of a host, or of all hosts"""
+        self.backend.invalidate(host)
+
+    @staticmethod
+    def _key(ssh_session: SSHSession, cmd: str) -> tuple:
+        return (ssh_session.host, ssh_session.username, cmd)
@@ -0,0 +1,294 @@
+"""Streaming of remote command output read from a SSH channel as it arrives,
+with a bounded memory footprint.
+"""
+from __future__ import annotations
+
+import codecs
+import socket
+import time
+import zlib
+from typing import Callable, IO, Iterator, TYPE_CHECKING, Union
+
+from tracing import Span, Tracer
+from utils import lazy_import
+
+if TYPE_CHECKING:
+    from jumpssh import SSHSession
+
+exception = lazy_import('jumpssh.exception')
+
+# Remote compressor command of each codec, in order of preference
+CODECS = {
+    'zstd': 'zstd -q -c',
+    'gzip': 'gzip -c',
+    }
+
+
+def _zstd_decompressor():
+    """Get a streaming zstd decompressor, `None` if no zstd module is installed"""
+    try:
+        from compression import zstd
+        return zstd.ZstdDecompressor()
+    except ImportError:
+        pass
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return zstandard.ZstdDecompressor().decompressobj()
+
+
+def decompressor(codec: str):
+    """Get a streaming decompressor of a codec
+
+    :param codec: a `str` codec of `CODECS`
+    :return: an object with a `decompress(data)` method, `None` if the codec
+        cannot be decompressed locally
+    """
+    if codec == 'gzip':
+        return zlib.decompressobj(wbits=31)
+    if codec == 'zstd':
+        return _zstd_decompressor()
+    raise ValueError(f'Unknown codec {codec}, expected one of {list(CODECS)}')
+
+
+def local_codecs() -> list:
+    """Get the codecs of `CODECS` which can be decompressed locally"""
+    return [codec for codec in CODECS if decompressor(codec) is not None]
+
+
+def compressed_cmd(cmd: str, codec: str) -> str:
+    """Wrap a command to compress its output on the remote host
+
+    The command output and error are compressed on stdout, its exit status
+    is written to stderr since the pipe exits with the compressor status.
+    """
+    return f'{{ ( {cmd}\n) 2>&1; echo $? >&2; }} | {CODECS[codec]}'
+
+
+class CmdStream:
+    """Iterable over the output of a remote command
+
+    Output is read from the channel in chunks of `chunk_size` bytes and is
+    never buffered as a whole. The attributes `exit_code`, `bytes_received`
+    and `truncated` are set once the stream has been consumed.
+
+    :param ssh_session: a `SSHSession` to run the command on
+    :param cmd: a `str` command
+    :param lines: if `True`, yield complete lines instead of raw chunks
+    :param max_line: in `lines` mode, a line longer than `max_line`
+        characters (or bytes) is yielded in pieces of `max_line`, so output
+        without newlines is not buffered. `None` for no limit.
+    :param max_bytes: stop reading and close the channel once `max_bytes` of
+        output are received, default is no limit
+    :param chunk_size: maximum number of bytes read from the channel at once
+    :param timeout: seconds to wait for output before raising `TimeoutError`
+    :param encoding: output encoding, `None` to yield `bytes`
+    :param tracer: an optional `Tracer` recording the `channel_open`,
+        `remote_exec` (until the first output byte) and `output_transfer` spans
+    :param codec: a `str` codec of `CODECS` compressing the output on the
+        remote host, decompressed as it is received. `bytes_received` counts
+        the decompressed output and `wire_bytes` the bytes read from the
+        channel.
+    """
+
+    def __init__(
+            self,
+            ssh_session: SSHSession,
+            cmd: str,
+            lines: bool=False,
+            max_line: Union[int, None]=1024 ** 2,
+            max_bytes: Union[int, None]=None,
+            chunk_size: int=32768,
+            timeout: Union[int, float, None]=None,
+            encoding: Union[str, None]='utf-8',
+            tracer: Union[Tracer, None]=None,
+            codec: Union[str, None]=None
+            ):
+        self.ssh_session = ssh_session
+        self.cmd = cmd
+        self.lines = lines
+        self.max_line = max_line
+        self.max_bytes = max_bytes
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self.encoding = encoding
+        self.codec = codec
+        self.exit_code = None
+        self.bytes_received = 0
+        self.wire_bytes = 0
+        self.truncated = False
+        self.tracer = tracer
+        self._channel = None
+
+    @property
+    def ratio(self) -> float:
+        """Compression ratio of the output received so far, `1.0` if uncompressed"""
+        if not self.wire_bytes:
+            return 1.0
+        return self.bytes_received / self.wire_bytes
+
+    def __iter__(self) -> Iterator[Union[str, bytes]]:
+        if self.lines:
+            return self._iter_lines()
+        return self._iter_chunks()
+
+    def _iter_chunks(self) -> Iterator[Union[str, bytes]]:
+        """Yield output chunks as they are received from the channel"""
+        inflater = None
+        if self.codec:
+            inflater = decompressor(self.codec)
+            if inflater is None:
+                raise ValueError(f'No local {self.codec} decompressor installed')
+        self.ssh_session.open()
+        start_time, start = time.time_ns(), time.perf_counter()
+        channel = self._channel = self.ssh_session.ssh_transport.open_session()
+        decoder = None
+        if self.encoding:
+            decoder = codecs.getincrementaldecoder(self.encoding)(errors='replace')
+
+        first_byte = None
+        try:
+            channel.settimeout(self.timeout)
+            if inflater is None:
+                channel.set_combine_stderr(True)
+                channel.exec_command(self.cmd)
+            else:
+                channel.exec_command(compressed_cmd(self.cmd, self.codec))
+            exec_start = self._trace('channel_open', start_time, start)
+
+            while True:
+                try:
+                    data = channel.recv(self.chunk_size)
+                except socket.timeout as err:
+                    raise exception.TimeoutError(
+                        f"Timeout of {self.timeout}s reached when calling "
+                        f"command '{self.cmd}'", original_exception=err) from err
+                if first_byte is None:
+                    first_byte = self._trace('remote_exec', *exec_start)
+                if not data:
+                    if inflater is not None and hasattr(inflater, 'flush'):
+                        data = self._limit(inflater.flush())
+                        if data:
+                            yield decoder.decode(data) if decoder else data
+                    break
+
+                self.wire_bytes += len(data)
+                chunks = [data] if inflater is None else self._inflate(inflater, data)
+                for data in chunks:
+                    data = self._limit(data)
+                    if data:
+                        yield decoder.decode(data) if decoder else data
+                    if self.truncated:
+                        break
+                if self.truncated:
+                    break
+
+            if decoder:
+                tail = decoder.decode(b'', final=True)
+                if tail:
+                    yield tail
+            if not self.truncated:
+                self.exit_code = channel.recv_exit_status()
+                if inflater is not None:
+                    self.exit_code = self._cmd_exit_status(channel)
+        finally:
+            self.close()
+            if first_byte is not None:
+                attributes = {'bytes': self.bytes_received, 'exit_code': self.exit_code}
+                if self.codec:
+                    attributes.update(codec=self.codec, wire_bytes=self.wire_bytes)
+                self._trace('output_transfer', *first_byte, **attributes)
+
+    def _inflate(self, inflater, data: bytes) -> Iterator[bytes]:
+        """Decompress received data in chunks of at most `chunk_size` bytes,
+        so highly compressed output is not inflated in memory at once"""
+        if hasattr(inflater, 'unconsumed_tail'):
+            # zlib keeps the input it did not decompress yet
+            while data:
+                yield inflater.decompress(data, self.chunk_size)
+                data = inflater.unconsumed_tail
+        elif hasattr(inflater, 'needs_input'):
+            # compression.zstd keeps it internally
+            yield inflater.decompress(data, self.chunk_size)
+            while not inflater.needs_input and not inflater.eof:
+                yield inflater.decompress(b'', self.chunk_size)
+        else:
+            # zstandard does not bound its output
+            yield inflater.decompress(data)
+
+    def _limit(self, data: bytes) -> bytes:
+        """Count output bytes, truncating them at `max_bytes`"""
+        if self.max_bytes is not None:
+            remaining = self.max_bytes - self.bytes_received
+            if len(data) > remaining:
+                data = data[:remaining]
+                self.truncated = True
+        self.bytes_received += len(data)
+        return data
+
+    def _cmd_exit_status(self, channel) -> int:
+        """Get the exit status of a compressed command from the stderr trailer"""
+        error = b''
+        data = channel.recv_stderr(self.chunk_size)
+        while data:
+            error += data
+            data = channel.recv_stderr(self.chunk_size)
+        lines = error.decode(errors='replace').split()
+        if lines and lines[-1].isdigit() and self.exit_code == 0:
+            return int(lines[-1])
+        # The compressor failed, e.g. not installed on the host
+        return self.exit_code or 1
+
+    def _trace(self, name: str, start_time: int, start: float,
+               **attributes) -> tuple:
+        """Record a span from `start` until now
+
+        :return: a (start_time, start) `tuple` of now, to start the next span
+        """
+        end_time, end = time.time_ns(), time.perf_counter()
+        if self.tracer is not None:
+            self.tracer.record(Span(name, self.ssh_session.host, start_time,
+                                    end - start, attributes))
+        return end_time, end
+
+    def _iter_lines(self) -> Iterator[Union[str, bytes]]:
+        """Yield complete output lines, keeping line endings, and the pieces
+        of the lines longer than `max_line`"""
+        pending = None
+        for chunk in self._iter_chunks():
+            if pending:
+                chunk = pending + chunk
+            newline = '\n' if isinstance(chunk, str) else b'\n'
+            lines = chunk.split(newline)
+            pending = lines.pop()
+            for line in lines:
+                yield line + newline
+            while self.max_line is not None and len(pending) >= self.max_line:
+                yield pending[:self.max_line]
+                pending = pending[self.max_line:]
+        if pending:
+            yield pending
+
+    def drain(self, sink: Union[str, IO, Callable]) -> 'CmdStream':
+        """Consume the whole stream into a sink
+
+        :param sink: a `str` file path, a writable file object or a callable
+            called with each chunk
+        :return: the `CmdStream` itself with `exit_code` set
+        """
+        if isinstance(sink, str):
+            mode = 'w' if self.encoding else 'wb'
+            with open(sink, mode, encoding=self.encoding) as _file:
+                return self.drain(_file)
+
+        write = sink if callable(sink) else sink.write
+        for chunk in self:
+            write(chunk)
+        return self
+
+    def close(self):
+        """Close the remote channel, stopping the command output"""
+        if self._channel is not None:
+            self._channel.close()
+            self._channel = None
@@ -0,0 +1,463 @@
+"""Delta collection of remote files and command outputs polled repeatedly
+
+The last result of each (host, file/command) is kept in a local store and
+only what changed since is transferred: nothing for an unchanged size and
+mtime or checksum, the appended bytes of a log, or the changed blocks.
+"""
+from __future__ import annotations
+
+import hashlib
+import shlex
+import sqlite3
+import threading
+import time
+from typing import Iterator, Literal, NamedTuple, TYPE_CHECKING, Union
+
+from cmdstream import CmdStream
+from logger import logger
+from utils import lazy_import
+
+if TYPE_CHECKING:
+    from jumpssh import SSHSession
+
+    from jumpbalancer import JumpBalancer
+    from remoteclient import RemoteClient
+
+exception = lazy_import('jumpssh.exception')
+paramiko = lazy_import('paramiko')
+
+Mode = Literal['mtime', 'checksum', 'tail', 'blocks']
+
+# Bytes before the tail offset checked to detect a rotated or rewritten log
+ANCHOR_SIZE = 4096
+
+
+class DeltaState(NamedTuple):
+    """Last collected state of a file or command output
+
+    :param mode: the `str` mode it was collected with
+    :param size: content size, the offset of the next read in `tail` mode
+    :param mtime: a `str` remote modification time, `0` for a command
+    :param digest: a `str` MD5 hex digest of the content, `-` if not computed
+    :param content: the `bytes` content, the last `ANCHOR_SIZE` bytes before
+        the offset in `tail` mode
+    """
+    mode: str
+    size: int
+    mtime: str
+    digest: str
+    content: bytes
+
+
+class DeltaResult(NamedTuple):
+    """DeltaResult `namedtuple` class returned by `DeltaCollector`
+
+    :param host: a `str` remote host
+    :param key: a `str` remote file path or command
+    :param content: the `bytes` content, only the appended bytes in `tail`
+        mode
+    :param changed: `False` if the content is the same as the last collection
+    :param exit_code: exit code of a command, `None` for a file
+    :param size: size of the whole content
+    :param bytes_transferred: bytes received from the host
+    :param error: a `str` error if the collection failed, otherwise `None`
+    """
+    host: str
+    key: str
+    content: bytes = b''
+    changed: bool = False
+    exit_code: Union[int, None] = None
+    size: int = 0
+    bytes_transferred: int = 0
+    error: Union[str, None] = None
+
+    @property
+    def failed(self) -> bool:
+        """`True` if the collection failed"""
+        return self.error is not None
+
+    @property
+    def output(self) -> str:
+        """The content decoded as UTF-8"""
+        return self.content.decode(errors='replace')
+
+
+class HostDeltaResult(NamedTuple):
+    """HostDeltaResult `namedtuple` class returned by `DeltaCollector.collect_many`
+
+    :param host: a `str` remote host
+    :param results: a `list` of `DeltaResult` of the files then the commands
+    :param error: a `str` error if the host could not be connected
+    """
+    host: str
+    results: list
+    error: Union[str, None] = None
+
+    @property
+    def failed(self) -> bool:
+        """`True` if the host errored or any of its collections failed"""
+        return self.error is not None or any(result.failed for result in self.results)
+
+
+class DeltaStore:
+    """SQLite store of the last collected state, survives process restarts
+
+    :param path: a `str` SQLite database file path, `:memory:` for a process
+        local store
+    """
+
+    def __init__(self, path: str='.pyutils_delta.db'):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS states ('
+            'host TEXT, key TEXT, mode TEXT, size INTEGER, mtime TEXT, '
+            'digest TEXT, content BLOB, updated REAL, PRIMARY KEY (host, key))')
+        self._db.commit()
+
+    def get(self, host: str, key: str) -> Union[DeltaState, None]:
+        """Get the last state of a host file/command, `None` if unknown"""
+        with self._lock:
+            row = self._db.execute(
+                'SELECT mode, size, mtime, digest, content FROM states '
+                'WHERE host = ? AND key = ?', (host, key)).fetchone()
+        return DeltaState(*row) if row is not None else None
+
+    def set(self, host: str, key: str, state: DeltaState):
+        """Save the state of a host file/command"""
+        with self._lock:
+            self._db.execute(
+                'INSERT OR REPLACE INTO states VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (host, key, *state, time.time()))
+            self._db.commit()
+
+    def invalidate(self, host: Union[str, None]=None):
+        """Drop the states of a host, or of all hosts"""
+        with self._lock:
+            if host is None:
+                self._db.execute('DELETE FROM states')
+            else:
+                self._db.execute('DELETE FROM states WHERE host = ?', (host,))
+            self._db.commit()
+
+
+class DeltaCollector:
+    """Collect remote files and command outputs, transferring only changes
+
+    Modes:
+        - `mtime`: skip a file whose size and mtime did not change, else
+          transfer it whole
+        - `checksum`: skip a file/output whose MD5 did not change, else
+          transfer it whole
+        - `tail`: transfer the bytes appended to a log since the last offset,
+          or the whole file if it shrank or its bytes before the offset changed
+        - `blocks`: transfer the `block_size` blocks whose MD5 changed, in a
+          second round trip. Contents of up to 4 blocks, and contents
+          collected for the first time, are sent whole.
+
+    Command outputs support the `checksum` and `blocks` modes, the command is
+    run into a remote temporary file compared like a file. The remote host
+    needs `md5sum`, `stat` and `dd`, the block digests are computed in one
+    pass if it has GNU `split`.
+
+    :param client: the `RemoteClient` connecting the hosts
+    :param store: a `DeltaStore` of the last collected states, default is
+        `.pyutils_delta.db`
+    :param block_size: bytes per block of the `blocks` mode
+    :param compress: `True` or a `str` codec to also compress the transfers,
+        see `RemoteClient.run_cmd`
+
+    :Example:
+
+        collector = DeltaCollector(ssh_client, DeltaStore('delta.db'))
+        log = collector.get_file(remote_session, '/var/log/messages', mode='tail')
+        print(log.output, log.bytes_transferred)
+        routes = collector.run_cmd(remote_session, 'ip route', mode='blocks')
+        if routes.changed:
+            ...
+    """
+
+    MARK = '__pyutils_delta__'
+
+    def __init__(self, client: RemoteClient, store: Union[DeltaStore, None]=None,
+                 block_size: int=65536, compress: Union[bool, str]=False):
+        self.client = client
+        self.store = store if store is not None else DeltaStore()
+        self.block_size = block_size
+        self.compress = compress
+        self.stats = {'collected': 0, 'unchanged': 0,
+                      'bytes_transferred': 0, 'bytes_collected': 0}
+        self._stats_lock = threading.Lock()
+
+    @property
+    def transfer_ratio(self) -> float:
+        """Bytes received over bytes of the collected contents"""
+        if not self.stats['bytes_collected']:
+            return 1.0
+        return self.stats['bytes_transferred'] / self.stats['bytes_collected']
+
+    def get_file(self, ssh_session: SSHSession, path: str, mode: Mode='blocks',
+                 timeout: Union[int, float, None]=None) -> DeltaResult:
+        """Collect a remote file
+
+        :param ssh_session: a SSHSession
+        :param path: a `str` remote file path
+        :param mode: `mtime`, `checksum`, `tail` or `blocks`, see the class
+        :param timeout: seconds to wait for output of each round trip
+        :return: a `DeltaResult`
+        :rtype: `DeltaResult`
+        """
+        if mode not in ('mtime', 'checksum', 'tail', 'blocks'):
+            raise ValueError(f"Invalid mode '{mode}', expected mtime/checksum/tail/blocks")
+        return self._collect(ssh_session, path, None, mode, timeout)
+
+    def run_cmd(self, ssh_session: SSHSession, cmd: str, mode: Mode='blocks',
+                timeout: Union[int, float, None]=None) -> DeltaResult:
+        """Run a command and collect its output and error
+
+        :param ssh_session: a SSHSession
+        :param cmd: a `str` command
+        :param mode: `checksum` or `blocks`, see the class
+        :param timeout: seconds to wait for output of each round trip
+        :return: a `DeltaResult` with the command `exit_code`
+        :rtype: `DeltaResult`
+        """
+        if mode not in ('checksum', 'blocks'):
+            raise ValueError(f"Invalid mode '{mode}' of a command, expected checksum/blocks")
+        return self._collect(ssh_session, cmd, cmd, mode, timeout)
+
+    def collect_many(self, jump_session: Union[SSHSession, JumpBalancer], hosts: list,
+                     paths: Union[list, None]=None, commands: Union[list, None]=None,
+                     mode: Mode='blocks', max_workers: int=10,
+                     timeout: Union[int, float, None]=None) -> Iterator[HostDeltaResult]:
+        """Collect files and command outputs of many hosts concurrently
+
+        :param jump_session: jump server `SSHSession` or `JumpBalancer`
+        :param hosts: a `list` of remote hosts
+        :param paths: a `list` of remote file paths collected on every host
+        :param commands: a `list` of commands collected on every host, in
+            `checksum` mode if `mode` is a file only mode
+        :param mode: the mode of the files and commands
+        :param max_workers: maximum number of hosts processed at the same time
+        :param timeout: seconds to wait for output of each round trip
+        :return: an iterator of `HostDeltaResult` yielded as each host finishes
+        """
+        if not jump_session:
+            return
+        cmd_mode = mode if mode in ('checksum', 'blocks') else 'checksum'
+
+        def _collect(host):
+            try:
+                with self.client.host_session(jump_session, host) as remote_session:
+                    results = [self.get_file(remote_session, path, mode, timeout)
+                               for path in paths or []]
+                    results.extend(self.run_cmd(remote_session, cmd, cmd_mode, timeout)
+                                   for cmd in commands or [])
+                    return HostDeltaResult(host=host, results=results)
+            except exception.ConnectionError as err:
+                logger.error(err)
+                return HostDeltaResult(host=host, results=[], error=str(err))
+
+        yield from self.client.fan_out(
+            hosts, _collect, max_workers=max_workers,
+            on_error=lambda host, error: HostDeltaResult(host=host, results=[], error=error))
+
+    def _collect(self, ssh_session: SSHSession, key: str, cmd: Union[str, None],
+                 mode: str, timeout) -> DeltaResult:
+        """Collect a file, or the output of `cmd`, and save its new state"""
+        host = ssh_session.host
+        state = self.store.get(host, key)
+        if state is not None and state.mode != mode:
+            state = None
+        codec = (self.client.select_codec(ssh_session, self.compress)
+                 if self.compress else None)
+
+        transferred = 0
+        try:
+            stream = self._stream(ssh_session, self._probe_script(key, cmd, mode, state),
+                                  codec, timeout)
+            payload = b''.join(stream)
+            transferred += stream.wire_bytes
+            header = self._parse(payload, stream.exit_code)
+            status, size, mtime, digest, exit_code, tmp, payload = header
+            if status == 'blocks':
+                content, fetched = self._fetch_blocks(
+                    ssh_session, key, cmd, tmp, state, size, mtime, payload, codec, timeout)
+                transferred += fetched
+                if content is None or hashlib.md5(content).hexdigest() != digest:
+                    # Changed since the probe, transfer it whole
+                    logger.warning(f'Block delta of {key} on {host} failed, transferring it whole')
+                    stream = self._stream(
+                        ssh_session, self._probe_script(key, cmd, 'checksum', None),
+                        codec, timeout)
+                    payload = b''.join(stream)
+                    transferred += stream.wire_bytes
+                    status, size, mtime, digest, exit_code, tmp, content = self._parse(
+                        payload, stream.exit_code)
+            elif status == 'same':
+                content = state.content
+            else:
+                content = payload
+        except (exception.SSHException, paramiko.SSHException, EOFError, OSError,
+                ValueError) as err:
+            logger.error(f'Failed to collect {key} on {host}: {err}')
+            return DeltaResult(host=host, key=key, bytes_transferred=transferred,
+                               error=str(err))
+
+        if mode == 'tail':
+            offset = state.size if state is not None and status == 'tail' else 0
+            previous = state.content if state is not None and status == 'tail' else b''
+            size = offset + len(content)
+            new_state = DeltaState(mode, size, mtime, '-', (previous + content)[-ANCHOR_SIZE:])
+        else:
+            size = len(content)
+            new_state = DeltaState(mode, size, mtime, digest, content)
+        # An unchanged log has no appended bytes
+        changed = status != 'same' and (status != 'tail' or bool(content))
+        if changed:
+            self.store.set(host, key, new_state)
+
+        with self._stats_lock:
+            self.stats['collected'] += 1
+            self.stats['unchanged'] += not changed
+            self.stats['bytes_transferred'] += transferred
+            self.stats['bytes_collected'] += size
+        return DeltaResult(host=host, key=key, content=content, changed=changed,
+                           exit_code=exit_code if cmd is not None else None,
+                           size=size, bytes_transferred=transferred)
+
+    def _probe_script(self, key: str, cmd: Union[str, None], mode: str,
+                      state: Union[DeltaState, None]) -> str:
+        """Build the script comparing the remote content with the last state
+
+        It prints the header `status size mtime digest exit_code tmp`, the
+        `MARK` line, then the content (`data`), the appended bytes (`tail`)
+        or the block digests (`blocks`). `status` is `same` if unchanged.
+        """
+        if cmd is not None:
+            script = (f't=$(mktemp) || exit 2; f=$t; ( {cmd}\n) > "$f" 2>&1; e=$?; '
+                      's="$(wc -c < "$f" | tr -d " ") 0"; ')
+        else:
+            script = (f't=-; e=0; f={shlex.quote(key)}; '
+                      '[ -f "$f" ] || { echo "No such file: $f"; exit 2; }; '
+                      's=$(stat -c "%s %Y" "$f" 2>/dev/null || stat -f "%z %m" "$f") || exit 2; ')
+        script += 'z=${s%% *}; '
+
+        digest = 'd=$(md5sum < "$f" | cut -c1-32); '
+        match mode:
+            case 'mtime':
+                known = f'{state.size} {state.mtime}' if state else ''
+                script += f'd=-; if [ "$s" = {shlex.quote(known)} ]; then r=same; else r=data; fi; '
+            case 'checksum':
+                known = state.digest if state else ''
+                script += digest + f'if [ "$d" = "{known}" ]; then r=same; else r=data; fi; '
+            case 'blocks' if state is None:
+                # No blocks to compare with, transfer it whole in this round trip
+                script += digest + 'r=data; '
+            case 'blocks':
+                script += digest + (
+                    f'if [ "$d" = "{state.digest}" ]; then r=same; '
+                    f'elif [ "$z" -le {4 * self.block_size} ]; then r=data; else r=blocks; fi; ')
+            case 'tail':
+                offset = state.size if state else 0
+                anchor = min(offset, ANCHOR_SIZE)
+                known = hashlib.md5(state.content[-anchor:]).hexdigest() if anchor else ''
+                if anchor:
+                    script += (f'a=$(tail -c +{offset - anchor + 1} "$f" | head -c {anchor} '
+                               '| md5sum | cut -c1-32); ')
+                else:
+                    script += 'a=; '
+                script += (f'd=-; if [ "$z" -ge {offset} ] && [ "$a" = "{known}" ]; '
+                           'then r=tail; else r=data; fi; ')
+
+        script += f'''printf '%s %s %s %s %s\\n{self.MARK}\\n' "$r" "$s" "$d" "$e" "$t"; '''
+        script += 'case $r in data) cat "$f";; '
+        if mode == 'tail':
+            script += f'tail) tail -c +{offset + 1} "$f";; '
+        if mode == 'blocks':
+            # One pass over the file with GNU split, else one dd per block
+            script += (f"blocks) if split --filter=cat /dev/null 2>/dev/null; then "
+                       f"split -b {self.block_size} --filter='md5sum | cut -c1-32' \"$f\"; "
+                       f'else i=0; while [ $i -lt $(( (z + {self.block_size} - 1) '
+                       f'/ {self.block_size} )) ]; do dd if="$f" bs={self.block_size} '
+                       'skip=$i count=1 2>/dev/null | md5sum | cut -c1-32; i=$((i + 1)); '
+                       'done; fi;; ')
+        script += 'esac; [ "$r" = blocks ] || [ "$t" = - ] || rm -f "$t"'
+        return script
+
+    def _fetch_blocks(self, ssh_session: SSHSession, key: str, cmd: Union[str, None],
+                      tmp: str, state: DeltaState, size: int, mtime: str,
+                      digests: bytes, codec, timeout) -> tuple:
+        """Fetch the changed blocks and patch them over the last content
+
+        :return: a (`bytes` content or `None` if the file changed since the
+            probe, bytes transferred) `tuple`
+        """
+        block_size = self.block_size
+        old = state.content if state is not None else b''
+        changed = [index for index, digest in enumerate(digests.decode().split())
+                   if hashlib.md5(old[index * block_size:(index + 1) * block_size]
+                                  ).hexdigest() != digest]
+
+        if cmd is not None:
+            script = f'f={shlex.quote(tmp)}; '
+        else:
+            script = (f'f={shlex.quote(key)}; s=$(stat -c "%s %Y" "$f" 2>/dev/null '
+                      f'|| stat -f "%z %m" "$f"); [ "$s" = "{size} {mtime}" ] || exit 3; ')
+        script += (f'for i in {" ".join(map(str, changed))}; do dd if="$f" bs={block_size} '
+                   'skip=$i count=1 2>/dev/null; done')
+        if cmd is not None:
+            script += '; rm -f "$f"'
+
+        completed = False
+        try:
+            stream = self._stream(ssh_session, script, codec, timeout)
+            data = b''.join(stream)
+            completed = True
+        finally:
+            if cmd is not None and not completed:
+                # The script did not get to remove the command output
+                self._remove_tmp(ssh_session, tmp)
+        if stream.exit_code != 0:
+            return None, stream.wire_bytes
+
+        blocks = {}
+        position = 0
+        for index in changed:
+            length = min(block_size, size - index * block_size)
+            blocks[index] = data[position:position + length]
+            position += length
+        if position != len(data):
+            return None, stream.wire_bytes
+        content = b''.join(
+            blocks.get(index, old[index * block_size:(index + 1) * block_size])
+            for index in range((size + block_size - 1) // block_size))
+        logger.debug(f'Fetched {len(changed)} changed blocks of {key} on {ssh_session.host}')
+        return content, stream.wire_bytes
+
+    @staticmethod
+    def _remove_tmp(ssh_session: SSHSession, tmp: str):
+        """Remove a remote temporary file, only logging a failure"""
+        try:
+            ssh_session.run_cmd(f'rm -f {shlex.quote(tmp)}', raise_if_error=False,
+                                silent=True)
+        except Exception as err:
+            logger.warning(f'Failed to remove {tmp} on {ssh_session.host}: {err}')
+
+    def _stream(self, ssh_session: SSHSession, script: str, codec, timeout) -> CmdStream:
+        return CmdStream(ssh_session=ssh_session, cmd=script, timeout=timeout,
+                         encoding=None, tracer=self.client.tracer, codec=codec)
+
+    def _parse(self, payload: bytes, exit_code: Union[int, None]) -> tuple:
+        """Split the probe output into its header fields and payload
+
+        :raise ValueError: if the probe failed
+        """
+        header, mark, payload = payload.partition(f'{self.MARK}\n'.encode())
+        fields = header.decode(errors='replace').split()
+        if not mark or len(fields) != 6:
+            error = (header or payload).decode(errors='replace').strip()
+            raise ValueError(error or f'exit status {exit_code}')
+        status, size, mtime, digest, cmd_exit_code, tmp = fields
+        return status, int(size), mtime, digest, int(cmd_exit_code), tmp, payload
@@ -1,4 +1,8 @@
 """Generic exceptions used by the application"""
+import re
+from functools import lru_cache
+from typing import Iterable, Iterator, Union
+
 
 class IPSecException(Exception):
     """IPSec Exception"""
@@ -8,66 +12,217 @@ class IPSecException(Exception):
         super().__init__(self.message)
 
 
-class IKEAuthError(IPSecException):
-    """IKE Authentication Error exception"""
+class IKEError(IPSecException):
+    """Base class of the IKE exceptions of a CHILD_SA
+
+    Subclasses only define the message `TEMPLATE`, formatted messages are
+    memoized since the same errors repeat across hosts and log lines.
+    """
+
+    TEMPLATE = "[IKE] Establishing CHILD_SA '{child_sa}' failed: {error}"
 
     def __init__(self, child_sa, error):
-        message = str(
-                f"[IKE] Establishing CHILD_SA '{child_sa}' failed: {error}"
-                )
-        super().__init__(message)
+        super().__init__(self.format_message(child_sa, error))
         self.child_sa = child_sa
         self.error = error
 
+    @classmethod
+    def format_message(cls, child_sa, error) -> str:
+        """Format the message of this exception without instantiating it
 
-class IKETimeoutError(IPSecException):
-    """IKE Timeout Exception"""
+        Only `str` values are cached, other values may be unhashable.
+        """
+        if isinstance(child_sa, (str, type(None))) and isinstance(error, str):
+            return _format_message(cls.TEMPLATE, child_sa, error)
+        return cls.TEMPLATE.format(child_sa=child_sa, error=error)
 
-    def __init__(self, child_sa, error):
-        message = str(
-                f"[IKE] Establishing CHILD_SA '{child_sa}' failed: {error}"
-                )
-        super().__init__(message)
-        self.child_sa = child_sa
-        self.error = error
+
+@lru_cache(maxsize=4096)
+def _format_message(template: str, child_sa, error) -> str:
+    return template.format(child_sa=child_sa, error=error)
 
 
-class IKEProposalError(IPSecException):
+class IKEAuthError(IKEError):
+    """IKE Authentication Error exception"""
+
+
+class IKETimeoutError(IKEError):
+    """IKE Timeout Exception"""
+
+
+class IKEProposalError(IKEError):
     """IKE Proposal Error exception"""
 
-    def __init__(self, child_sa, error):
-        message = str(
-                f"[IKE] Establishing CHILD_SA '{child_sa}' failed: {error}. "
-                "Verify and ensure the IPsec Parameters of both phase-1/phase-2 "
-                "are matched between the IPSec peers."
-                )
-        super().__init__(message)
-        self.child_sa = child_sa
-        self.error = error
+    TEMPLATE = (
+        "[IKE] Establishing CHILD_SA '{child_sa}' failed: {error}. "
+        "Verify and ensure the IPsec Parameters of both phase-1/phase-2 "
+        "are matched between the IPSec peers."
+        )
 
 
-class IKEIDirError(IPSecException):
+class IKEIDirError(IKEError):
     """IKE IDir mismatched error
 
     :example: IDir '172.24.22.4' does not match to 'site-a@test.com'
     """
-    def __init__(self, child_sa, error):
-        message = str(
-                f"[IKE] Establishing CHILD_SA '{child_sa}' failed: {error}"
-                )
-        super().__init__(message)
-        self.child_sa = child_sa
-        self.error = error
 
 
-class IKEUknownError(IPSecException):
+class IKEUknownError(IKEError):
     """IKE Unknown Error exception"""
 
-    def __init__(self, child_sa, error):
-        message = str(
-                f"[IKE] Establishing CHILD_SA '{child_sa}' failed: Unknown IKE error\n"
-                f'{error}'
-                )
-        super().__init__(message)
+    TEMPLATE = (
+        "[IKE] Establishing CHILD_SA '{child_sa}' failed: Unknown IKE error\n"
+        "{error}"
+        )
+
+
+class IKELogRecord:
+    """Lightweight IKE error found in a log line
+
+    The message is only formatted when accessed.
+
+    :param error_type: the `IKEError` subclass of the error
+    :param child_sa: a `str` CHILD_SA or connection name, `None` if unknown
+    :param error: a `str` log message of the error
+    :param line_number: number of the log line, starting at 1
+    """
+
+    __slots__ = ('error_type', 'child_sa', 'error', 'line_number')
+
+    def __init__(self, error_type: type, child_sa: Union[str, None], error: str,
+                 line_number: int):
+        self.error_type = error_type
         self.child_sa = child_sa
         self.error = error
+        self.line_number = line_number
+
+    @property
+    def message(self) -> str:
+        """The message of the exception of this error"""
+        return self.error_type.format_message(self.child_sa, self.error)
+
+    def to_exception(self) -> IKEError:
+        """Build the exception of this error, e.g. to raise it"""
+        return self.error_type(self.child_sa, self.error)
+
+    def __repr__(self):
+        return (f'{self.__class__.__name__}({self.error_type.__name__}, '
+                f'{self.child_sa!r}, {self.error!r}, line {self.line_number})')
+
+
+class IKELogClassifier:
+    """Streaming classifier of IKE (strongSwan charon) log lines
+
+    Lines are first screened with a regex of literal keywords, the few
+    matching lines are then matched against a single combined regex. Lines
+    starting an IKE_SA/CHILD_SA set the current CHILD_SA used for the errors
+    of lines not naming it. An `establishing ... failed` line is only
+    reported as `IKEUknownError` if no other error was found for the CHILD_SA
+    since it was initiated.
+
+    :Example:
+
+        classifier = IKELogClassifier()
+        result = ssh_client.run_cmd(remote_session, ['cat /var/log/charon.log'])[0]
+        for record in classifier.classify(result.output.splitlines()):
+            logger.error(record.message)
+        classifier.counts
+        # {'site-a': {'IKEAuthError': 3}, 'site-b': {'IKETimeoutError': 1}}
+    """
+
+    PATTERNS = {
+        'IKEIDirError': r"IDir '[^']*' does not match to '[^']*'",
+        'IKEAuthError': (
+            r'authentication of .*? failed|AUTHENTICATION_FAILED|MAC mismatched'
+            r'|no shared key found|no trusted \w+ public key found'
+            r'|signature validation failed|EAP method \S+ failed'),
+        'IKEProposalError': (
+            r'NO_PROPOSAL_CHOSEN|no (?:matching|acceptable) proposal'
+            r'|proposal mismatch|TS_UNACCEPTABLE|INVALID_KE_PAYLOAD'),
+        'IKETimeoutError': (
+            r'giving up after \d+ retransmits|peer not responding'
+            r'|DPD timeout|timed out'),
+        'IKEUknownError': (
+            r"establishing (?:CHILD_SA|connection|IKE_SA) '?[^'\s]+'? failed"
+            r'|failed to establish CHILD_SA'),
+        # Lines starting a SA, not errors
+        'start': (
+            r"(?:initiating|establishing) (?:IKE_SA|CHILD_SA) (?P<start_sa>[^\s\[{]+)"
+            r"|(?:initiating|establishing) connection '(?P<start_conn>[^']+)'"),
+        }
+    # A literal of each pattern, to skip most lines with a cheap search
+    KEYWORDS = (
+        'IDir', 'authentication of', 'AUTHENTICATION_FAILED', 'MAC mismatched',
+        'no shared key', 'no trusted', 'signature validation', 'EAP method',
+        'NO_PROPOSAL_CHOSEN', 'proposal', 'TS_UNACCEPTABLE', 'INVALID_KE_PAYLOAD',
+        'giving up', 'peer not responding', 'DPD timeout', 'timed out',
+        'failed', 'initiating', 'establishing',
+        )
+    ERROR_TYPES = {
+        'IKEIDirError': IKEIDirError,
+        'IKEAuthError': IKEAuthError,
+        'IKEProposalError': IKEProposalError,
+        'IKETimeoutError': IKETimeoutError,
+        'IKEUknownError': IKEUknownError,
+        }
+
+    _screen = re.compile('|'.join(map(re.escape, KEYWORDS)))
+    _matcher = re.compile(
+        '|'.join(f'(?P<{name}>{pattern})' for name, pattern in PATTERNS.items()))
+    # CHILD_SA/connection named in a line, e.g. `<site-a|1>` or `'site-a'`
+    _child_sa = re.compile(
+        r"<(?P<conn>[^|>]+)\|\d+>|(?:CHILD_SA|IKE_SA) '?(?P<sa>[^\s'\[{]+)"
+        r"|connection '(?P<quoted>[^']+)'")
+    # Message of a charon line after the `[IKE]` and `<conn|n>` prefixes
+    _message = re.compile(r'(?:.*?\[\w+\]\s*)?(?:<[^>]*>\s*)?(.*)')
+
+    def __init__(self):
+        self.counts = {}
+        self.lines = 0
+        self._current = None
+        self._reported = set()
+
+    def classify(self, lines: Iterable[str]) -> Iterator[IKELogRecord]:
+        """Classify log lines as they are read
+
+        :param lines: an iterable of `str` log lines, e.g. a file object or
+            `output.splitlines()`
+        :return: an iterator of `IKELogRecord` of the lines with an IKE error
+        """
+        screen = self._screen.search
+        search = self._matcher.search
+        for line in lines:
+            self.lines += 1
+            if screen(line) is None:
+                continue
+            match = search(line)
+            if match is None:
+                continue
+
+            kind = match.lastgroup
+            if kind == 'start':
+                self._current = match.group('start_sa') or match.group('start_conn')
+                self._reported.discard(self._current)
+                continue
+
+            child_sa = self._find_child_sa(line)
+            if kind == 'IKEUknownError' and child_sa in self._reported:
+                # The failure was already reported with its cause
+                self._reported.discard(child_sa)
+                continue
+            self._reported.add(child_sa)
+
+            error_type = self.ERROR_TYPES[kind]
+            counts = self.counts.get(child_sa)
+            if counts is None:
+                counts = self.counts[child_sa] = {}
+            counts[kind] = counts.get(kind, 0) + 1
+            yield IKELogRecord(error_type, child_sa,
+                               self._message.match(line.rstrip()).group(1), self.lines)
+
+    def _find_child_sa(self, line: str) -> Union[str, None]:
+        """Get the CHILD_SA named in a line, else the current one"""
+        match = self._child_sa.search(line)
+        if match is None:
+            return self._current
+        return match.group('conn') or match.group('sa') or match.group('quoted')
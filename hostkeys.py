@@ -0,0 +1,228 @@
+"""Persistent host key store of the jump servers and remote hosts
+
+Host keys are pinned on first use and verified on every later connection
+without any interactive or unknown host handling. The store file uses the
+OpenSSH `known_hosts` format, it is loaded once per process into an index
+and new keys are appended in one batch. Keys marked `@revoked` are always
+rejected.
+"""
+import atexit
+import base64
+import os
+import re
+import threading
+from typing import Union
+
+from logger import logger
+from utils import lazy_import
+
+paramiko = lazy_import('paramiko')
+
+# Stores with keys pinned since their last save, saved at exit
+_unsaved = set()
+_unsaved_lock = threading.Lock()
+
+
+def _save_stores():
+    with _unsaved_lock:
+        stores = list(_unsaved)
+    for store in stores:
+        store.save()
+
+
+atexit.register(_save_stores)
+
+
+def host_id(host: str, port: Union[int, str, None]=22) -> str:
+    """Get the `known_hosts` name of a host, `[host]:port` for a custom port"""
+    port = int(port or 22)
+    return host if port == 22 else f'[{host}]:{port}'
+
+
+def _match(host: str, pattern: str) -> bool:
+    """Match a host id against a `known_hosts` pattern with `*` and `?`
+
+    `[host]:port` ids are matched literally, unlike with `fnmatch`.
+    """
+    regex = ''.join('.*' if char == '*' else '.' if char == '?' else re.escape(char)
+                    for char in pattern)
+    return re.fullmatch(regex, host) is not None
+
+
+def _match_list(host: str, patterns: list) -> bool:
+    """Match a host id against the patterns of a `known_hosts` line
+
+    Like OpenSSH, a host matching a negated `!pattern` is rejected whatever
+    the other patterns.
+    """
+    matched = False
+    for pattern in patterns:
+        if pattern.startswith('!'):
+            if _match(host, pattern[1:]):
+                return False
+        elif _match(host, pattern):
+            matched = True
+    return matched
+
+
+class HostKeyPolicy:
+    """paramiko missing host key policy checking the key of one host
+
+    :param store: the `HostKeyStore`
+    :param host: a `str` host id, see `host_id`. Tunneled sessions connect to
+        `localhost`, so the host is given rather than taken from paramiko.
+    """
+
+    def __init__(self, store: 'HostKeyStore', host: str):
+        self.store = store
+        self.host = host
+
+    def missing_host_key(self, client, hostname: str, key):
+        self.store.verify(self.host, key)
+
+
+class HostKeyStore:
+    """Known host keys indexed by host id
+
+    :param path: a `str` known_hosts file path
+    :param pin: if `True`, accept and pin the key of unknown hosts (trust on
+        first use), otherwise reject unknown hosts
+
+    :Example:
+
+        host_keys = HostKeyStore()
+        ssh_client = RemoteClient(host_keys=host_keys)
+        ...
+        # Also done at exit
+        host_keys.save()
+    """
+
+    def __init__(self, path: str='~/.ssh/pyutils_known_hosts', pin=True):
+        self.path = os.path.expanduser(path)
+        self.pin = pin
+        # host id -> {key type: base64 key}
+        self._keys = None
+        # (host patterns, key type, base64 key) of the lines with wildcard
+        # or negated patterns
+        self._patterns = []
+        # (host patterns, key type, base64 key) of the @revoked keys
+        self._revoked = []
+        self._pending = []
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._index())
+
+    def policy(self, host: str, port: Union[int, str, None]=22) -> HostKeyPolicy:
+        """Get the missing host key policy of a host for a `SSHSession`"""
+        return HostKeyPolicy(self, host_id(host, port))
+
+    def lookup(self, host: str) -> dict:
+        """Get the known keys of a host id
+
+        :return: a `dict` of base64 keys by key type, empty if unknown. A
+            key listed for the host itself wins over a pattern's key.
+        """
+        keys = {}
+        for key_type, key_data in self._known(host):
+            keys.setdefault(key_type, key_data)
+        return keys
+
+    def verify(self, host: str, key):
+        """Check the key presented by a host, pinning it if the host is new
+
+        :param host: a `str` host id
+        :param key: the paramiko `PKey` presented by the host
+        :raises BadHostKeyException: if the host is known with another key or
+            key type
+        :raises SSHException: if the key is revoked, or if the host is
+            unknown and keys are not pinned
+        """
+        key_type, key_data = key.get_name(), key.get_base64()
+        known = self._known(host)
+        if self._is_revoked(host, key_type, key_data):
+            logger.error(f'Host key of {host} is revoked')
+            raise paramiko.SSHException(f'Revoked {key_type} host key of {host}')
+        if known:
+            if (key_type, key_data) in known:
+                return
+            # A known host presenting another key or key type is rejected
+            logger.error(f'Host key of {host} does not match the pinned key')
+            expected_type, expected_data = next(
+                (known_key for known_key in known if known_key[0] == key_type),
+                known[0])
+            expected = paramiko.PKey.from_type_string(
+                expected_type, base64.b64decode(expected_data))
+            raise paramiko.BadHostKeyException(host, key, expected)
+        if not self.pin:
+            raise paramiko.SSHException(f'Unknown host key of {host}')
+
+        with self._lock:
+            self._keys.setdefault(host, {})[key_type] = key_data
+            self._pending.append(f'{host} {key_type} {key_data}\n')
+        with _unsaved_lock:
+            _unsaved.add(self)
+        logger.info(f'Pinned {key_type} host key of {host}')
+
+    def save(self):
+        """Append the keys pinned since the last save to the file"""
+        with _unsaved_lock:
+            _unsaved.discard(self)
+        with self._lock:
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, []
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, mode=0o700, exist_ok=True)
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+        with os.fdopen(fd, 'a') as _file:
+            _file.write(''.join(pending))
+
+    def _index(self) -> dict:
+        """Load the file once and index the keys by host id"""
+        if self._keys is None:
+            with self._lock:
+                if self._keys is None:
+                    self._keys = self._load()
+        return self._keys
+
+    def _known(self, host: str) -> list:
+        """Get the (key type, base64 key) `tuple` known for a host id, the
+        keys listed for the host itself first"""
+        known = list(self._index().get(host, {}).items())
+        known.extend((key_type, key_data)
+                     for patterns, key_type, key_data in self._patterns
+                     if _match_list(host, patterns))
+        return known
+
+    def _is_revoked(self, host: str, key_type: str, key_data: str) -> bool:
+        """`True` if the key of a host is marked `@revoked`"""
+        return any(
+            revoked_type == key_type and revoked_data == key_data
+            and _match_list(host, patterns)
+            for patterns, revoked_type, revoked_data in self._revoked)
+
+    def _load(self) -> dict:
+        keys = {}
+        try:
+            with open(self.path, 'r') as _file:
+                lines = _file.read().splitlines()
+        except FileNotFoundError:
+            return keys
+        for line in lines:
+            fields = line.split()
+            if fields[:1] == ['@revoked'] and len(fields) >= 4:
+                self._revoked.append((fields[1].split(','), fields[2], fields[3]))
+                continue
+            # Skip comments, other markers and hashed host names
+            if len(fields) < 3 or fields[0].startswith(('#', '@', '|')):
+                continue
+            hosts = fields[0].split(',')
+            if any(char in fields[0] for char in '*?!'):
+                self._patterns.append((hosts, fields[1], fields[2]))
+                continue
+            for host in hosts:
+                keys.setdefault(host, {})[fields[1]] = fields[2]
+        return keys
+
@@ -0,0 +1,206 @@
+"""Host inventory indexed by address and attributes, to select the hosts of a
+`RemoteClient` fan-out out of a large inventory.
+"""
+import csv
+import json
+import os
+from ipaddress import ip_network
+from typing import Iterable, Union
+
+from logger import logger
+from utils import Validator, lazy_import
+
+np = lazy_import('numpy')
+
+# IPv4 addresses are stored IPv4-mapped (::ffff:a.b.c.d)
+_IPV4_MAPPED_NETWORK = '::ffff:0.0.0.0/96'
+_IPV4_MAPPED_LOW = 0xffff00000000
+_MASK_64 = 0xffffffffffffffff
+
+
+class Inventory:
+    """Hosts sorted by address with attribute columns
+
+    Addresses are validated in bulk and stored as sorted (high, low)
+    `uint64` arrays, IPv4 addresses being IPv4-mapped, so the hosts of a CIDR
+    are one contiguous slice found with two binary searches. Each attribute
+    column is stored as `int32` codes of its distinct values with the rows
+    sorted by code, so the rows of a value are also found with a binary
+    search. Invalid addresses are skipped and reported in `errors`, duplicate
+    addresses keep their first record. Requires `numpy`.
+
+    :param records: an iterable of `dict` host records
+    :param address_field: the record field of the host IP address, the other
+        fields are attribute columns
+
+    :Example:
+
+        inventory = Inventory.load('inventory.csv')
+        hosts = inventory.select(cidr='10.20.0.0/14', site='X')
+        for result in ssh_client.run_cmd_many(jump_session, hosts, ['uptime']):
+            ...
+    """
+
+    def __init__(self, records: Iterable[dict], address_field: str='address'):
+        records = list(records)
+        self.address_field = address_field
+        addresses = [str(record.get(address_field) or '').strip() for record in records]
+        result = Validator.validate_many(addresses, 'ip', numpy=True)
+        self.errors = result.errors
+        if self.errors:
+            logger.warning(f'Skipped {len(self.errors)} inventory records with an invalid address')
+
+        valid = np.flatnonzero(result.valid)
+        high, low = result.addresses[0][valid], result.addresses[1][valid]
+        # Stable sort by address, the first record of a duplicate address is kept
+        order = np.lexsort((low, high))
+        high, low, valid = high[order], low[order], valid[order]
+        unique = np.ones(len(valid), dtype=np.bool_)
+        unique[1:] = (high[1:] != high[:-1]) | (low[1:] != low[:-1])
+        self._high, self._low = high[unique], low[unique]
+        rows = valid[unique]
+
+        self.hosts = [addresses[row] for row in rows]
+        self.columns = {}
+        for name in dict.fromkeys(key for record in records for key in record):
+            if name != address_field:
+                self.columns[name] = _Column(
+                    [records[row].get(name) for row in rows])
+
+    def __len__(self) -> int:
+        return len(self.hosts)
+
+    def __repr__(self) -> str:
+        return (f'{self.__class__.__name__}({len(self.hosts)} hosts, '
+                f'columns={list(self.columns)})')
+
+    @classmethod
+    def load(cls, path: str, address_field: str='address') -> 'Inventory':
+        """Load an inventory file
+
+        :param path: a `str` path of a `.csv` file with a header, a `.json`
+            file of a `list` of records or a `.jsonl` file of one record per
+            line
+        :param address_field: the record field of the host IP address
+        :raise ValueError: if the file extension is not supported
+        :return: an `Inventory`
+        """
+        extension = os.path.splitext(path)[1].lower()
+        with open(path, 'r', newline='') as _file:
+            match extension:
+                case '.csv':
+                    records = list(csv.DictReader(_file))
+                case '.json':
+                    records = json.load(_file)
+                case '.jsonl':
+                    records = [json.loads(line) for line in _file if line.strip()]
+                case _:
+                    raise ValueError(
+                        f"Unsupported inventory file '{path}', expected .csv/.json/.jsonl")
+        return cls(records, address_field=address_field)
+
+    def select(self, cidr: Union[str, list, None]=None, version: Union[int, None]=None,
+               **attributes) -> list:
+        """Get the hosts matching all the given filters
+
+        :param cidr: a `str` network or a `list` of networks, e.g.
+            `10.20.0.0/14`, a host matches any of them
+        :param version: `4` or `6` to only select IPv4 or IPv6 hosts
+        :param **attributes: attribute column values, a `list`/`tuple`/`set`
+            of values matches any of them
+        :raise ValueError: if a network or a column is not valid
+        :return: a `list` of `str` host addresses sorted by address
+        :rtype: `list`
+        """
+        return [self.hosts[row] for row in self.rows(cidr, version, **attributes)]
+
+    def rows(self, cidr: Union[str, list, None]=None, version: Union[int, None]=None,
+             **attributes):
+        """Same as `select`, returning the sorted row indexes of the hosts
+
+        :return: a NumPy `int` array of row indexes
+        """
+        if version not in (None, 4, 6):
+            raise ValueError(f'Invalid IP version {version}, expected 4 or 6')
+        mask = None
+        if cidr is not None:
+            mask = np.zeros(len(self.hosts), dtype=np.bool_)
+            for network in [cidr] if isinstance(cidr, str) else cidr:
+                start, stop = self._network_rows(network)
+                mask[start:stop] = True
+        if version is not None:
+            # The IPv4-mapped addresses are one contiguous slice
+            start, stop = self._network_rows(_IPV4_MAPPED_NETWORK)
+            version_mask = np.full(len(self.hosts), version == 6, dtype=np.bool_)
+            version_mask[start:stop] = version == 4
+            mask = version_mask if mask is None else mask & version_mask
+
+        for name, values in attributes.items():
+            column = self.columns.get(name)
+            if column is None:
+                raise ValueError(f"Unknown inventory column '{name}'")
+            column_mask = np.zeros(len(self.hosts), dtype=np.bool_)
+            column_mask[column.rows(values)] = True
+            mask = column_mask if mask is None else mask & column_mask
+
+        if mask is None:
+            return np.arange(len(self.hosts))
+        return np.flatnonzero(mask)
+
+    def record(self, row: int) -> dict:
+        """Get the record of a row, see `rows`"""
+        record = {self.address_field: self.hosts[row]}
+        for name, column in self.columns.items():
+            record[name] = column.labels[column.codes[row]]
+        return record
+
+    def _network_rows(self, network: str) -> tuple:
+        """Get the (start, stop) row slice of the hosts of a network"""
+        network = ip_network(network.strip(), strict=False)
+        first, last = int(network.network_address), int(network.broadcast_address)
+        if network.version == 4:
+            first |= _IPV4_MAPPED_LOW
+            last |= _IPV4_MAPPED_LOW
+        return (self._search(first >> 64, first & _MASK_64, 'left'),
+                self._search(last >> 64, last & _MASK_64, 'right'))
+
+    def _search(self, high: int, low: int, side: str) -> int:
+        """Binary search of an address in the (high, low) sorted arrays"""
+        start = int(np.searchsorted(self._high, np.uint64(high), 'left'))
+        stop = int(np.searchsorted(self._high, np.uint64(high), 'right'))
+        return start + int(np.searchsorted(self._low[start:stop], np.uint64(low), side))
+
+
+class _Column:
+    """Attribute column stored as codes of its distinct values
+
+    :param values: the values of each row, `None` for a missing value
+    """
+
+    def __init__(self, values: list):
+        codes = {}
+        self.codes = np.fromiter(
+            (codes.setdefault(value, len(codes)) for value in values),
+            dtype=np.int32, count=len(values))
+        self.labels = list(codes)
+        self._index = codes
+        self._order = np.argsort(self.codes, kind='stable')
+        self._sorted = self.codes[self._order]
+
+    def rows(self, values) -> object:
+        """Get the row indexes of the rows having any of the values"""
+        if not isinstance(values, (list, tuple, set, frozenset)):
+            values = [values]
+        slices = []
+        for value in values:
+            code = self._index.get(value)
+            if code is None and value is not None:
+                code = self._index.get(str(value))
+            if code is None:
+                continue
+            start = np.searchsorted(self._sorted, code, 'left')
+            stop = np.searchsorted(self._sorted, code, 'right')
+            slices.append(self._order[start:stop])
+        if not slices:
+            return np.zeros(0, dtype=np.intp)
+        return np.concatenate(slices)
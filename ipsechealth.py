@@ -0,0 +1,210 @@
+"""Concurrent IPSec tunnel bring-up and health sweep over the RemoteClient
+
+The CHILD_SAs of each gateway are checked or initiated concurrently on one
+SSH session per gateway, and the gateways are swept by a bounded pool of
+workers. Failed tunnels are classified into the IKE exceptions.
+"""
+from __future__ import annotations
+
+import shlex
+import time
+from typing import Iterator, NamedTuple, TYPE_CHECKING, Union
+
+from exception import IKEError, IKELogClassifier, IKETimeoutError, IKEUknownError
+from logger import logger
+from utils import lazy_import
+
+if TYPE_CHECKING:
+    from jumpssh import SSHSession
+
+    from jumpbalancer import JumpBalancer
+    from remoteclient import RemoteClient
+
+exception = lazy_import('jumpssh.exception')
+
+
+class TunnelResult(NamedTuple):
+    """TunnelResult `namedtuple` class of a CHILD_SA
+
+    :param gateway: a `str` gateway host
+    :param child_sa: a `str` CHILD_SA name
+    :param up: `True` if the CHILD_SA is established
+    :param error: the `IKEError` of a tunnel which is not up, otherwise `None`
+    """
+    gateway: str
+    child_sa: str
+    up: bool
+    error: Union[IKEError, None] = None
+
+    @property
+    def failed(self) -> bool:
+        """`True` if the CHILD_SA is not up"""
+        return not self.up
+
+
+class GatewayResult(NamedTuple):
+    """GatewayResult `namedtuple` class of the CHILD_SAs of a gateway
+
+    :param gateway: a `str` gateway host
+    :param tunnels: a `list` of `TunnelResult`
+    :param error: a `str` error if the gateway could not be reached
+    """
+    gateway: str
+    tunnels: list
+    error: Union[str, None] = None
+
+    @property
+    def failed(self) -> bool:
+        """`True` if the gateway errored or any of its tunnels is not up"""
+        return self.error is not None or any(tunnel.failed for tunnel in self.tunnels)
+
+
+class TunnelReport(NamedTuple):
+    """TunnelReport `namedtuple` class returned by `TunnelHealth.sweep`
+
+    :param tunnels: a `list` of `TunnelResult` of all gateways
+    :param counts: a `dict` of the number of tunnels `up` and of each
+        IKE exception name
+    :param duration: seconds the sweep took
+    """
+    tunnels: list
+    counts: dict
+    duration: float
+
+    @property
+    def failed(self) -> list:
+        """a `list` of the `TunnelResult` which are not up"""
+        return [tunnel for tunnel in self.tunnels if tunnel.failed]
+
+
+class TunnelHealth:
+    """Check or bring up many CHILD_SAs across gateways
+
+    The commands default to strongSwan `swanctl`. A CHILD_SA is up when the
+    check command output contains `up_marker`, or when the initiate command
+    exits with `0`. The output of a failed command is classified with
+    `IKELogClassifier`.
+
+    :param client: the `RemoteClient` used to connect the gateways
+    :param max_workers: maximum number of gateways swept at the same time
+    :param max_channels: maximum number of CHILD_SAs checked at the same time
+        on a gateway
+    :param timeout: seconds allowed per CHILD_SA
+    :param check_cmd: command template checking a `{child_sa}`
+    :param initiate_cmd: command template initiating a `{child_sa}` within
+        `{timeout}` seconds
+    :param up_marker: a `str` in the check output of an established CHILD_SA
+
+    :Example:
+
+        health = TunnelHealth(ssh_client, max_workers=50, timeout=20)
+        report = health.sweep(jump_session, {
+            '10.0.0.1': ['site-a', 'site-b'],
+            '10.0.0.2': ['site-c'],
+            })
+        report.counts
+        # {'up': 2, 'IKEProposalError': 1}
+        for tunnel in report.failed:
+            logger.error(tunnel.error.message)
+    """
+
+    def __init__(self, client: RemoteClient, max_workers: int=50,
+                 max_channels: int=10, timeout: Union[int, float]=30,
+                 check_cmd: str='swanctl --list-sas --child {child_sa}',
+                 initiate_cmd: str='swanctl --initiate --child {child_sa} --timeout {timeout}',
+                 up_marker: str='INSTALLED'):
+        self.client = client
+        self.max_workers = max_workers
+        self.max_channels = max_channels
+        self.timeout = timeout
+        self.check_cmd = check_cmd
+        self.initiate_cmd = initiate_cmd
+        self.up_marker = up_marker
+
+    def sweep(self, jump_session: Union[SSHSession, JumpBalancer], tunnels: dict,
+              initiate=False) -> TunnelReport:
+        """Check or initiate the CHILD_SAs of many gateways
+
+        :param jump_session: jump server `SSHSession` or `JumpBalancer`
+        :param tunnels: a `dict` of the `list` of CHILD_SA names of each gateway
+        :param initiate: if `True`, initiate the CHILD_SAs instead of checking
+            them
+        :return: a `TunnelReport`
+        :rtype: `TunnelReport`
+        """
+        start = time.perf_counter()
+        results = []
+        counts = {}
+        for gateway_result in self.iter_sweep(jump_session, tunnels, initiate):
+            for tunnel in gateway_result.tunnels:
+                key = 'up' if tunnel.up else type(tunnel.error).__name__
+                counts[key] = counts.get(key, 0) + 1
+                results.append(tunnel)
+        duration = time.perf_counter() - start
+        logger.info(f'Swept {len(results)} tunnels in {duration:.1f}s: {counts}')
+        return TunnelReport(tunnels=results, counts=counts, duration=duration)
+
+    def iter_sweep(self, jump_session: Union[SSHSession, JumpBalancer], tunnels: dict,
+                   initiate=False) -> Iterator[GatewayResult]:
+        """Same as `sweep`, yielding a `GatewayResult` as each gateway finishes"""
+        if not jump_session:
+            return
+        yield from self.client.fan_out(
+            list(tunnels),
+            lambda gateway: self._sweep_gateway(
+                jump_session, gateway, tunnels[gateway], initiate),
+            max_workers=self.max_workers,
+            on_error=lambda gateway, error: _failed_gateway(
+                gateway, tunnels[gateway], error)
+            )
+
+    def _sweep_gateway(self, jump_session: Union[SSHSession, JumpBalancer],
+                       gateway: str, child_sas: list, initiate: bool) -> GatewayResult:
+        """Check or initiate the CHILD_SAs of a gateway over one session"""
+        template = self.initiate_cmd if initiate else self.check_cmd
+        commands = [template.format(child_sa=shlex.quote(child_sa), timeout=int(self.timeout))
+                    for child_sa in child_sas]
+        try:
+            with self.client.host_session(jump_session, gateway) as remote_session:
+                outputs = self.client.run_cmd_pipelined(
+                    remote_session, commands, max_channels=self.max_channels,
+                    raise_if_error=False, timeout=self.timeout)
+        except exception.ConnectionError as err:
+            logger.error(err)
+            return _failed_gateway(gateway, child_sas, str(err))
+
+        return GatewayResult(
+            gateway=gateway,
+            tunnels=[self._classify(gateway, child_sa, output, initiate)
+                     for child_sa, output in zip(child_sas, outputs)])
+
+    def _classify(self, gateway: str, child_sa: str, output, initiate: bool) -> TunnelResult:
+        """Map the result of a CHILD_SA command to a `TunnelResult`"""
+        if isinstance(output, exception.TimeoutError):
+            return TunnelResult(gateway, child_sa, False, IKETimeoutError(child_sa, str(output)))
+        if isinstance(output, exception.SSHException):
+            return TunnelResult(gateway, child_sa, False, IKEUknownError(child_sa, str(output)))
+
+        if (output.exit_code == 0 and (initiate or self.up_marker in output.output)):
+            return TunnelResult(gateway, child_sa, True)
+
+        records = list(IKELogClassifier().classify(output.output.splitlines()))
+        # The first specific error is the cause, a generic failure comes after it
+        record = next((record for record in records
+                       if record.error_type is not IKEUknownError), None) \
+            or next(iter(records), None)
+        if record is not None:
+            return TunnelResult(gateway, child_sa, False,
+                                record.error_type(child_sa, record.error))
+        error = output.output.strip() or f'exit status {output.exit_code}'
+        return TunnelResult(gateway, child_sa, False, IKEUknownError(child_sa, error))
+
+
+def _failed_gateway(gateway: str, child_sas: list, error: str) -> GatewayResult:
+    """Build the result of a gateway which could not be swept"""
+    return GatewayResult(
+        gateway=gateway,
+        tunnels=[TunnelResult(gateway, child_sa, False,
+                              IKEUknownError(child_sa, f'Gateway unreachable: {error}'))
+                 for child_sa in child_sas],
+        error=error)
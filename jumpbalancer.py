@@ -0,0 +1,144 @@
+"""Spread the remote sessions of a RemoteClient across equivalent jump
+servers, with per jump server channel limits and failover.
+"""
+from __future__ import annotations
+
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, Literal, TYPE_CHECKING, Union
+
+from logger import logger
+from utils import lazy_import
+
+if TYPE_CHECKING:
+    from jumpssh import SSHSession
+
+    from remoteclient import RemoteClient
+
+exception = lazy_import('jumpssh.exception')
+
+
+class JumpBalancer:
+    """Pick a jump server for each remote session
+
+    A jump server failing to connect fails over to the next one and is
+    skipped for `down_time` seconds, as are the jump servers rejected by the
+    client circuit breaker. Each jump server may itself be reached through a
+    `ProxyJump` chain.
+
+    :param client: the `RemoteClient` connecting the jump servers
+    :param jump_hosts: a `list` of equivalent jump server hosts
+    :param strategy: `least_connections` picks the jump server with the
+        fewest remote sessions in use, `round_robin` rotates over them
+    :param max_channels: maximum number of remote sessions in use at once per
+        jump server, `None` for no limit
+    :param down_time: seconds a jump server failing to connect is skipped
+
+    :Example:
+
+        ssh_client = RemoteClient()
+        balancer = JumpBalancer(ssh_client, ['bastion-1', 'bastion-2'],
+                                max_channels=50)
+        for result in ssh_client.run_cmd_many(balancer, hosts, ['uptime']):
+            ...
+    """
+
+    def __init__(self, client: RemoteClient, jump_hosts: list,
+                 strategy: Literal['least_connections', 'round_robin']='least_connections',
+                 max_channels: Union[int, None]=None, down_time: float=30.0):
+        if not jump_hosts:
+            raise ValueError('At least one jump host is required')
+        self.client = client
+        self.jump_hosts = list(jump_hosts)
+        self.strategy = strategy
+        self.max_channels = max_channels
+        self.down_time = down_time
+        # jump host -> number of remote sessions in use
+        self.active = dict.fromkeys(self.jump_hosts, 0)
+        self._rotation = itertools.cycle(range(len(self.jump_hosts)))
+        self._condition = threading.Condition()
+        self._connect_locks = {host: threading.Lock() for host in self.jump_hosts}
+        # jump host -> monotonic time until which it is skipped
+        self._down_until = {}
+
+    @contextmanager
+    def acquire(self, timeout: Union[int, float, None]=None) -> Iterator[SSHSession]:
+        """Reserve a channel on a jump server for the enclosed block
+
+        :param timeout: seconds to wait for a free channel, `None` to wait
+            until one is released
+        :raises ConnectionError: if no jump server could be connected or no
+            channel was released before the timeout
+        :return: a context manager yielding the jump server `SSHSession`
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        failed = set()
+        while True:
+            host = self._reserve(failed, deadline)
+            try:
+                # One handshake per jump server, others then get the pooled session
+                with self._connect_locks[host]:
+                    jump_session = None
+                    if not self._is_down(host):
+                        jump_session = self.client.connect_jump_session(host)
+                        if jump_session is None:
+                            self._down_until[host] = time.monotonic() + self.down_time
+            except BaseException:
+                self._release(host)
+                raise
+            if jump_session is not None:
+                break
+            self._release(host)
+            failed.add(host)
+            logger.warning(f'Jump server {host} unavailable, failing over')
+
+        try:
+            yield jump_session
+        finally:
+            self.client.pool.release(jump_session)
+            self._release(host)
+
+    def _reserve(self, failed: set, deadline: Union[float, None]) -> str:
+        """Wait for a healthy jump server with a free channel and reserve it"""
+        with self._condition:
+            while True:
+                healthy = [host for host in self.jump_hosts
+                           if host not in failed and not self._is_down(host)
+                           and self.client.breaker.allow(host)]
+                if not healthy:
+                    raise exception.ConnectionError(
+                        f'No jump server available in {self.jump_hosts}')
+
+                host = self._pick(healthy)
+                if host is not None:
+                    self.active[host] += 1
+                    return host
+
+                remaining = deadline - time.monotonic() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    raise exception.ConnectionError(
+                        f'No free channel on the jump servers {healthy}')
+                self._condition.wait(remaining)
+
+    def _pick(self, healthy: list) -> Union[str, None]:
+        """Pick a jump server with a free channel, `None` if all are busy"""
+        free = [host for host in healthy
+                if self.max_channels is None or self.active[host] < self.max_channels]
+        if not free:
+            return None
+        if self.strategy == 'round_robin':
+            for _ in self.jump_hosts:
+                host = self.jump_hosts[next(self._rotation)]
+                if host in free:
+                    return host
+        return min(free, key=self.active.__getitem__)
+
+    def _is_down(self, host: str) -> bool:
+        return self._down_until.get(host, 0) > time.monotonic()
+
+    def _release(self, host: str):
+        with self._condition:
+            self.active[host] -= 1
+            self._condition.notify()
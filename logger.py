@@ -1,32 +1,275 @@
 """Custom Logging Module
 Credit to: https://github.com/hackersandslackers/paramiko-tutorial
+
+`logger` is configured with `create_logger()` on first use, so importing this
+module neither imports loguru nor creates the log files.
 """
+import atexit
+import gzip
+import os
+import queue
+import shutil
+import threading
 from sys import stdout
-from loguru import logger as custom_logger
+from typing import Literal, Union
 
 
-def create_logger():
-    """Create custom logger."""
-    custom_logger.remove()
-    custom_logger.add(
-        stdout,
-        colorize=True,
-        level="INFO",
-        format="<light-cyan>{time:MM-DD-YYYY HH:mm:ss}</light-cyan> | \
+STDOUT_FORMAT = "<light-cyan>{time:MM-DD-YYYY HH:mm:ss}</light-cyan> | \
         <light-green>{level}</light-green>: \
         <light-white>{message}</light-white>"
-    )
-    custom_logger.add(
-        'logs/errors.log',
-        colorize=True,
-        level="ERROR",
-        rotation="200 KB",
-        catch=True,
-        format="<light-cyan>{time:MM-DD-YYYY HH:mm:ss}</light-cyan> | \
+ERROR_FORMAT = "<light-cyan>{time:MM-DD-YYYY HH:mm:ss}</light-cyan> | \
         <light-red>{level}</light-red>: \
         <light-white>{message}</light-white>"
+
+# Size based rotation of the log files
+ROTATION_BYTES = 50 * 1024 ** 2
+RETENTION = 10
+
+
+class RotatingFileWriter:
+    """Append-only file rotated once it reaches `max_bytes`
+
+    Rotated files are renamed `<path>.1[.gz]` to `<path>.<backup_count>[.gz]`,
+    the oldest one being removed.
+
+    :param path: a `str` log file path, its directory is created if missing
+    :param max_bytes: size of the file triggering a rotation
+    :param backup_count: number of rotated files kept
+    :param compress: if `True`, gzip the rotated files
+    """
+
+    def __init__(self, path: str, max_bytes: int=ROTATION_BYTES,
+                 backup_count: int=RETENTION, compress: bool=True):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.compress = compress
+        # The file is created on the first write
+        self._file = None
+        self._size = 0
+
+    def write(self, text: str):
+        """Write text, rotating the file first if it would exceed the size"""
+        if self._file is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._file = open(self.path, 'a', encoding='utf-8')
+            self._size = self._file.tell()
+        if self._size and self._size + len(text) > self.max_bytes:
+            self._rotate()
+        self._file.write(text)
+        self._size += len(text)
+
+    def flush(self):
+        if self._file is not None:
+            self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+    def _rotate(self):
+        self._file.close()
+        suffix = '.gz' if self.compress else ''
+        for index in range(self.backup_count - 1, 0, -1):
+            source = f'{self.path}.{index}{suffix}'
+            if os.path.exists(source):
+                os.replace(source, f'{self.path}.{index + 1}{suffix}')
+        if self.backup_count:
+            if self.compress:
+                with open(self.path, 'rb') as source, \
+                        gzip.open(f'{self.path}.1.gz', 'wb') as target:
+                    shutil.copyfileobj(source, target)
+            else:
+                os.replace(self.path, f'{self.path}.1')
+        self._file = open(self.path, 'w', encoding='utf-8')
+        self._size = 0
+
+
+class AsyncSink:
+    """Non-blocking loguru sink writing messages from a dedicated thread
+
+    Messages are formatted by loguru on the calling thread and queued in a
+    bounded buffer. The writer thread writes them in batches with one flush
+    per batch.
+
+    :param stream: an object with `write` and `flush` methods, e.g.
+        `sys.stdout` or a `RotatingFileWriter`
+    :param max_queue: maximum number of buffered messages
+    :param policy: what to do when the buffer is full:
+        - block: wait for the writer thread (backpressure)
+        - drop_new: drop the new message
+        - drop_old: drop the oldest buffered message
+    :param batch_size: maximum number of messages written per flush
+    :param flush_interval: maximum seconds a message waits to be flushed
+    """
+
+    def __init__(self, stream, max_queue: int=10000,
+                 policy: Literal['block', 'drop_new', 'drop_old']='drop_new',
+                 batch_size: int=512, flush_interval: float=0.5):
+        self.stream = stream
+        self.policy = policy
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._closed = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def __call__(self, message: str):
+        if self.policy == 'block':
+            self._queue.put(message)
+            return
+        while True:
+            try:
+                self._queue.put_nowait(message)
+                return
+            except queue.Full:
+                self.dropped += 1
+                if self.policy == 'drop_new':
+                    return
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                pass
+
+    def close(self):
+        """Write the buffered messages and stop the writer thread"""
+        self._closed.set()
+        self._thread.join()
+        if self.stream is not stdout:
+            self.stream.close()
+
+    def _run(self):
+        reported = 0
+        while not (self._closed.is_set() and self._queue.empty()):
+            try:
+                batch = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                continue
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if self.dropped != reported:
+                batch.append(f'{self.dropped - reported} log messages dropped\n')
+                reported = self.dropped
+            try:
+                self.stream.write(''.join(batch))
+                self.stream.flush()
+            except Exception:
+                pass
+
+
+_async_sinks = []
+
+
+def _close_async_sinks():
+    while _async_sinks:
+        _async_sinks.pop().close()
+
+
+atexit.register(_close_async_sinks)
+
+
+def create_logger(non_blocking: bool=False, max_queue: int=10000,
+                  policy: Literal['block', 'drop_new', 'drop_old']='drop_new',
+                  error_path: str='logs/errors.log',
+                  json_path: Union[str, None]=None,
+                  rotation: int=ROTATION_BYTES, retention: int=RETENTION,
+                  compression: bool=True):
+    """Create custom logger.
+
+    :param non_blocking: if `True`, write the logs from writer threads through
+        bounded buffers instead of on the calling thread
+    :param max_queue: buffered messages per sink in non-blocking mode
+    :param policy: full buffer policy in non-blocking mode, see `AsyncSink`
+    :param error_path: a `str` error log file path
+    :param json_path: a `str` JSON lines log file path, records include the
+        bound context, e.g. the `host` bound by `logger.bind(host=host)` or
+        `logger.contextualize(host=host)`. `None` to disable it.
+    :param rotation: size in bytes of a log file triggering its rotation
+    :param retention: number of rotated files kept
+    :param compression: if `True`, gzip the rotated files
+    """
+    global _configured
+    from loguru import logger as custom_logger
+
+    _configured = True
+    custom_logger.remove()
+    _close_async_sinks()
+
+    def sink(stream):
+        if not non_blocking:
+            return stream
+        async_sink = AsyncSink(stream, max_queue=max_queue, policy=policy)
+        _async_sinks.append(async_sink)
+        return async_sink
+
+    def file_sink(path: str):
+        return RotatingFileWriter(path, max_bytes=rotation, backup_count=retention,
+                                  compress=compression)
+
+    custom_logger.add(
+        sink(stdout),
+        colorize=True,
+        level="INFO",
+        format=STDOUT_FORMAT
     )
+    if non_blocking:
+        custom_logger.add(
+            sink(file_sink(error_path)),
+            colorize=True,
+            level="ERROR",
+            catch=True,
+            format=ERROR_FORMAT
+        )
+    else:
+        custom_logger.add(
+            error_path,
+            colorize=True,
+            level="ERROR",
+            rotation=rotation,
+            retention=retention,
+            compression='gz' if compression else None,
+            delay=True,
+            catch=True,
+            format=ERROR_FORMAT
+        )
+    if json_path:
+        custom_logger.add(
+            sink(file_sink(json_path)) if non_blocking else json_path,
+            level="INFO",
+            serialize=True,
+            catch=True,
+            **({} if non_blocking else {
+                'rotation': rotation, 'retention': retention,
+                'compression': 'gz' if compression else None, 'delay': True})
+        )
     return custom_logger
 
 
-logger = create_logger()
+_configured = False
+_configure_lock = threading.Lock()
+
+
+class LazyLogger:
+    """Proxy of the loguru logger calling `create_logger()` on first use"""
+
+    def __getattr__(self, name: str):
+        if not _configured:
+            with _configure_lock:
+                if not _configured:
+                    create_logger()
+        from loguru import logger as custom_logger
+
+        # Later lookups of the same attribute skip __getattr__
+        value = getattr(custom_logger, name)
+        setattr(self, name, value)
+        return value
+
+
+logger = LazyLogger()
@@ -1,13 +1,60 @@
 """SSH Client to handle connections to Jump Server and remote host,
 and run commands on a remote host.
 """
-import os
-from typing import Union
+from __future__ import annotations
 
-from jumpssh import SSHSession, exception
-import paramiko
+import os
+import re
+import select
+import socket
+import threading
+import time
+import uuid
+import weakref
+import zlib
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Iterator, NamedTuple, TYPE_CHECKING, Union
 
+from cmdcache import CommandCache
+from cmdstream import CODECS, CmdStream, local_codecs
+from hostkeys import HostKeyStore, host_id
+from jumpbalancer import JumpBalancer
 from logger import logger
+from retry import Backoff, CircuitBreaker
+from sessionpool import SessionPool
+from sshconfig import SSHConfigResolver, default_resolver
+from tracing import Tracer
+from transfer import FileTransfer, TransferResult
+from utils import lazy_import
+
+if TYPE_CHECKING:
+    from jumpssh import SSHSession
+
+# jumpssh imports paramiko, only import them once a session is used
+jumpssh = lazy_import('jumpssh')
+exception = lazy_import('jumpssh.exception')
+paramiko = lazy_import('paramiko')
+
+
+class HostResult(NamedTuple):
+    """HostResult `namedtuple` class returned by `RemoteClient.run_cmd_many`
+
+    :param host: a `str` remote host
+    :param outputs: a `list` of RunCmdResult/RunCmdError of the host's commands
+    :param error: a `str` error if the host could not be connected or its
+        commands did not all complete, otherwise `None`
+    """
+    host: str
+    outputs: list
+    error: Union[str, None] = None
+
+    @property
+    def failed(self) -> bool:
+        """`True` if the host errored or any of its commands failed"""
+        return self.error is not None or any(
+            isinstance(output, exception.RunCmdError) for output in self.outputs)
 
 
 class RemoteClient:
@@ -15,11 +62,53 @@ class RemoteClient:
 
     :param jump_session: jump server `SSHSession`
     :param remote_session: remote host `SSHSession`
+    :param pool: a `SessionPool` used to reuse opened sessions, a default
+        pool is created if not provided
+    :param ssh_config: a `SSHConfigResolver`, default resolves `setting.cfg`
+        merged with `~/.ssh/config`
+    :param cache: an optional `CommandCache` of idempotent command results
+    :param tracer: an optional `Tracer` recording the timing of each phase
+    :param backoff: a `Backoff` of the connection attempts and of the
+        reconnections of dropped sessions, default is 3 retries with jittered
+        exponential delays starting at 1 second
+    :param breaker: a `CircuitBreaker` rejecting the hosts failing repeatedly,
+        default opens the circuit of a host for 60 seconds after 5 failures
+    :param remote_user: a `str` user logging in the remote hosts
+    :param host_keys: an optional `HostKeyStore` pinning and verifying the
+        host keys, default accepts any host key
     """
 
-    def __init__(self):
+    def __init__(self, pool: Union[SessionPool, None]=None,
+                 ssh_config: Union[SSHConfigResolver, None]=None,
+                 cache: Union[CommandCache, None]=None,
+                 tracer: Union[Tracer, None]=None,
+                 backoff: Union[Backoff, None]=None,
+                 breaker: Union[CircuitBreaker, None]=None,
+                 remote_user: str='root',
+                 host_keys: Union[HostKeyStore, None]=None):
         self.jump_session = None
         self.remote_session = None
+        self.pool = pool if pool is not None else SessionPool()
+        self.ssh_config = ssh_config if ssh_config is not None else default_resolver
+        self.cache = cache
+        self.tracer = tracer
+        self.backoff = backoff if backoff is not None else Backoff()
+        self.breaker = breaker if breaker is not None else CircuitBreaker()
+        self.remote_user = remote_user
+        self.host_keys = host_keys
+        # remote session -> jump session it is tunneled through
+        self._jump_sessions = weakref.WeakKeyDictionary()
+        # host -> codec compressing its output, `None` if it has none
+        self._codecs = {}
+        # host -> [output bytes, wire bytes] of the compressed commands
+        self.compression = {}
+        self._compression_lock = threading.Lock()
+
+    def _span(self, name: str, host: str, **attributes):
+        """Get a `Tracer` span context manager, a no-op without tracer"""
+        if self.tracer is None:
+            return nullcontext(attributes)
+        return self.tracer.span(name, host, **attributes)
 
     def get_ssh_config(self, host: str) -> Union[dict, None]:
         """Get SSH config
@@ -35,62 +124,128 @@ class RemoteClient:
                 'hostname': 'jump_server_host_name'
             }
         """
+        return self.ssh_config.connect_config(host)
 
-        conf_file_path = os.path.join(
-            os.path.abspath(os.getcwd()), 'setting.cfg')
-        try:
-            with open(conf_file_path, 'r') as _file:
-                ssh_config = paramiko.SSHConfig()
-                ssh_config.parse(_file)
-
-            ssh_config_dict = ssh_config.lookup(host)
-
-            for k in ['hostname', 'user', 'identityfile', 'port']:
-                ssh_config_dict[k]
+    def connect_jump_session(self, jump_host) -> Union[SSHSession, None]:
+        """Connect a SSH connection to jump server
 
-            return ssh_config_dict
+        If the SSH config of the jump server has a `ProxyJump`, e.g.
 
-        except FileNotFoundError as err:
-            logger.error(err)
-        except KeyError as err:
-            logger.error(
-                    f'{conf_file_path} does not contain {err} value. '
-                    'Check the setup instructions.'
-                    )
-        return None
+            Host bastion-2
+                ProxyJump admin@bastion-1:2222
 
-    def connect_jump_session(self, jump_host) -> Union[SSHSession, None]:
-        """Connect a SSH connection to jump server
+        the session is tunneled through the chain of hops, each hop using its
+        own SSH config and `ProxyJump`.
 
         Note: ssh-copy-id -i ~/.ssh/id_rsa <jump_server>
         so that password is not required when connecting to jump server.
         """
+        hops = self._hop_chain(jump_host)
+        if not hops:
+            return None
+
+        jump_session = None
+        for hop in hops:
+            hop_session = self._connect_hop(jump_session, hop)
+            if jump_session is not None:
+                # Kept in the pool while it tunnels the next hop
+                self.pool.release(jump_session)
+            jump_session = hop_session
+            if jump_session is None:
+                return None
+        self.jump_session = jump_session
+        return self.jump_session
+
+    def _hop_chain(self, host: str, depth: int=0) -> Union[list, None]:
+        """Get the hops to connect to `host` from its `ProxyJump` config
+
+        :return: a `list` of `str` hops like `[user@]host[:port]`, ending with
+            `host`, or `None` if the SSH config could not be resolved
+        """
+        ssh_config = self.get_ssh_config(host=_parse_hop(host)[1])
+        if not ssh_config:
+            return None
+        proxy_jump = ssh_config.get('proxyjump', 'none')
+        if proxy_jump.lower() == 'none':
+            return [host]
+        if depth >= 16:
+            logger.error(f'ProxyJump chain of {host} is too long or has a loop')
+            return None
+
+        hops = [hop.strip() for hop in proxy_jump.split(',')]
+        first_hops = self._hop_chain(hops[0], depth + 1)
+        if first_hops is None:
+            return None
+        return first_hops + hops[1:] + [host]
+
+    def _connect_hop(self, jump_session: Union[SSHSession, None],
+                     hop: str) -> Union[SSHSession, None]:
+        """Connect to a hop, directly or through the previous hop session"""
+        user, host, port = _parse_hop(hop)
         # Get SSH config from setting.cfg
-        ssh_config = self.get_ssh_config(host=jump_host)
+        ssh_config = self.get_ssh_config(host=host)
 
         if not ssh_config:
             return None
+        user = user or ssh_config['user']
+        port = port or ssh_config['port']
+
+        if jump_session is not None:
+            try:
+                return self._get_remote_session(
+                    jump_session, ssh_config['hostname'], username=user, port=int(port),
+                    private_key_file=ssh_config['identityfile'])
+            except exception.ConnectionError as err:
+                logger.error(err)
+                return None
+
+        pool_key = SessionPool.make_key(ssh_config['hostname'], None, user, port)
+        pooled_session = self.pool.get(pool_key)
+        if pooled_session:
+            return pooled_session
+
+        if not self.breaker.allow(host):
+            logger.error(f'Circuit breaker open for jump host - {host}')
+            return None
 
         try:
-            logger.info(
-                f"Connecting SSH session to - {ssh_config['user']}@{jump_host}")
-            self.jump_session = SSHSession(
-                host=jump_host,
-                username=ssh_config['user'],
-                private_key_file=ssh_config['identityfile'],
-                port=ssh_config['port'],
-                missing_host_key_policy=None
-                ).open(retry=1, retry_interval=10)
-            logger.info(f'Successful connected to jump host - {jump_host}')
-            return self.jump_session
+            logger.info(f"Connecting SSH session to - {user}@{host}")
+            with self._span('jump_handshake', host, retries=0) as span:
+                jump_session = jumpssh.SSHSession(
+                    host=ssh_config['hostname'],
+                    username=user,
+                    private_key_file=ssh_config['identityfile'],
+                    port=port,
+                    missing_host_key_policy=self._host_key_policy(
+                        ssh_config['hostname'], port)
+                    )
+                jump_session = self.backoff.call(
+                    jump_session.open,
+                    retry_on=(exception.ConnectionError,),
+                    on_retry=lambda err, delay: self._on_retry(span, host, err, delay)
+                    )
+            logger.info(f'Successful connected to jump host - {host}')
+            self.breaker.record_success(host)
+            self.pool.put(pool_key, jump_session)
+            return jump_session
         except exception.ConnectionError as err:
             logger.error(err)
+            self.breaker.record_failure(host)
         return None
 
+    @staticmethod
+    def _on_retry(span: dict, host: str, err: Exception, delay: float):
+        """Log and count a connection retry"""
+        span['retries'] = span.get('retries', 0) + 1
+        logger.warning(f'Connection to {host} failed: {err}. Retrying in {delay:.1f}s')
+
     def connect_remote_session(self, jump_session: SSHSession,
                                remote_host: str) -> Union[SSHSession, None]:
         """Open SSH connection to remote session from jump server
 
+        The session is checked out of the pool until it is given to
+        `disconnect` or to `pool.release`.
+
         :param jump_session: jump server `SSHSession`
         :param remote_host: a remote host IP address
         :return: a `SSHSession` object or `None` if failed to connect SSH to
@@ -98,18 +253,103 @@ class RemoteClient:
         """
         if jump_session:
             try:
-                logger.info(
-                    f'Connecting SSH session to remote host - {remote_host}')
-                self.remote_session = jump_session.get_remote_session(
-                    host=remote_host,
-                    username='root'
-                    )
-                logger.info(f'Successful connected to remote host - {remote_host}')
+                self.remote_session = self._get_remote_session(
+                    jump_session, remote_host)
                 return self.remote_session
             except exception.ConnectionError as err:
                 logger.error(err)
         return None
 
+    def _get_remote_session(self, jump_session: SSHSession, remote_host: str,
+                            username: Union[str, None]=None, **kwargs) -> SSHSession:
+        """Check out a remote session from the pool or open a new one
+
+        :param username: a `str` user, default is the client `remote_user`
+        :param **kwargs: optional args of jumpssh's get_remote_session method
+        :raises ConnectionError: if failed to connect SSH to the remote host
+        """
+        username = username or self.remote_user
+        kwargs.setdefault('missing_host_key_policy', self._host_key_policy(
+            remote_host, kwargs.get('port', 22)))
+        pool_key = SessionPool.make_key(
+            host_id(jump_session.host, jump_session.port), remote_host, username,
+            kwargs.get('port', 22))
+        remote_session = self.pool.get(pool_key)
+        if remote_session:
+            self._jump_sessions[remote_session] = jump_session
+            return remote_session
+
+        if not self.breaker.allow(remote_host):
+            raise exception.ConnectionError(
+                f'Circuit breaker open for remote host - {remote_host}')
+
+        logger.info(f'Connecting SSH session to remote host - {remote_host}')
+        try:
+            with self._span('remote_handshake', remote_host, retries=0,
+                            jump_host=jump_session.host) as span:
+                remote_session = self.backoff.call(
+                    lambda: jump_session.get_remote_session(
+                        host=remote_host,
+                        username=username,
+                        **kwargs
+                        ),
+                    retry_on=(exception.ConnectionError,),
+                    on_retry=lambda err, delay: self._on_retry(span, remote_host, err, delay)
+                    )
+        except exception.ConnectionError:
+            self.breaker.record_failure(remote_host)
+            raise
+        logger.info(f'Successful connected to remote host - {remote_host}')
+        self.breaker.record_success(remote_host)
+        self._jump_sessions[remote_session] = jump_session
+        self.pool.put(pool_key, remote_session)
+        return remote_session
+
+    def _host_key_policy(self, host: str, port):
+        """Get the host key policy of a host, `None` to accept any key"""
+        if self.host_keys is None:
+            return None
+        return self.host_keys.policy(host, port)
+
+    def _reconnect(self, ssh_session: SSHSession) -> bool:
+        """Reopen a dropped session with backoff, and its jump server session
+
+        What is left of the dropped connection is closed first, so that the
+        session is opened on a new transport.
+
+        :return: `True` if the session was reopened
+        """
+        host = ssh_session.host
+        if not self.breaker.allow(host):
+            logger.error(f'Circuit breaker open for {host}, not reconnecting')
+            return False
+
+        jump_session = self._jump_sessions.get(ssh_session)
+
+        def reopen():
+            if jump_session is not None:
+                jump_session.open()
+                ssh_session.proxy_transport = jump_session.ssh_transport
+            ssh_session.open()
+            if not ssh_session.is_active():
+                raise exception.ConnectionError(f'Unable to reopen session to {host}')
+
+        logger.info(f'Reconnecting SSH session to - {host}')
+        ssh_session.close()
+        try:
+            with self._span('reconnect', host, retries=0) as span:
+                self.backoff.call(
+                    reopen,
+                    retry_on=(exception.ConnectionError,),
+                    on_retry=lambda err, delay: self._on_retry(span, host, err, delay)
+                    )
+        except exception.ConnectionError as err:
+            logger.error(err)
+            self.breaker.record_failure(host)
+            return False
+        self.breaker.record_success(host)
+        return True
+
     def run_cmd(
             self,
             ssh_session: SSHSession,
@@ -117,7 +357,10 @@ class RemoteClient:
             logging=False,
             raise_if_error=True,
             continuous_output=False,
-            silent=False
+            silent=False,
+            timeout=None,
+            cacheable=None,
+            compress=False
             ) -> list:
         """Run a specific or multiple commands from SSH session
 
@@ -136,6 +379,15 @@ class RemoteClient:
                 information are used in command)
                 - if parameter is a list, all strings of the command matching an
                 item of the list will be concealed in logs (regexp supported)
+            :param timeout:
+                length in seconds after what a TimeoutError exception is raised
+        :param cacheable: with a client `cache`, `True` to cache the results of
+            `commands`, `False` to bypass the cache, `None` (default) to cache
+            only the commands matching the cache allowlist
+        :param compress: `True` to compress the outputs on the remote host
+            with the best codec it has (see `select_codec`), or a `str` codec
+            of `cmdstream.CODECS`. Outputs are decompressed as they stream in,
+            `continuous_output` is ignored.
         :raises TimeoutError: if command run longer than the specified timeout
         :raises TypeError: if `cmd` parameter is neither a string neither a list of string
         :raises EOFError:
@@ -146,33 +398,84 @@ class RemoteClient:
             `output` and `error` of the executed command
         :rtype: a `list` of RunCmdResult `namedtuple` containing output and
             jumpssh.RunCmdError containing `str` error
+
+        If the session drops, it is reopened after the next delay of the
+        client `backoff` and the remaining commands are resumed from the
+        interrupted one. A failure while the session is still active comes
+        from the command channel, it is not retried.
         """
+        if not self.breaker.allow(ssh_session.host):
+            logger.error(f'Circuit breaker open for {ssh_session.host}')
+            return []
+
+        codec = self.select_codec(ssh_session, compress) if compress else None
+
         outputs = []
-        for cmd in commands:
+        delays = self.backoff.delays()
+        pending = deque(commands)
+        while pending:
+            cmd = pending[0]
             try:
+                use_cache = self.cache is not None and self.cache.is_cacheable(
+                    cmd, cacheable)
+                if use_cache:
+                    output = self.cache.get(ssh_session, cmd)
+                    if output is not None:
+                        outputs.append(output)
+                        pending.popleft()
+                        continue
+
                 if logging:
                     logger.info(f'Executing command: {cmd}')
 
-                # Get jumpssh.RunCmdResult output
-                output = ssh_session.run_cmd(
-                        cmd=cmd,
-                        raise_if_error=raise_if_error,
-                        continuous_output=continuous_output,
-                        silent=silent
-                        )
+                with self._span('run_cmd', ssh_session.host) as span:
+                    try:
+                        if codec:
+                            output = self._run_cmd_compressed(
+                                ssh_session, cmd, codec, span,
+                                raise_if_error=raise_if_error,
+                                timeout=timeout
+                                )
+                        else:
+                            # Get jumpssh.RunCmdResult output
+                            output = ssh_session.run_cmd(
+                                    cmd=cmd,
+                                    raise_if_error=raise_if_error,
+                                    continuous_output=continuous_output,
+                                    silent=silent,
+                                    timeout=timeout
+                                    )
+                    except exception.RunCmdError as err:
+                        span.update(exit_code=err.exit_code, retries=err.runs_nb - 1)
+                        self._check_dropped(ssh_session, cmd, err.exit_code)
+                        raise
+                    self._check_dropped(ssh_session, cmd, output.exit_code)
+                    span.update(exit_code=output.exit_code,
+                                bytes=len(output.output.encode()),
+                                retries=output.runs_nb - 1)
                 outputs.append(output)
+                if use_cache and output.exit_code == 0:
+                    self.cache.set(ssh_session, cmd, output)
             except exception.TimeoutError as err:
                 logger.error(str(err))
                 break
             except TypeError as err:
                 logger.error(str(err))
                 break
-            except EOFError as err:
-                logger.error(str(err))
             except KeyboardInterrupt:
                 break
-            except exception.ConnectionError as err:
+            except (exception.ConnectionError, EOFError, paramiko.SSHException) as err:
                 logger.error(str(err))
+                if ssh_session.is_active():
+                    # The connection is up, the command channel failed
+                    break
+                # Reopen the dropped session and resume from this command
+                delay = next(delays, None)
+                if delay is None:
+                    break
+                time.sleep(delay)
+                if self._reconnect(ssh_session):
+                    continue
                 break
             except exception.RunCmdError as err:
                 if logging:
@@ -182,10 +485,649 @@ class RemoteClient:
                         )
                 # Append jumpssh.exception.RunCmdError to the outputs `list`
                 outputs.append(err)
+            pending.popleft()
+        return outputs
+
+    @staticmethod
+    def _check_dropped(ssh_session: SSHSession, cmd: str, exit_code: int):
+        """Detect a command interrupted by a dropped session
+
+        A command whose channel is closed by a transport drop has no exit
+        status, jumpssh then reports the exit code `-1`.
+
+        :raise EOFError: if the command has no exit status and the session
+            is no longer active
+        """
+        if exit_code == -1 and not ssh_session.is_active():
+            raise EOFError(f"Session to {ssh_session.host} dropped while running '{cmd}'")
+
+    def select_codec(self, ssh_session: SSHSession,
+                     compress: Union[bool, str]=True) -> Union[str, None]:
+        """Pick the codec compressing the outputs of a host
+
+        The compressors installed on the host are probed once and the result
+        is cached per host.
+
+        :param compress: `True` for the first codec of `cmdstream.CODECS`
+            available on both sides, or a `str` codec
+        :return: a `str` codec, `None` if the host has no usable compressor
+        """
+        if isinstance(compress, str):
+            if compress not in CODECS:
+                raise ValueError(f'Unknown codec {compress}, expected one of {list(CODECS)}')
+            return compress
+
+        host = ssh_session.host
+        if host not in self._codecs:
+            codecs = local_codecs()
+            probe = (f'for codec in {" ".join(codecs)}; do '
+                     f'command -v $codec >/dev/null 2>&1 && echo $codec; done')
+            try:
+                remote_codecs = ssh_session.run_cmd(
+                    probe, raise_if_error=False).output.split()
+            except (exception.SSHException, EOFError) as err:
+                logger.error(f'Failed to probe the compressors of {host}: {err}')
+                return None
+            self._codecs[host] = next(
+                (codec for codec in codecs if codec in remote_codecs), None)
+            logger.debug(f'Output codec of {host}: {self._codecs[host]}')
+        return self._codecs[host]
+
+    def _run_cmd_compressed(self, ssh_session: SSHSession, cmd: str, codec: str,
+                            span: dict, raise_if_error=True, timeout=None):
+        """Run a command with its output compressed on the remote host
+
+        :return: a `jumpssh.RunCmdResult`, like `SSHSession.run_cmd`
+        :raises RunCmdError: if the exit code is not 0 and `raise_if_error`
+        """
+        stream = CmdStream(ssh_session=ssh_session, cmd=cmd, timeout=timeout,
+                           tracer=self.tracer, codec=codec)
+        output = ''.join(stream).strip()
+        with self._compression_lock:
+            totals = self.compression.setdefault(ssh_session.host, [0, 0])
+            totals[0] += stream.bytes_received
+            totals[1] += stream.wire_bytes
+        span.update(codec=codec, wire_bytes=stream.wire_bytes)
+
+        if stream.exit_code != 0 and raise_if_error:
+            raise exception.RunCmdError(
+                exit_code=stream.exit_code,
+                success_exit_code=[0],
+                command=cmd,
+                error=output
+                )
+        return jumpssh.session.RunCmdResult(
+            exit_code=stream.exit_code,
+            output=output,
+            result_list=[],
+            command=cmd,
+            success_exit_code=[0],
+            runs_nb=1
+            )
+
+    def compression_ratios(self) -> dict:
+        """Get the compression ratio of the outputs of each host
+
+        :return: a `dict` of output bytes / wire bytes by host
+        """
+        with self._compression_lock:
+            return {host: output_bytes / wire_bytes if wire_bytes else 1.0
+                    for host, (output_bytes, wire_bytes) in self.compression.items()}
+
+    def stream_cmd(
+            self,
+            ssh_session: SSHSession,
+            cmd: str,
+            sink=None,
+            logging=False,
+            compress=False,
+            **kwargs
+            ) -> CmdStream:
+        """Run a command and stream its output instead of buffering it
+
+        :param ssh_session: a SSHSession
+        :param cmd: a `str` command
+        :param sink: optional `str` file path, writable file object or
+            callable receiving each chunk. If provided, the whole output is
+            written to the sink before returning.
+        :param logging: if `True`, logging command's error/info
+        :param compress: `True` or a `str` codec to compress the output on the
+            remote host, see `run_cmd`
+        :param **kwargs: optional args used by `CmdStream`
+            :param lines: if `True`, yield lines instead of raw chunks
+            :param max_line: length after which a line is yielded in pieces
+            :param max_bytes: output size after which the output is truncated
+            :param chunk_size: maximum number of bytes read at once
+            :param timeout: seconds to wait for output before raising `TimeoutError`
+            :param encoding: output encoding, `None` for `bytes`
+        :return: a `CmdStream` iterable over the output chunks/lines, its
+            `exit_code` is `None` if the output was truncated or interrupted
+        :rtype: `CmdStream`
+
+        :Example:
+
+            for line in ssh_client.stream_cmd(remote_session, 'find /', lines=True):
+                print(line, end='')
+        """
+        if logging:
+            logger.info(f'Executing command: {cmd}')
+
+        if compress:
+            kwargs['codec'] = self.select_codec(ssh_session, compress)
+        stream = CmdStream(ssh_session=ssh_session, cmd=cmd,
+                           tracer=self.tracer, **kwargs)
+        if sink is None:
+            return stream
+
+        try:
+            stream.drain(sink)
+            if stream.truncated and logging:
+                logger.warning(
+                    f"Output of command '{cmd}' truncated at {stream.bytes_received} bytes")
+        except exception.TimeoutError as err:
+            logger.error(str(err))
+        except exception.ConnectionError as err:
+            logger.error(str(err))
+        return stream
+
+    def run_cmd_pipelined(
+            self,
+            ssh_session: SSHSession,
+            commands: list,
+            max_channels: int=10,
+            merge=False,
+            logging=False,
+            raise_if_error=True,
+            timeout=None
+            ) -> list:
+        """Run independent commands concurrently over a single SSH session
+
+        Up to `max_channels` exec channels are opened at once on the session's
+        transport, so the round trip latency is paid once per batch instead
+        of once per command.
+
+        :param ssh_session: a SSHSession
+        :param commands: a `list` of independent commands
+        :param max_channels: maximum number of channels opened at the same time
+        :param merge: if `True`, run all commands in one remote shell
+            invocation and split the output with a delimiter, so N commands
+            cost one channel and one round trip
+        :param logging: if `True`, logging command's error/info
+        :param raise_if_error: if `True`, a non-zero exit code is returned as
+            a `RunCmdError` instead of a `RunCmdResult`
+        :param timeout: seconds allowed for each command. When `merge` is
+            `True` the batch has no overall limit, `timeout` is the longest
+            wait for more output of the merged script.
+        :return: a `list` of RunCmdResult/RunCmdError in the order of
+            `commands`. A command which timed out or could not be run is
+            reported by its `jumpssh.exception.SSHException`.
+        :rtype: `list`
+        """
+        if logging:
+            for cmd in commands:
+                logger.info(f'Executing command: {cmd}')
+
+        with self._span('run_cmd_pipelined', ssh_session.host,
+                        commands=len(commands), merge=merge):
+            if merge:
+                results = self._run_cmd_merged(ssh_session, commands, timeout)
+            else:
+                results = self._run_cmd_multiplexed(
+                    ssh_session, commands, max_channels, timeout)
+
+        outputs = []
+        for cmd, result in zip(commands, results):
+            if isinstance(result, exception.SSHException):
+                logger.error(str(result))
+                outputs.append(result)
+                continue
+
+            exit_code, output = result
+            if exit_code != 0 and raise_if_error:
+                err = exception.RunCmdError(
+                    exit_code=exit_code,
+                    success_exit_code=[0],
+                    command=cmd,
+                    error=output
+                    )
+                if logging:
+                    logger.error(
+                        f"Command '{err.command}' returned exit status ({err.exit_code}), "
+                        f"expected {err.success_exit_code}: {err.error}"
+                        )
+                outputs.append(err)
+            else:
+                outputs.append(jumpssh.session.RunCmdResult(
+                    exit_code=exit_code,
+                    output=output,
+                    result_list=[],
+                    command=cmd,
+                    success_exit_code=[0],
+                    runs_nb=1
+                    ))
         return outputs
 
+    @staticmethod
+    def _run_cmd_multiplexed(ssh_session: SSHSession, commands: list,
+                             max_channels: int, timeout) -> list:
+        """Run commands on concurrent channels of one transport
+
+        :return: a `list` of (exit_code, output) `tuple` or
+            `jumpssh.exception.SSHException` in the order of `commands`
+        """
+        ssh_session.open()
+        transport = ssh_session.ssh_transport
+        results = [None] * len(commands)
+        pending = deque(enumerate(commands))
+        # channel -> (command index, start time, received chunks)
+        active = {}
+
+        try:
+            while pending or active:
+                while pending and len(active) < max_channels:
+                    index, cmd = pending.popleft()
+                    try:
+                        channel = transport.open_session()
+                        channel.setblocking(0)
+                        channel.set_combine_stderr(True)
+                        channel.exec_command(cmd)
+                    except Exception as err:
+                        results[index] = exception.ConnectionError(
+                            f"Unable to run command '{cmd}'", original_exception=err)
+                        continue
+                    active[channel] = (index, time.monotonic(), [])
+
+                if not active:
+                    continue
+
+                readable, _, _ = select.select(list(active), [], [], 1)
+                for channel in readable:
+                    index, _, chunks = active[channel]
+                    try:
+                        data = channel.recv(32768)
+                    except socket.timeout:
+                        continue
+                    if data:
+                        chunks.append(data)
+                        continue
+                    # EOF, the remote command has finished
+                    del active[channel]
+                    output = b''.join(chunks).decode('utf-8', errors='replace')
+                    results[index] = (channel.recv_exit_status(), output.strip())
+                    channel.close()
+
+                if timeout:
+                    now = time.monotonic()
+                    for channel, (index, started, _) in list(active.items()):
+                        if now - started > timeout:
+                            del active[channel]
+                            channel.close()
+                            results[index] = exception.TimeoutError(
+                                f"Timeout of {timeout}s reached when calling "
+                                f"command '{commands[index]}'")
+        finally:
+            for channel in active:
+                channel.close()
+        return results
+
+    @staticmethod
+    def _run_cmd_merged(ssh_session: SSHSession, commands: list, timeout) -> list:
+        """Run commands in one remote shell with delimited outputs
+
+        `timeout` applies to each read of the output, as for `CmdStream`.
+
+        :return: a `list` of (exit_code, output) `tuple` or
+            `jumpssh.exception.SSHException` in the order of `commands`
+        """
+        delimiter = f'__pyutils_{uuid.uuid4().hex}__'
+        script = ''.join(
+            f"( {cmd}\n) 2>&1; printf '\\n{delimiter} %d\\n' $?\n"
+            for cmd in commands
+            )
+
+        stream = CmdStream(ssh_session=ssh_session, cmd=script, timeout=timeout)
+        try:
+            output = ''.join(stream)
+        except exception.SSHException as err:
+            return [err] * len(commands)
+
+        # [output_1, exit_code_1, output_2, exit_code_2, ..., trailing]
+        parts = re.split(rf'\n{delimiter} (\d+)\n', output)
+        results = []
+        for index, cmd in enumerate(commands):
+            if 2 * index + 1 < len(parts):
+                results.append((int(parts[2 * index + 1]), parts[2 * index].strip()))
+            else:
+                results.append(exception.ConnectionError(
+                    f"No output received for command '{cmd}'"))
+        return results
+
+    def run_cmd_many(
+            self,
+            jump_session: Union[SSHSession, JumpBalancer],
+            hosts: list,
+            commands: list,
+            max_workers: int=10,
+            timeout: Union[int, float, None]=None,
+            max_failures: Union[int, None]=None,
+            **kwargs
+            ) -> Iterator[HostResult]:
+        """Run commands on many remote hosts concurrently via a jump server
+
+        Remote sessions are opened through the shared `jump_session` and the
+        commands of each host are run by a bounded pool of worker threads.
+
+        :param jump_session: jump server `SSHSession` shared by all hosts, or a
+            `JumpBalancer` spreading the hosts across jump servers
+        :param hosts: a `list` of remote host IP addresses
+        :param commands: a `list` of commands run on every host
+        :param max_workers: maximum number of hosts processed at the same time
+        :param timeout: seconds allowed for running all commands of a host,
+            default is no timeout
+        :param max_failures: number of failed hosts after which the pending
+            hosts are cancelled, default is no failure budget
+        :param **kwargs: optional args passed to `run_cmd`
+        :return: an iterator of `HostResult` yielded as each host finishes
+        :rtype: `Iterator[HostResult]`
+        """
+        if not jump_session:
+            return
+
+        yield from self.fan_out(
+            hosts,
+            lambda host: self._run_host_cmd(
+                jump_session, host, commands, timeout, **kwargs),
+            max_workers=max_workers,
+            max_failures=max_failures
+            )
+
+    @staticmethod
+    def fan_out(hosts: list, worker: Callable, max_workers: int=10,
+                max_failures: Union[int, None]=None,
+                on_error: Union[Callable, None]=None) -> Iterator:
+        """Run `worker(host)` for every host on a bounded thread pool
+
+        This is the fan-out of `run_cmd_many`, `put_many` and `get_many`, to
+        build other per host operations on. The worker runs with the host
+        bound to the log records, see `logger.contextualize`.
+
+        :param hosts: a `list` of hosts
+        :param worker: a callable `worker(host)` returning the result of a
+            host, the result must have a `failed` property
+        :param max_workers: maximum number of hosts processed at the same time
+        :param max_failures: number of failed results after which the pending
+            hosts are cancelled, default is no failure budget
+        :param on_error: a callable `on_error(host, error)` returning the
+            failed result of a host whose worker raised, `error` being the
+            `str` exception. Default is a `HostResult` without outputs.
+        :return: an iterator of results yielded as each host finishes
+        :rtype: `Iterator`
+
+        :Example:
+
+            def uptime(host):
+                with ssh_client.host_session(jump_session, host) as remote_session:
+                    return ssh_client.run_cmd(remote_session, ['uptime'])
+
+            for result in ssh_client.fan_out(hosts, uptime, max_workers=20):
+                ...
+        """
+        on_error = on_error or _failed_host_result
+        failures = 0
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        try:
+            futures = {executor.submit(_in_host_context, worker, host): host
+                       for host in hosts}
+            for future in as_completed(futures):
+                host = futures[future]
+                try:
+                    result = future.result()
+                except Exception as err:
+                    logger.opt(exception=err).error(f'{host}: {err!r}')
+                    result = on_error(host, f'{type(err).__name__}: {err}')
+                yield result
+
+                if result.failed:
+                    failures += 1
+                    if max_failures is not None and failures >= max_failures:
+                        logger.error(
+                            f'{failures} hosts failed, reached the failure '
+                            f'budget of {max_failures}. Cancelling remaining hosts.')
+                        break
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    @contextmanager
+    def jump_channel(self, jump_session: Union[SSHSession, JumpBalancer]
+                     ) -> Iterator[SSHSession]:
+        """Reserve a jump server session for the enclosed block
+
+        A `JumpBalancer` reserves a channel on one of its jump servers until
+        the block exits, a `SSHSession` is yielded as is.
+
+        :param jump_session: jump server `SSHSession` or `JumpBalancer`
+        :raises ConnectionError: if no balanced jump server is available
+        :return: a context manager yielding the jump server `SSHSession`
+        """
+        if isinstance(jump_session, JumpBalancer):
+            with jump_session.acquire() as balanced_session:
+                yield balanced_session
+        else:
+            yield jump_session
+
+    @contextmanager
+    def host_session(self, jump_session: Union[SSHSession, JumpBalancer],
+                     host: str) -> Iterator[SSHSession]:
+        """Check out a remote session of `host` for the enclosed block
+
+        The session is taken from the pool or opened through the jump
+        server, and given back to the pool when the block exits. It must not
+        be closed nor used after the block, the pool may close it.
+
+        :param jump_session: jump server `SSHSession` or `JumpBalancer`
+        :param host: a `str` remote host
+        :raises ConnectionError: if failed to connect SSH to the remote host
+        :return: a context manager yielding the remote `SSHSession`
+        """
+        with self.jump_channel(jump_session) as host_jump_session:
+            remote_session = self._get_remote_session(host_jump_session, host)
+            try:
+                yield remote_session
+            finally:
+                self.pool.release(remote_session)
+
+    def _run_host_cmd(self, jump_session: Union[SSHSession, JumpBalancer],
+                      host: str, commands: list, timeout, **kwargs) -> HostResult:
+        """Open a remote session to `host` and run `commands` on it"""
+        try:
+            with self.host_session(jump_session, host) as remote_session:
+                return self._run_remote_cmd(
+                    remote_session, host, commands, timeout, **kwargs)
+        except exception.ConnectionError as err:
+            logger.error(err)
+            return HostResult(host=host, outputs=[], error=str(err))
+
+    def _run_remote_cmd(self, remote_session: SSHSession, host: str,
+                        commands: list, timeout, **kwargs) -> HostResult:
+        """Run `commands` on a remote session within `timeout` seconds"""
+        deadline = time.monotonic() + timeout if timeout else None
+        outputs = []
+        for cmd in commands:
+            remaining = deadline - time.monotonic() if deadline else None
+            if remaining is not None and remaining <= 0:
+                break
+            outputs.extend(self.run_cmd(
+                ssh_session=remote_session,
+                commands=[cmd],
+                timeout=remaining,
+                **kwargs
+                ))
+
+        if len(outputs) < len(commands):
+            return HostResult(
+                host=host,
+                outputs=outputs,
+                error=f'{len(outputs)} of {len(commands)} commands completed'
+                )
+        return HostResult(host=host, outputs=outputs)
+
+    def put(self, ssh_session: SSHSession, local_path: str, remote_path: str,
+            streams: int=4, **kwargs) -> TransferResult:
+        """Upload a local file over SFTP
+
+        :param ssh_session: a SSHSession, a remote session is tunneled through
+            its jump server
+        :param local_path: a `str` local file path
+        :param remote_path: a `str` remote file path
+        :param streams: number of SFTP channels moving chunks in parallel
+        :param **kwargs: optional args used by `FileTransfer.put`
+            :param resume: if `True`, resume from the remote file size
+            :param compress: if `True`, gzip the file on the fly
+        :return: a `TransferResult`
+        :rtype: `TransferResult`
+        """
+        logger.info(f'Uploading {local_path} to {ssh_session.host}:{remote_path}')
+        try:
+            transferred = FileTransfer(ssh_session, streams=streams).put(
+                local_path, remote_path, **kwargs)
+            return TransferResult(ssh_session.host, local_path, remote_path,
+                                  transferred)
+        except (OSError, zlib.error, exception.SSHException,
+                paramiko.SSHException) as err:
+            logger.error(str(err))
+            return TransferResult(ssh_session.host, local_path, remote_path,
+                                  error=str(err))
+
+    def get(self, ssh_session: SSHSession, remote_path: str, local_path: str,
+            streams: int=4, **kwargs) -> TransferResult:
+        """Download a remote file over SFTP
+
+        :param ssh_session: a SSHSession, a remote session is tunneled through
+            its jump server
+        :param remote_path: a `str` remote file path
+        :param local_path: a `str` local file path
+        :param streams: number of SFTP channels moving chunks in parallel
+        :param **kwargs: optional args used by `FileTransfer.get`
+            :param resume: if `True`, resume from the local file size
+            :param compress: if `True`, gzip the file on the fly
+        :return: a `TransferResult`
+        :rtype: `TransferResult`
+        """
+        logger.info(f'Downloading {ssh_session.host}:{remote_path} to {local_path}')
+        try:
+            transferred = FileTransfer(ssh_session, streams=streams).get(
+                remote_path, local_path, **kwargs)
+            return TransferResult(ssh_session.host, local_path, remote_path,
+                                  transferred)
+        except (OSError, zlib.error, exception.SSHException,
+                paramiko.SSHException) as err:
+            logger.error(str(err))
+            return TransferResult(ssh_session.host, local_path, remote_path,
+                                  error=str(err))
+
+    def put_many(self, jump_session: Union[SSHSession, JumpBalancer], hosts: list,
+                 local_path: str,
+                 remote_path: str, max_workers: int=10,
+                 **kwargs) -> Iterator[TransferResult]:
+        """Distribute a local file to many remote hosts concurrently
+
+        :param jump_session: jump server `SSHSession` shared by all hosts, or a
+            `JumpBalancer`
+        :param hosts: a `list` of remote host IP addresses
+        :param local_path: a `str` local file path
+        :param remote_path: a `str` remote file path
+        :param max_workers: maximum number of hosts processed at the same time
+        :param **kwargs: optional args passed to `put`
+        :return: an iterator of `TransferResult` yielded as each host finishes
+        :rtype: `Iterator[TransferResult]`
+        """
+        if not jump_session:
+            return
+
+        def _put(host):
+            try:
+                with self.host_session(jump_session, host) as remote_session:
+                    return self.put(remote_session, local_path, remote_path, **kwargs)
+            except exception.ConnectionError as err:
+                logger.error(err)
+                return TransferResult(host, local_path, remote_path, error=str(err))
+
+        yield from self.fan_out(
+            hosts, _put, max_workers=max_workers,
+            on_error=lambda host, err: TransferResult(
+                host, local_path, remote_path, error=err))
+
+    def get_many(self, jump_session: Union[SSHSession, JumpBalancer], hosts: list,
+                 remote_path: str,
+                 local_dir: str, max_workers: int=10,
+                 **kwargs) -> Iterator[TransferResult]:
+        """Collect a remote file from many remote hosts concurrently
+
+        Each file is saved as `<local_dir>/<host>/<remote file name>`.
+
+        :param jump_session: jump server `SSHSession` shared by all hosts, or a
+            `JumpBalancer`
+        :param hosts: a `list` of remote host IP addresses
+        :param remote_path: a `str` remote file path
+        :param local_dir: a `str` local directory
+        :param max_workers: maximum number of hosts processed at the same time
+        :param **kwargs: optional args passed to `get`
+        :return: an iterator of `TransferResult` yielded as each host finishes
+        :rtype: `Iterator[TransferResult]`
+        """
+        if not jump_session:
+            return
+
+        def _get(host):
+            local_path = os.path.join(
+                local_dir, host, os.path.basename(remote_path))
+            try:
+                os.makedirs(os.path.dirname(local_path), exist_ok=True)
+                with self.host_session(jump_session, host) as remote_session:
+                    return self.get(remote_session, remote_path, local_path, **kwargs)
+            except (OSError, exception.ConnectionError) as err:
+                logger.error(err)
+                return TransferResult(host, local_path, remote_path, error=str(err))
+
+        yield from self.fan_out(
+            hosts, _get, max_workers=max_workers,
+            on_error=lambda host, err: TransferResult(
+                host, os.path.join(local_dir, host, os.path.basename(remote_path)),
+                remote_path, error=err))
+
     def disconnect(self, ssh_session: SSHSession):
         """Disconnect SSH session"""
         if ssh_session:
             logger.info(f'Disconnecting {ssh_session}')
+            self.pool.discard(ssh_session)
             ssh_session.close()
+
+
+def _failed_host_result(host: str, error: str) -> HostResult:
+    """Get the `HostResult` of a host which failed with `error`"""
+    return HostResult(host=host, outputs=[], error=error)
+
+
+def _in_host_context(worker, host: str):
+    """Run `worker(host)` with the host bound to its log records"""
+    with logger.contextualize(host=host):
+        return worker(host)
+
+
+def _parse_hop(hop: str) -> tuple:
+    """Split a `[user@]host[:port]` hop, `host` may be a `[IPv6]` address
+
+    :return: a `tuple` of (user, host, port), `None` for the missing parts
+    """
+    user, _, address = hop.rpartition('@')
+    port = None
+    if address.startswith('['):
+        host, _, rest = address[1:].partition(']')
+        if rest.startswith(':'):
+            port = rest[1:]
+    elif address.count(':') == 1:
+        host, port = address.split(':')
+    else:
+        host = address
+    return user or None, host, port
+
@@ -0,0 +1,112 @@
+"""Jittered exponential backoff and per host circuit breaker used by the
+RemoteClient to reconnect dropped sessions and fail fast on flapping hosts.
+"""
+import random
+import threading
+import time
+from typing import Callable, Iterator, Union
+
+
+class Backoff:
+    """Exponential backoff with full jitter
+
+    The delay before retry `n` (starting at 0) is a random value between 0
+    and `min(max_delay, base_delay * factor ** n)`, so that many clients
+    reconnecting at the same time do not retry in lockstep.
+
+    :param retries: number of retries after the first attempt
+    :param base_delay: maximum seconds before the first retry
+    :param max_delay: cap of the delay in seconds
+    :param factor: growth of the delay between two retries
+    :param jitter: if `False`, always wait the maximum delay
+    """
+
+    def __init__(self, retries: int=3, base_delay: float=1.0,
+                 max_delay: float=30.0, factor: float=2.0, jitter=True):
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.factor = factor
+        self.jitter = jitter
+
+    def delays(self) -> Iterator[float]:
+        """Get the delay in seconds before each retry"""
+        for attempt in range(self.retries):
+            delay = min(self.max_delay, self.base_delay * self.factor ** attempt)
+            yield random.uniform(0, delay) if self.jitter else delay
+
+    def call(self, func: Callable, retry_on: tuple,
+             on_retry: Union[Callable, None]=None):
+        """Call `func` until it succeeds or the retries are exhausted
+
+        :param func: a callable without arguments
+        :param retry_on: a `tuple` of exception types triggering a retry
+        :param on_retry: an optional callable called with the exception and
+            the delay before each retry
+        :raises: the last exception of `func` if every attempt failed
+        :return: the return value of `func`
+        """
+        delays = self.delays()
+        while True:
+            try:
+                return func()
+            except retry_on as err:
+                delay = next(delays, None)
+                if delay is None:
+                    raise
+                if on_retry is not None:
+                    on_retry(err, delay)
+                time.sleep(delay)
+
+
+class CircuitBreaker:
+    """Per host circuit breaker
+
+    A host failing `failure_threshold` times in a row is rejected without any
+    connection attempt for `reset_timeout` seconds. After that, calls are let
+    through again: the first success closes the circuit and a failure opens
+    it for another `reset_timeout` seconds.
+
+    :param failure_threshold: consecutive failures opening the circuit
+    :param reset_timeout: seconds the circuit stays open
+    """
+
+    def __init__(self, failure_threshold: int=5, reset_timeout: float=60.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        # host -> [consecutive failures, monotonic time the circuit opened]
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def allow(self, host: str) -> bool:
+        """Check whether a call to a host may be attempted"""
+        state = self._hosts.get(host)
+        if state is None or state[1] is None:
+            return True
+        return time.monotonic() - state[1] >= self.reset_timeout
+
+    def state(self, host: str) -> str:
+        """Get the circuit state of a host: `closed`, `open` or `half_open`"""
+        state = self._hosts.get(host)
+        if state is None or state[1] is None:
+            return 'closed'
+        return 'half_open' if self.allow(host) else 'open'
+
+    def record_success(self, host: str):
+        """Close the circuit of a host"""
+        if host in self._hosts:
+            with self._lock:
+                self._hosts.pop(host, None)
+
+    def record_failure(self, host: str):
+        """Count a failure of a host, opening its circuit at the threshold"""
+        with self._lock:
+            state = self._hosts.setdefault(host, [0, None])
+            state[0] += 1
+            if state[0] >= self.failure_threshold:
+                state[1] = time.monotonic()
+
+    def reset(self):
+        """Close the circuits of all hosts"""
+        with self._lock:
+            self._hosts.clear()
@@ -0,0 +1,213 @@
+"""SSH session pool used by the RemoteClient to reuse jump server and remote
+host `SSHSession` objects instead of doing a new SSH handshake per connection.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Union
+
+from logger import logger
+
+if TYPE_CHECKING:
+    from jumpssh import SSHSession
+
+
+class SessionPool:
+    """Pool of opened `SSHSession` keyed by (jump_host, remote_host, user, port)
+
+    `get` and `put` check a session out, it must be given back with `release`
+    once unused. Sessions are evicted in least recently used order when the
+    pool is full, and closed once they have been idle longer than
+    `idle_timeout`. A checked out session, or a jump session tunneling active
+    remote sessions, is never evicted nor closed, the pool may then hold more
+    than `max_size` sessions until they are released.
+
+    :param max_size: maximum number of sessions kept in the pool
+    :param idle_timeout: seconds a session can stay unused before eviction,
+        `None` to never evict idle sessions
+    :param keepalive: seconds between transport keepalive packets,
+        `0` to disable keepalives
+    """
+
+    def __init__(self, max_size: int=64, idle_timeout: Union[int, float, None]=300,
+                 keepalive: int=30):
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.keepalive = keepalive
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+        self._sessions = OrderedDict()
+        # session -> number of checkouts not released yet
+        self._checkouts = {}
+        # sessions removed from the pool while in use, closed once unused
+        self._retired = []
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    @staticmethod
+    def make_key(jump_host: Union[str, None], remote_host: Union[str, None],
+                 user: str, port: Union[int, str, None]=22) -> tuple:
+        """Build a pool key
+
+        :param jump_host: a `str` jump server host, with its port for a remote
+            session, see `hostkeys.host_id`
+        :param remote_host: a `str` remote host, `None` for the jump session
+        :param user: a `str` SSH user
+        :param port: the SSH port of the session, the jump server port for
+            the jump session
+        :return: a `tuple` pool key
+        """
+        return (jump_host, remote_host, user, int(port or 22))
+
+    def get(self, key: tuple) -> Union[SSHSession, None]:
+        """Check out a healthy session from the pool
+
+        :param key: a pool key built with `make_key`
+        :return: an active `SSHSession` to be given back with `release`, or
+            `None` if there is no usable session
+        """
+        with self._lock:
+            expired = self._pop_idle()
+            session = None
+            entry = self._sessions.get(key)
+            if entry is not None:
+                if entry[0].is_active():
+                    session = entry[0]
+                    self._sessions[key] = (session, time.monotonic())
+                    self._sessions.move_to_end(key)
+                    self._checkouts[session] = self._checkouts.get(session, 0) + 1
+                else:
+                    # Drop the dead session, a new one has to be connected
+                    del self._sessions[key]
+                    self.stats['evictions'] += 1
+            self.stats['hits' if session else 'misses'] += 1
+
+        for old_session in expired:
+            self._close(old_session)
+        return session
+
+    def put(self, key: tuple, session: SSHSession):
+        """Add an opened session to the pool, checked out by the caller
+
+        :param key: a pool key built with `make_key`
+        :param session: an opened `SSHSession` to be given back with `release`
+        """
+        if self.keepalive and session.ssh_transport:
+            session.ssh_transport.set_keepalive(self.keepalive)
+
+        with self._lock:
+            entry = self._sessions.get(key)
+            if entry is not None and entry[0] is not session:
+                # Connected concurrently for the same key, keep the new one
+                self._retired.append(entry[0])
+            if session in self._retired:
+                self._retired.remove(session)
+            self._sessions[key] = (session, time.monotonic())
+            self._sessions.move_to_end(key)
+            self._checkouts[session] = self._checkouts.get(session, 0) + 1
+
+            evicted = []
+            for old_key, (old_session, _) in list(self._sessions.items()):
+                if len(self._sessions) <= self.max_size:
+                    break
+                if self._evictable(old_session):
+                    del self._sessions[old_key]
+                    evicted.append(old_session)
+            self.stats['evictions'] += len(evicted)
+
+        for old_session in evicted:
+            self._close(old_session)
+        self._close_retired()
+
+    def release(self, session: SSHSession):
+        """Give back a session checked out with `get` or `put`
+
+        :param session: a `SSHSession` of the pool
+        """
+        with self._lock:
+            count = self._checkouts.get(session, 0) - 1
+            if count > 0:
+                self._checkouts[session] = count
+            else:
+                self._checkouts.pop(session, None)
+            # The idle time of a session starts once it is released
+            for key, (pooled_session, _) in self._sessions.items():
+                if pooled_session is session:
+                    self._sessions[key] = (session, time.monotonic())
+        self._close_retired()
+
+    def discard(self, session: SSHSession):
+        """Remove a session from the pool without closing it
+
+        :param session: a `SSHSession` to be removed
+        """
+        with self._lock:
+            for key, (pooled_session, _) in list(self._sessions.items()):
+                if pooled_session is session:
+                    del self._sessions[key]
+            self._checkouts.pop(session, None)
+            if session in self._retired:
+                self._retired.remove(session)
+
+    def clear(self):
+        """Remove all sessions of the pool and close them
+
+        Sessions in use are closed once released.
+        """
+        with self._lock:
+            self._retired.extend(session for session, _ in self._sessions.values())
+            self._sessions.clear()
+        self._close_retired()
+
+    def _evictable(self, session: SSHSession) -> bool:
+        """`True` if a session is not checked out and does not tunnel active
+        remote sessions. The caller must hold the pool lock.
+        """
+        if self._checkouts.get(session):
+            return False
+        # Copied at once, jumpssh adds remote sessions from other threads
+        remote_sessions = list((getattr(session, 'ssh_remote_sessions', None) or {}).values())
+        return not any(remote_session.is_active() for remote_session in remote_sessions)
+
+    def _pop_idle(self) -> list:
+        """Remove sessions unused for longer than `idle_timeout`
+
+        The caller must hold the pool lock and close the returned sessions.
+
+        :return: a `list` of removed `SSHSession`
+        """
+        if self.idle_timeout is None:
+            return []
+        expiry = time.monotonic() - self.idle_timeout
+        expired = []
+        for key, (session, last_used) in list(self._sessions.items()):
+            if last_used < expiry and self._evictable(session):
+                del self._sessions[key]
+                expired.append(session)
+        self.stats['evictions'] += len(expired)
+        return expired
+
+    def _close_retired(self):
+        """Close the retired sessions which are no longer in use
+
+        Closing a remote session may free its jump session, which is then
+        closed by the next round.
+        """
+        while True:
+            with self._lock:
+                closing = [session for session in self._retired
+                           if self._evictable(session)]
+                for session in closing:
+                    self._retired.remove(session)
+            if not closing:
+                return
+            for session in closing:
+                self._close(session)
+
+    @staticmethod
+    def _close(session: SSHSession):
+        logger.info(f'Closing pooled session {session}')
+        session.close()
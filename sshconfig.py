@@ -0,0 +1,255 @@
+"""Cached SSH config resolution used by the RemoteClient
+
+The SSH config files are parsed once and host lookups are cached until one of
+the files (or a file it includes) is modified, or a file matching an
+`Include` pattern is added or removed.
+"""
+import glob
+import io
+import os
+import threading
+import time
+from typing import Union
+
+from logger import logger
+from utils import lazy_import
+
+# Values a host needs to be connected
+REQUIRED_KEYS = ('hostname', 'user', 'identityfile', 'port')
+
+# Set by a block header which matches the looked up host
+_GUARD_KEY = 'pyutilsguard'
+
+paramiko = lazy_import('paramiko')
+
+
+def default_config_paths() -> list:
+    """Get the default SSH config files in order of precedence
+
+    `setting.cfg` is looked up in the current working directory, then next to
+    this module. `~/.ssh/config` is used for values not set in `setting.cfg`.
+
+    :return: a `list` of `str` file paths
+    """
+    setting_path = os.path.join(os.path.abspath(os.getcwd()), 'setting.cfg')
+    if not os.path.isfile(setting_path):
+        setting_path = os.path.join(
+            os.path.dirname(os.path.abspath(__file__)), 'setting.cfg')
+    return [setting_path, os.path.expanduser('~/.ssh/config')]
+
+
+class SSHConfigResolver:
+    """Parse-once SSH config resolver with per host lookup cache
+
+    :param paths: a `list` of SSH config file paths, the first file setting
+        a value wins. Missing files are skipped. Default is
+        `default_config_paths()`, resolved again when the files are checked
+        so that a change of working directory is followed.
+    :param check_interval: minimum seconds between two checks of the files
+        modification time
+    """
+
+    def __init__(self, paths: Union[list, None]=None, check_interval: float=1.0):
+        self._paths = paths
+        self.check_interval = check_interval
+        self._configs = None
+        # Paths the parsed configs were read from
+        self._loaded_paths = None
+        self._mtimes = {}
+        # Include pattern -> `tuple` of the files it matched
+        self._includes = {}
+        # Host or Match header line -> `paramiko.SSHConfig` matching it
+        self._guards = {}
+        self._lookups = {}
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def paths(self) -> list:
+        """a `list` of the SSH config file paths"""
+        return self._paths if self._paths is not None else default_config_paths()
+
+    def lookup(self, host: str) -> dict:
+        """Get the merged SSH config of a host
+
+        :param host: a `str` host value
+        :return: a `dict` of ssh config
+        :raise FileNotFoundError: if none of the SSH config files exist
+        """
+        now = time.monotonic()
+        with self._lock:
+            if now - self._checked_at >= self.check_interval:
+                paths = self.paths
+                if self._configs is None or paths != self._loaded_paths \
+                        or self._is_stale():
+                    self._load(paths)
+                self._checked_at = now
+
+            cached = self._lookups.get(host)
+            if cached is None:
+                cached = self._lookups[host] = self._merge(host)
+        return dict(cached)
+
+    def connect_config(self, host: str) -> Union[dict, None]:
+        """Get the SSH config of a host to be connected, see `lookup`
+
+        :param host: a `str` host value
+        :return: a `dict` of ssh config having all `REQUIRED_KEYS`, or `None`
+            if the files are missing or a required value is not set
+        """
+        try:
+            ssh_config = self.lookup(host)
+        except FileNotFoundError as err:
+            logger.error(err)
+            return None
+
+        missing = [key for key in REQUIRED_KEYS if key not in ssh_config]
+        if missing:
+            logger.error(
+                    f'{self.paths} does not contain {missing[0]!r} value. '
+                    'Check the setup instructions.'
+                    )
+            return None
+        return ssh_config
+
+    def invalidate(self):
+        """Drop the parsed files and cached lookups"""
+        with self._lock:
+            self._configs = None
+            self._checked_at = 0.0
+
+    def _is_stale(self) -> bool:
+        """Check whether a config file was created, modified or removed, or
+        whether the files matching an `Include` pattern changed"""
+        for path, mtime in self._mtimes.items():
+            try:
+                if os.stat(path).st_mtime_ns != mtime:
+                    return True
+            except FileNotFoundError:
+                if mtime is not None:
+                    return True
+        return any(tuple(sorted(glob.glob(pattern))) != matches
+                   for pattern, matches in self._includes.items())
+
+    def _load(self, paths: list):
+        """Parse all config files and reset the lookup cache"""
+        configs = []
+        mtimes = {}
+        includes = {}
+        for path in paths:
+            segments = self._read(path, mtimes, includes)
+            if segments is not None:
+                configs.append([(tuple(self._guard(header) for header in headers),
+                                 self._parse(text))
+                                for headers, text in segments if text.strip()])
+
+        if not configs:
+            raise FileNotFoundError(
+                f"No SSH config file found in {paths}")
+
+        self._configs = configs
+        self._loaded_paths = paths
+        self._mtimes = mtimes
+        self._includes = includes
+        self._lookups = {}
+
+    def _read(self, path: str, mtimes: dict, includes: dict, headers: tuple=(),
+              depth: int=0) -> Union[list, None]:
+        """Read a config file and the files of its `Include` directives
+
+        Like OpenSSH, an included file applies in the scope of the `Host` or
+        `Match` block of its `Include`, and the lines following the `Include`
+        stay in that block. The file is split at each `Include` into
+        segments parsed separately.
+
+        :param path: a `str` config file path
+        :param mtimes: a `dict` updated with the modification time of every
+            file read, `None` for missing files
+        :param includes: a `dict` updated with the files matched by every
+            `Include` pattern
+        :param headers: a `tuple` of the `Host`/`Match` lines of the blocks
+            the file is included in
+        :return: a `list` of (headers, text) segments in order, a segment
+            applies to the hosts matching all its headers, or `None` if the
+            file does not exist
+        """
+        path = os.path.expanduser(path)
+        try:
+            mtimes[path] = os.stat(path).st_mtime_ns
+            with open(path, 'r') as _file:
+                lines = _file.readlines()
+        except FileNotFoundError:
+            mtimes[path] = None
+            return None
+
+        # Relative Include paths are relative to ~/.ssh like OpenSSH does
+        include_dir = os.path.expanduser('~/.ssh')
+        segments = []
+        header = None
+        content = []
+        for line in lines:
+            words = line.replace('=', ' ', 1).split()
+            keyword = words[0].lower() if words else ''
+            if keyword in ('host', 'match'):
+                header = line
+            if keyword != 'include' or depth >= 16:
+                content.append(line)
+                continue
+
+            segments.append((headers, ''.join(content)))
+            include_headers = headers + (header,) if header else headers
+            for pattern in words[1:]:
+                pattern = os.path.join(include_dir, os.path.expanduser(pattern))
+                matches = includes[pattern] = tuple(sorted(glob.glob(pattern)))
+                for include_path in matches:
+                    included = self._read(include_path, mtimes, includes,
+                                          include_headers, depth + 1)
+                    if included:
+                        segments.extend(included)
+            # The lines after the Include are still in the current block
+            content = [header] if header else []
+        segments.append((headers, ''.join(content)))
+        return segments
+
+    @staticmethod
+    def _parse(text: str):
+        """Parse a config text into a `paramiko.SSHConfig`"""
+        ssh_config = paramiko.SSHConfig()
+        ssh_config.parse(io.StringIO(text))
+        return ssh_config
+
+    def _guard(self, header: str):
+        """Get a `paramiko.SSHConfig` setting `_GUARD_KEY` for the hosts
+        matching a `Host`/`Match` header line"""
+        guard = self._guards.get(header)
+        if guard is None:
+            guard = self._guards[header] = self._parse(
+                f'{header.strip()}\n    {_GUARD_KEY} yes\n')
+        return guard
+
+    def _merge(self, host: str) -> dict:
+        """Merge the lookups of all config files, first value wins
+
+        The identity files of the segments of a file add up like OpenSSH.
+        """
+        merged = {}
+        for segments in self._configs:
+            file_config = {}
+            for guards, ssh_config in segments:
+                if not all(_GUARD_KEY in guard.lookup(host) for guard in guards):
+                    continue
+                for key, value in ssh_config.lookup(host).items():
+                    # paramiko defaults hostname to the host itself
+                    if key == 'hostname' and value == host:
+                        continue
+                    if key == 'identityfile' and key in file_config:
+                        file_config[key] = file_config[key] + [
+                            path for path in value if path not in file_config[key]]
+                    file_config.setdefault(key, value)
+            for key, value in file_config.items():
+                merged.setdefault(key, value)
+        merged.setdefault('hostname', host)
+        return merged
+
+
+default_resolver = SSHConfigResolver()
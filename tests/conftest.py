@@ -0,0 +1,64 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from logger import logger  # noqa: E402
+
+# Keep the test output clean and do not create the log files
+logger.remove()
+
+
+@pytest.fixture(scope='session')
+def ssh_server():
+    """In-process SSH server standing in for the jump server and the remote hosts"""
+    import benchmark
+
+    server = benchmark.StandInSSHServer()
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def ssh_config(ssh_server, tmp_path, monkeypatch):
+    """SSH config of the stand-in server, the remote hop authenticates with
+    the default key of `~/.ssh`"""
+    import paramiko
+
+    from sshconfig import SSHConfigResolver
+
+    (tmp_path / '.ssh').mkdir()
+    key_file = tmp_path / '.ssh' / 'id_rsa'
+    paramiko.RSAKey.generate(1024).write_private_key_file(str(key_file))
+    config_file = tmp_path / 'setting.cfg'
+    config_file.write_text(
+        f'User test\nIdentityFile {key_file}\nPort {ssh_server.port}\n')
+    monkeypatch.setenv('HOME', str(tmp_path))
+    return SSHConfigResolver(paths=[str(config_file)])
+
+
+@pytest.fixture
+def client(ssh_config):
+    from remoteclient import RemoteClient
+    from sessionpool import SessionPool
+
+    client = RemoteClient(pool=SessionPool(), ssh_config=ssh_config)
+    yield client
+    client.pool.clear()
+
+
+@pytest.fixture
+def jump_session(client):
+    jump_session = client.connect_jump_session('127.0.0.1')
+    assert jump_session is not None
+    yield jump_session
+    client.disconnect(jump_session)
+
+
+@pytest.fixture
+def remote_session(client, jump_session):
+    remote_session = client.connect_remote_session(jump_session, '127.0.0.1')
+    assert remote_session is not None
+    return remote_session
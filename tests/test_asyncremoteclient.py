@@ -0,0 +1,155 @@
+import asyncio
+import os
+import subprocess
+import sys
+
+import pytest
+
+from asyncremoteclient import AsyncRemoteClient
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_import_does_not_import_asyncssh():
+    code = ('import sys, asyncremoteclient; '
+            'assert "asyncssh" not in sys.modules, "asyncssh imported"; '
+            'assert "remoteclient" not in sys.modules, "remoteclient imported"')
+    subprocess.run([sys.executable, '-c', code], check=True,
+                   cwd=ROOT)
+
+
+def test_run_cmd_through_jump_session(ssh_config):
+    pytest.importorskip('asyncssh')
+
+    async def run():
+        client = AsyncRemoteClient(ssh_config=ssh_config, remote_user='deploy')
+        jump_session = await client.connect_jump_session('127.0.0.1')
+        assert jump_session is not None
+        remote_session = await client.connect_remote_session(jump_session, '127.0.0.1')
+        assert remote_session is not None
+        try:
+            return remote_session.get_extra_info('username'), await client.run_cmd(
+                remote_session, ['echo ok', 'echo error >&2; exit 3'])
+        finally:
+            await client.disconnect(remote_session)
+            await client.disconnect(jump_session)
+
+    username, outputs = asyncio.run(run())
+
+    assert username == 'deploy'
+    assert outputs[0].exit_code == 0 and outputs[0].output == 'ok'
+    assert outputs[1].exit_code == 3 and outputs[1].error == 'error'
+
+
+def test_missing_config_value_is_not_connected(tmp_path):
+    from sshconfig import SSHConfigResolver
+
+    config_file = tmp_path / 'setting.cfg'
+    config_file.write_text('Port 22\n')
+    client = AsyncRemoteClient(ssh_config=SSHConfigResolver(paths=[str(config_file)]))
+
+    assert asyncio.run(client.connect_jump_session('127.0.0.1')) is None
+
+
+async def connect(client):
+    jump_session = await client.connect_jump_session('127.0.0.1')
+    remote_session = await client.connect_remote_session(jump_session, '127.0.0.1')
+    assert remote_session is not None
+    return jump_session, remote_session
+
+
+async def disconnect(client, *sessions):
+    for session in reversed(sessions):
+        await client.disconnect(session)
+
+
+ENDLESS = 'while true; do echo line; sleep 0.05; done'
+
+
+def test_stream_cmd_early_break_with_aclosing(ssh_config):
+    pytest.importorskip('asyncssh')
+    from contextlib import aclosing
+
+    async def run():
+        client = AsyncRemoteClient(max_concurrency=1, ssh_config=ssh_config)
+        sessions = await connect(client)
+        try:
+            lines = client.stream_cmd(sessions[1], ENDLESS)
+            async with aclosing(lines):
+                async for line in lines:
+                    assert line == 'line\n'
+                    break
+            # The slot is given back, another command can run at once
+            assert not client._semaphore.locked()
+            return await asyncio.wait_for(client.run_cmd(sessions[1], ['echo ok']), 10)
+        finally:
+            await disconnect(client, *sessions)
+
+    outputs = asyncio.run(run())
+    assert outputs[0].output == 'ok'
+
+
+def test_stream_cmd_cancelled(ssh_config):
+    pytest.importorskip('asyncssh')
+
+    async def run():
+        client = AsyncRemoteClient(max_concurrency=1, ssh_config=ssh_config)
+        sessions = await connect(client)
+        started = asyncio.Event()
+
+        async def consume():
+            async for _ in client.stream_cmd(sessions[1], ENDLESS):
+                started.set()
+
+        try:
+            task = asyncio.create_task(consume())
+            await asyncio.wait_for(started.wait(), 10)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            assert not client._semaphore.locked()
+            return await asyncio.wait_for(client.run_cmd(sessions[1], ['echo ok']), 10)
+        finally:
+            await disconnect(client, *sessions)
+
+    outputs = asyncio.run(run())
+    assert outputs[0].output == 'ok'
+
+
+def test_run_cmd_bounded_by_max_concurrency(ssh_config):
+    pytest.importorskip('asyncssh')
+
+    async def run():
+        client = AsyncRemoteClient(max_concurrency=2, ssh_config=ssh_config)
+        sessions = await connect(client)
+        running = peak = 0
+        create_process = sessions[1].create_process
+
+        def counting_create_process(*args, **kwargs):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            process = create_process(*args, **kwargs)
+
+            class Counted:
+                async def __aenter__(self):
+                    return await process.__aenter__()
+
+                async def __aexit__(self, *exc_info):
+                    nonlocal running
+                    running -= 1
+                    return await process.__aexit__(*exc_info)
+
+            return Counted()
+
+        sessions[1].create_process = counting_create_process
+        try:
+            results = await asyncio.gather(*(
+                client.run_cmd(sessions[1], ['sleep 0.2; echo ok']) for _ in range(6)))
+        finally:
+            await disconnect(client, *sessions)
+        return peak, results
+
+    peak, results = asyncio.run(run())
+    assert peak == 2
+    assert [outputs[0].output for outputs in results] == ['ok'] * 6
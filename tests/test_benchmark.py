@@ -0,0 +1,68 @@
+import json
+
+import pytest
+
+import benchmark
+
+
+@pytest.mark.parametrize('size, expected', [
+    ('512', 512), ('1K', 1024), ('10m', 10 * 1024 ** 2), ('1G', 1024 ** 3)])
+def test_parse_size(size, expected):
+    assert benchmark.parse_size(size) == expected
+
+
+def test_summarize():
+    summary = benchmark.summarize([3.0, 1.0, 2.0, 4.0])
+
+    assert summary['median'] == 2.5
+    assert summary['min'] == 1.0
+    assert summary['p95'] == 4.0
+    assert summary['n'] == 4
+
+
+def test_compare_reports_regressions():
+    results = {'benchmarks': {'fast': {'median': 1.0}, 'slow': {'median': 2.0},
+                              'new': {'median': 1.0}}}
+    baseline = {'benchmarks': {'fast': {'median': 1.0}, 'slow': {'median': 1.0}}}
+
+    regressions = benchmark.compare(results, baseline, threshold=0.2)
+
+    assert len(regressions) == 1 and regressions[0].startswith('slow:')
+    assert results['benchmarks']['slow']['baseline_ratio'] == 2.0
+    assert 'baseline_ratio' not in results['benchmarks']['new']
+
+
+def test_ssh_suite_against_the_stand_in_server(tmp_path, monkeypatch):
+    monkeypatch.setenv('HOME', str(tmp_path))
+    output = tmp_path / 'bench.json'
+
+    assert benchmark.main(['--suite', 'ssh', '--sizes', '1K', '--repeat', '1',
+                           '--output', str(output)]) == 0
+
+    benchmarks = json.loads(output.read_text())['benchmarks']
+    assert {'connect_jump_session', 'connect_remote_session'} <= set(benchmarks)
+    assert all(result['median'] > 0 for result in benchmarks.values())
+
+
+def test_baseline_regression_fails(tmp_path):
+    baseline = tmp_path / 'baseline.json'
+    baseline.write_text(json.dumps({'benchmarks': {
+        'is_ip_addr': {'median': 1e-12}}}))
+
+    assert benchmark.main(['--suite', 'micro', '--baseline', str(baseline),
+                           '--output', str(tmp_path / 'bench.json')]) == 1
+
+
+def test_bench_micro_restores_colors(monkeypatch):
+    monkeypatch.setattr(benchmark.TextFormatter, 'enabled', False)
+
+    results = benchmark.bench_micro()
+
+    assert benchmark.TextFormatter.enabled is False
+    assert 'text_formatter_no_color' in results
+
+
+def test_stand_in_server_reply_hook():
+    # The stand-in server starts commands once their request is acknowledged
+    # through this private paramiko method, see `StandInSSHServer._handle`
+    assert callable(getattr(benchmark.paramiko.Transport, '_send_user_message', None))
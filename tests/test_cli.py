@@ -0,0 +1,193 @@
+import re
+
+import pytest
+
+from cli import InteractiveCli, PromptInput, PromptMenu
+from utils import TextFormatter, ValueIndex
+
+
+def make_cli(**kwargs) -> InteractiveCli:
+    menu = [PromptMenu(cmd=cmd, message=f'{cmd} command') for cmd in ('run', 'rm', 'quit')]
+    return InteractiveCli('Title', menu, 'Choose', **kwargs)
+
+
+def test_complete_command():
+    cli = make_cli()
+
+    assert cli.complete_command('r') == ['rm', 'run']
+    cli.menu = [PromptMenu(cmd='reboot', message='')]
+    assert cli.complete_command('r') == ['reboot']
+
+
+def test_value_index_cached():
+    cli = make_cli()
+    valid_values = ['a', 'b']
+
+    index = cli._value_index(valid_values)
+    assert cli._value_index(valid_values) is index
+    given = ValueIndex(['x'])
+    assert cli._value_index(given) is given
+
+
+def test_value_index_per_list():
+    cli = make_cli()
+    valid_values = ['a', 'b']
+    index = cli._value_index(valid_values)
+
+    # A modified prompt is given a new list, indexed on its own
+    replaced = ['a', 'c']
+    assert 'c' in cli._value_index(replaced)
+    assert cli._value_index(valid_values) is index
+
+
+def test_menu_is_rebuilt_when_assigned():
+    cli = make_cli()
+
+    assert isinstance(cli.menu, tuple)
+    with pytest.raises(AttributeError):
+        cli.menu.append(PromptMenu(cmd='reboot', message=''))
+    cli.menu = [*cli.menu, PromptMenu(cmd='reboot', message='')]
+    assert cli.complete_command('re') == ['reboot']
+    assert cli.filter_menu('') == cli.menu
+
+
+class FakeTerminal:
+    """Minimal terminal handling newlines and the cursor up/clear codes"""
+
+    def __init__(self):
+        self.lines = ['']
+        self.row = 0
+
+    def isatty(self) -> bool:
+        return True
+
+    def flush(self):
+        pass
+
+    def write(self, text: str):
+        for token in re.split(r'(\033\[\d*[FJ]|\n)', text):
+            if token == '\n':
+                self.row += 1
+                if self.row == len(self.lines):
+                    self.lines.append('')
+            elif token.endswith('F') and token.startswith('\033['):
+                self.row -= int(token[2:-1])
+            elif token == '\033[J':
+                del self.lines[self.row:]
+                self.lines.append('')
+            else:
+                self.lines[self.row] += token
+
+
+def test_prompt_menu_redraws_prompt_on_errors(monkeypatch):
+    terminal = FakeTerminal()
+    commands = iter(['bad', 'worse', 'run'])
+
+    def fake_input(prompt):
+        command = next(commands)
+        terminal.write(f'{prompt}{command}\n')
+        return command
+
+    monkeypatch.setattr('cli.sys.stdout', terminal)
+    monkeypatch.setattr('builtins.input', fake_input)
+    TextFormatter.set_color(False)
+    try:
+        assert make_cli().prompt_menu() == 'run'
+    finally:
+        TextFormatter.set_color()
+
+    screen = '\n'.join(terminal.lines)
+    assert 'Choose: bad' not in screen
+    assert "'bad'" not in screen
+    assert screen.count('Choose: worse') == 1
+    assert screen.count("The command 'worse' entered is not valid!") == 1
+    assert screen.endswith('Choose: run\n')
+
+
+def batch_cli() -> tuple:
+    cli = make_cli()
+    prompts = {'run': [PromptInput('Host', 'ip'), PromptInput('Count', 'integer')]}
+    return cli, prompts
+
+
+def test_validate_batch():
+    cli, prompts = batch_cli()
+    result = cli.validate_batch([
+        '# comment',
+        'run 10.0.0.1 3',
+        ['run', '10.0.0.2', '4'],
+        {'cmd': 'run', 'Host': '10.0.0.3', 'Count': '5'},
+        {'cmd': 'run', 'inputs': ['bad', 'x']},
+        'rm',
+        'nope',
+        ], prompts)
+
+    assert [(row.line, row.cmd, row.inputs) for row in result.rows] == [
+        (2, 'run', ['10.0.0.1', '3']),
+        (3, 'run', ['10.0.0.2', '4']),
+        (4, 'run', ['10.0.0.3', '5']),
+        (6, 'rm', []),
+        ]
+    assert [(error.line, error.field) for error in result.errors] == [
+        (5, 'Host'), (5, 'Count'), (7, 'cmd')]
+
+
+@pytest.mark.parametrize('row, message', [
+    ('run "10.0.0.1 3', 'No closing quotation'),
+    ({'cmd': 5}, "Invalid command 5"),
+    ({'cmd': ['run'], 'inputs': []}, "Invalid command ['run']"),
+    ({'cmd': 'run', 'inputs': '10.0.0.1 3'}, 'Invalid inputs'),
+    ([None, '10.0.0.1'], 'Invalid command None'),
+    (42, 'Invalid batch row 42'),
+])
+def test_validate_batch_malformed_rows(row, message):
+    cli, prompts = batch_cli()
+    result = cli.validate_batch(['run 10.0.0.1 3', row], prompts)
+
+    assert len(result.rows) == 1
+    error, = result.errors
+    assert (error.line, error.field) == (2, 'cmd')
+    assert message in error.message
+
+
+def test_run_batch_jsonl(tmp_path):
+    cli, prompts = batch_cli()
+    path = tmp_path / 'batch.jsonl'
+    path.write_text('{"cmd": "run", "inputs": ["10.0.0.1", "1"]}\n\n'
+                    '{"cmd": 1}\n'
+                    '{"cmd": "run", "Host": "10.0.0.2", "Count": "2"}\n')
+    handled = []
+
+    result = cli.run_batch(str(path), lambda cmd, inputs: handled.append(inputs), prompts)
+    assert result.failed and result.rows == [] and handled == []
+    assert [(error.line, error.field) for error in result.errors] == [(3, 'cmd')]
+
+    result = cli.run_batch(str(path), lambda cmd, inputs: handled.append(inputs), prompts,
+                           stop_on_error=False)
+    assert handled == [['10.0.0.1', '1'], ['10.0.0.2', '2']]
+    assert [row.line for row in result.rows] == [1, 4]
+
+
+def test_validate_batch_malformed_jsonl_line(tmp_path):
+    cli, prompts = batch_cli()
+    path = tmp_path / 'batch.jsonl'
+    path.write_text('{"cmd": "run", "inputs": ["10.0.0.1", "1"]}\n'
+                    '{"cmd": "run", "inputs": [\n'
+                    '["run", "10.0.0.2", "2"]\n')
+
+    result = cli.validate_batch(str(path), prompts)
+
+    assert [row.line for row in result.rows] == [1, 3]
+    error, = result.errors
+    assert (error.line, error.field) == (2, 'cmd')
+    assert error.message.startswith('Invalid JSON line')
+
+
+@pytest.mark.parametrize('content', ['{"cmd": "run"}', '"run 10.0.0.1 1"', '1'])
+def test_validate_batch_json_not_a_list(tmp_path, content):
+    cli, prompts = batch_cli()
+    path = tmp_path / 'batch.json'
+    path.write_text(content)
+
+    with pytest.raises(ValueError, match='expected a list of rows'):
+        cli.validate_batch(str(path), prompts)
@@ -0,0 +1,101 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+
+from cmdcache import CommandCache, MemoryBackend, SQLiteBackend
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def make_backend(request, tmp_path):
+    def make(**kwargs):
+        if request.param == 'memory':
+            return MemoryBackend(**kwargs)
+        return SQLiteBackend(str(tmp_path / 'cache.db'), **kwargs)
+    return make
+
+
+def test_backend_expires_results(make_backend):
+    backend = make_backend()
+    backend.set(('host', 'root', 'uname'), (0, 'Linux'), time.time() + 60)
+    backend.set(('host', 'root', 'date'), (0, 'today'), time.time() - 1)
+
+    assert backend.get(('host', 'root', 'uname')) == (0, 'Linux')
+    assert backend.get(('host', 'root', 'date')) is None
+
+
+def test_backend_evicts_least_recently_used(make_backend):
+    backend = make_backend(max_entries=2)
+    expires = time.time() + 60
+    backend.set(('host', 'root', 'a'), (0, 'a'), expires)
+    backend.set(('host', 'root', 'b'), (0, 'b'), expires)
+    backend.get(('host', 'root', 'a'))
+    backend.set(('host', 'root', 'c'), (0, 'c'), expires)
+
+    assert backend.get(('host', 'root', 'b')) is None
+    assert backend.get(('host', 'root', 'a')) == (0, 'a')
+    assert backend.evictions == 1
+
+
+def test_backend_max_bytes(make_backend):
+    backend = make_backend(max_bytes=10)
+    expires = time.time() + 60
+    backend.set(('host', 'root', 'a'), (0, 'x' * 6), expires)
+    backend.set(('host', 'root', 'b'), (0, 'y' * 6), expires)
+
+    assert backend.get(('host', 'root', 'a')) is None
+    assert backend.get(('host', 'root', 'b')) == (0, 'y' * 6)
+
+
+def test_backend_invalidate_host(make_backend):
+    backend = make_backend()
+    expires = time.time() + 60
+    backend.set(('a', 'root', 'uname'), (0, 'a'), expires)
+    backend.set(('b', 'root', 'uname'), (0, 'b'), expires)
+    backend.invalidate('a')
+
+    assert backend.get(('a', 'root', 'uname')) is None
+    assert backend.get(('b', 'root', 'uname')) == (0, 'b')
+
+
+def test_is_cacheable():
+    cache = CommandCache(allowlist=[r'uname -a', r'cat /etc/\S+'])
+
+    assert cache.is_cacheable('cat /etc/hosts')
+    assert not cache.is_cacheable('cat /etc/hosts; reboot')
+    assert not cache.is_cacheable('date')
+    assert cache.is_cacheable('date', cacheable=True)
+    assert not cache.is_cacheable('uname -a', cacheable=False)
+
+
+def test_stats_count_concurrent_lookups():
+    cache = CommandCache(ttl=60)
+    session = SimpleNamespace(host='a', username='root')
+    cache.backend.set(('a', 'root', 'uname'), (0, 'Linux'), time.time() + 60)
+
+    def lookup(index):
+        for _ in range(1000):
+            cache.get(session, 'uname' if index % 2 else 'date')
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lookup, range(8)))
+
+    assert cache.stats == {'hits': 4000, 'misses': 4000}
+    assert cache.hit_rate == 0.5
+    assert cache.get(session, 'uname').output == 'Linux'
+
+
+def test_run_cmd_serves_cached_results(client, jump_session, tmp_path):
+    cache = client.cache = CommandCache(ttl=60)
+    counter = tmp_path / 'runs'
+    cmd = f'echo run >> {counter}; echo ok'
+
+    first = client.run_cmd(jump_session, [cmd], cacheable=True)
+    second = client.run_cmd(jump_session, [cmd], cacheable=True)
+    client.run_cmd(jump_session, [cmd], cacheable=False)
+
+    assert first[0].output == second[0].output == 'ok'
+    assert second[0].runs_nb == 0
+    assert counter.read_text().split() == ['run', 'run']
+    assert cache.stats == {'hits': 1, 'misses': 1}
@@ -0,0 +1,56 @@
+import pytest
+
+from cmdstream import CmdStream
+
+
+def test_stream_chunks(remote_session):
+    stream = CmdStream(remote_session, 'seq 1 20000', chunk_size=1024)
+    chunks = list(stream)
+
+    assert len(chunks) > 1
+    assert ''.join(chunks).split() == [str(number) for number in range(1, 20001)]
+    assert stream.exit_code == 0
+    assert stream.bytes_received == len(''.join(chunks))
+
+
+def test_stream_lines(remote_session):
+    stream = CmdStream(remote_session, 'printf "a\\nbb\\nccc"; exit 4', lines=True,
+                       chunk_size=2)
+
+    assert list(stream) == ['a\n', 'bb\n', 'ccc']
+    assert stream.exit_code == 4
+
+
+@pytest.mark.parametrize('encoding', ['utf-8', None])
+def test_line_without_newline_is_yielded_in_pieces(remote_session, encoding):
+    stream = CmdStream(remote_session, "head -c 10000 /dev/zero | tr '\\0' x; echo; echo end",
+                       lines=True, max_line=4096, chunk_size=1000, encoding=encoding)
+
+    assert [len(line) for line in stream] == [4096, 4096, 1809, 4]
+
+
+def test_max_bytes_truncates(remote_session):
+    stream = CmdStream(remote_session, 'seq 1 100000', max_bytes=100)
+
+    assert len(''.join(stream)) == 100
+    assert stream.truncated
+    assert stream.exit_code is None
+
+
+def test_compressed_output_is_inflated_in_bounded_chunks(remote_session):
+    stream = CmdStream(remote_session, 'head -c 20000000 /dev/zero; exit 5',
+                       codec='gzip', encoding=None, chunk_size=65536)
+    sizes = [len(chunk) for chunk in stream]
+
+    assert max(sizes) <= 65536
+    assert sum(sizes) == 20000000
+    assert stream.wire_bytes < 100000
+    assert stream.exit_code == 5
+
+
+def test_compressed_output_max_bytes(remote_session):
+    stream = CmdStream(remote_session, 'head -c 20000000 /dev/zero',
+                       codec='gzip', encoding=None, max_bytes=100000)
+
+    assert sum(len(chunk) for chunk in stream) == 100000
+    assert stream.truncated
@@ -0,0 +1,193 @@
+import os
+
+import pytest
+
+from delta import DeltaCollector, DeltaStore
+
+BLOCK_SIZE = 1024
+
+
+@pytest.fixture
+def collector(client):
+    collector = DeltaCollector(client, DeltaStore(':memory:'), block_size=BLOCK_SIZE)
+    # Record the scripts of each round trip
+    collector.scripts = []
+    stream = collector._stream
+
+    def _stream(ssh_session, script, codec, timeout):
+        collector.scripts.append(script)
+        return stream(ssh_session, script, codec, timeout)
+
+    collector._stream = _stream
+    return collector
+
+
+def content(size: int, seed: str='a') -> bytes:
+    return (seed * size).encode()
+
+
+def test_blocks_first_collection_in_one_round_trip(collector, remote_session, tmp_path):
+    path = tmp_path / 'data'
+    path.write_bytes(content(10 * BLOCK_SIZE))
+
+    result = collector.get_file(remote_session, str(path))
+    assert not result.failed and result.changed
+    assert result.content == path.read_bytes()
+    assert len(collector.scripts) == 1
+
+
+def test_blocks_transfers_changed_blocks(collector, remote_session, tmp_path):
+    path = tmp_path / 'data'
+    data = bytearray(content(10 * BLOCK_SIZE))
+    path.write_bytes(data)
+    collector.get_file(remote_session, str(path))
+
+    unchanged = collector.get_file(remote_session, str(path))
+    assert not unchanged.changed and unchanged.content == bytes(data)
+
+    data[5 * BLOCK_SIZE + 10] = ord('b')
+    path.write_bytes(bytes(data) + b'tail')
+    collector.scripts.clear()
+    result = collector.get_file(remote_session, str(path))
+    assert result.changed and result.content == bytes(data) + b'tail'
+    assert len(collector.scripts) == 2
+    assert result.bytes_transferred < 4 * BLOCK_SIZE
+
+
+def test_blocks_command_output(collector, remote_session, tmp_path):
+    path = tmp_path / 'data'
+    path.write_bytes(content(8 * BLOCK_SIZE))
+    cmd = f'cat {path}; echo done >&2'
+    collector.run_cmd(remote_session, cmd)
+
+    path.write_bytes(content(8 * BLOCK_SIZE, 'c')[:BLOCK_SIZE] + content(7 * BLOCK_SIZE))
+    result = collector.run_cmd(remote_session, cmd)
+    assert result.changed and result.exit_code == 0
+    assert result.content == path.read_bytes() + b'done\n'
+    assert len(collector.scripts) == 3
+
+
+def test_blocks_removes_the_command_output_if_the_fetch_fails(
+        collector, remote_session, tmp_path, monkeypatch):
+    path = tmp_path / 'data'
+    path.write_bytes(content(8 * BLOCK_SIZE))
+    cmd = f'cat {path}'
+    collector.run_cmd(remote_session, cmd)
+    path.write_bytes(content(8 * BLOCK_SIZE, 'c'))
+
+    tmp_files = []
+    parse = collector._parse
+
+    def _parse(payload, exit_code):
+        header = parse(payload, exit_code)
+        tmp_files.append(header[5])
+        return header
+
+    stream = collector._stream
+
+    def _stream(ssh_session, script, codec, timeout):
+        if script.startswith('f='):
+            # The session drops before the fetch script runs
+            raise EOFError('dropped')
+        return stream(ssh_session, script, codec, timeout)
+
+    monkeypatch.setattr(collector, '_parse', _parse)
+    collector._stream = _stream
+    result = collector.run_cmd(remote_session, cmd)
+    assert result.failed and 'dropped' in result.error
+    tmp, = tmp_files
+    assert tmp != '-' and not os.path.exists(tmp)
+
+
+def test_blocks_without_gnu_split(collector, remote_session, tmp_path, monkeypatch):
+    # A split without --filter, like on BSD
+    bin_dir = tmp_path / 'bin'
+    bin_dir.mkdir()
+    (bin_dir / 'split').write_text('#!/bin/sh\nexit 1\n')
+    (bin_dir / 'split').chmod(0o755)
+    monkeypatch.setenv('PATH', f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    path = tmp_path / 'data'
+    data = bytearray(content(10 * BLOCK_SIZE))
+    path.write_bytes(data)
+    collector.get_file(remote_session, str(path))
+
+    data[2 * BLOCK_SIZE] = ord('b')
+    path.write_bytes(bytes(data))
+    collector.scripts.clear()
+    result = collector.get_file(remote_session, str(path))
+    assert result.changed and result.content == bytes(data)
+    assert len(collector.scripts) == 2
+    assert result.bytes_transferred < 4 * BLOCK_SIZE
+
+
+def test_collect_reports_transport_errors(collector, remote_session, tmp_path):
+    import paramiko
+
+    def _stream(ssh_session, script, codec, timeout):
+        raise paramiko.SSHException('No existing session')
+
+    collector._stream = _stream
+    result = collector.get_file(remote_session, str(tmp_path / 'data'))
+
+    assert result.failed and 'No existing session' in result.error
+
+
+def test_tail(collector, remote_session, tmp_path):
+    path = tmp_path / 'log'
+    path.write_bytes(b'line 1\n')
+    assert collector.get_file(remote_session, str(path), mode='tail').content == b'line 1\n'
+
+    with open(path, 'ab') as log:
+        log.write(b'line 2\n')
+    result = collector.get_file(remote_session, str(path), mode='tail')
+    assert result.content == b'line 2\n' and result.size == 14
+
+    unchanged = collector.get_file(remote_session, str(path), mode='tail')
+    assert not unchanged.changed and unchanged.content == b''
+
+    # A rotated log is transferred whole
+    path.write_bytes(b'new\n')
+    assert collector.get_file(remote_session, str(path), mode='tail').content == b'new\n'
+
+
+@pytest.mark.parametrize('mode', ['mtime', 'checksum'])
+def test_whole_file_modes(collector, remote_session, tmp_path, mode):
+    path = tmp_path / 'data'
+    path.write_bytes(b'abc')
+    assert collector.get_file(remote_session, str(path), mode=mode).changed
+
+    result = collector.get_file(remote_session, str(path), mode=mode)
+    assert not result.changed and result.content == b'abc'
+    assert collector.stats['unchanged'] == 1
+
+
+def test_missing_file(collector, remote_session, tmp_path):
+    result = collector.get_file(remote_session, str(tmp_path / 'missing'))
+
+    assert result.failed and 'No such file' in result.error
+
+
+def test_collect_many(collector, client, jump_session, tmp_path):
+    path = tmp_path / 'data'
+    path.write_bytes(b'abc')
+    hosts = ['127.0.0.40', '127.0.0.41']
+
+    results = sorted(collector.collect_many(jump_session, hosts, paths=[str(path)],
+                                            commands=['echo ok']),
+                     key=lambda result: result.host)
+    assert [result.host for result in results] == hosts
+    assert all(not result.failed for result in results)
+    assert [[delta.output for delta in result.results] for result in results] == [
+        ['abc', 'ok\n']] * 2
+    assert client.pool._checkouts == {jump_session: 1}
+
+
+def test_collect_many_raising_worker(collector, client, jump_session, monkeypatch):
+    def fail(*args, **kwargs):
+        raise RuntimeError('boom')
+
+    monkeypatch.setattr(collector, 'get_file', fail)
+    result, = collector.collect_many(jump_session, ['127.0.0.42'], paths=['/etc/hostname'])
+
+    assert result.failed and result.error == 'RuntimeError: boom'
+    assert client.pool._checkouts == {jump_session: 1}
@@ -0,0 +1,85 @@
+import pytest
+
+from exception import (IKEAuthError, IKEError, IKEIDirError, IKELogClassifier,
+                       IKEProposalError, IKETimeoutError, IKEUknownError)
+
+LOG = """\
+Oct 17 10:00:00 gw charon: 09[IKE] <site-a|1> initiating IKE_SA site-a[1] to 10.0.0.1
+Oct 17 10:00:01 gw charon: 09[IKE] <site-a|1> received AUTHENTICATION_FAILED notify error
+Oct 17 10:00:01 gw charon: 09[IKE] <site-a|1> establishing CHILD_SA site-a{1} failed
+Oct 17 10:00:02 gw charon: 10[NET] sending packet: from 10.0.0.2[500] to 10.0.0.1[500]
+Oct 17 10:00:03 gw charon: 11[IKE] initiating IKE_SA site-b[2] to 10.0.0.3
+Oct 17 10:00:33 gw charon: 11[IKE] giving up after 5 retransmits
+Oct 17 10:00:34 gw charon: 12[IKE] <site-c|3> establishing CHILD_SA site-c{3} failed
+Oct 17 10:00:35 gw charon: 13[CFG] <site-d|4> received proposals inacceptable, NO_PROPOSAL_CHOSEN
+"""
+
+
+def test_classify():
+    classifier = IKELogClassifier()
+    records = list(classifier.classify(LOG.splitlines()))
+
+    assert [(record.error_type, record.child_sa, record.line_number)
+            for record in records] == [
+        (IKEAuthError, 'site-a', 2),
+        (IKETimeoutError, 'site-b', 6),
+        (IKEUknownError, 'site-c', 7),
+        (IKEProposalError, 'site-d', 8),
+        ]
+    assert records[0].error == 'received AUTHENTICATION_FAILED notify error'
+    assert classifier.counts == {
+        'site-a': {'IKEAuthError': 1},
+        'site-b': {'IKETimeoutError': 1},
+        'site-c': {'IKEUknownError': 1},
+        'site-d': {'IKEProposalError': 1},
+        }
+    assert classifier.lines == 8
+
+
+def test_classify_streams_across_calls():
+    classifier = IKELogClassifier()
+    lines = LOG.splitlines()
+    first = list(classifier.classify(lines[:4]))
+    second = list(classifier.classify(iter(lines[4:])))
+
+    assert len(first) == 1 and len(second) == 3
+    assert second[0].line_number == 6
+
+
+def test_classify_idir_error():
+    line = "[IKE] <site-e|5> IDir '172.24.22.4' does not match to 'site-a@test.com'"
+    record, = IKELogClassifier().classify([line])
+
+    assert record.error_type is IKEIDirError
+    assert record.child_sa == 'site-e'
+    assert isinstance(record.to_exception(), IKEIDirError)
+
+
+def test_record_message():
+    record, = IKELogClassifier().classify(
+        ["[IKE] <site-a|1> received NO_PROPOSAL_CHOSEN notify error"])
+
+    assert record.message == IKEProposalError(
+        'site-a', 'received NO_PROPOSAL_CHOSEN notify error').message
+    assert 'phase-1/phase-2' in record.message
+
+
+@pytest.mark.parametrize('error_type, expected', [
+    (IKEAuthError, "[IKE] Establishing CHILD_SA 'site-a' failed: boom"),
+    (IKEUknownError, "[IKE] Establishing CHILD_SA 'site-a' failed: Unknown IKE error\nboom"),
+])
+def test_exception_message(error_type, expected):
+    err = error_type('site-a', 'boom')
+
+    assert str(err) == err.message == expected
+    assert error_type.format_message('site-a', 'boom') == expected
+    assert isinstance(err, IKEError)
+    assert (err.child_sa, err.error) == ('site-a', 'boom')
+
+
+@pytest.mark.parametrize('error', [{'a': 1}, ['x'], 42])
+def test_exception_message_of_non_str_error(error):
+    err = IKEAuthError('sa', error)
+
+    assert err.message == f"[IKE] Establishing CHILD_SA 'sa' failed: {error}"
+    assert err.error is error
@@ -0,0 +1,118 @@
+import paramiko
+import pytest
+
+import hostkeys
+from hostkeys import HostKeyStore, host_id
+
+
+@pytest.fixture(scope='module')
+def keys():
+    return paramiko.RSAKey.generate(1024), paramiko.RSAKey.generate(1024)
+
+
+def line(host, key):
+    return f'{host} {key.get_name()} {key.get_base64()}\n'
+
+
+def test_host_id():
+    assert host_id('10.0.0.1') == '10.0.0.1'
+    assert host_id('10.0.0.1', '2222') == '[10.0.0.1]:2222'
+    assert host_id('10.0.0.1', None) == '10.0.0.1'
+
+
+def test_pin_and_save(tmp_path, keys):
+    path = tmp_path / 'ssh' / 'known_hosts'
+    store = HostKeyStore(str(path))
+    store.verify('[10.0.0.1]:2222', keys[0])
+    store.verify('[10.0.0.1]:2222', keys[0])
+    assert not path.exists()
+
+    store.save()
+    assert path.read_text() == line('[10.0.0.1]:2222', keys[0])
+    assert oct(path.stat().st_mode & 0o777) == '0o600'
+
+    reloaded = HostKeyStore(str(path))
+    assert len(reloaded) == 1
+    reloaded.verify('[10.0.0.1]:2222', keys[0])
+    with pytest.raises(paramiko.BadHostKeyException):
+        reloaded.verify('[10.0.0.1]:2222', keys[1])
+
+
+def test_unknown_host_not_pinned(tmp_path, keys):
+    store = HostKeyStore(str(tmp_path / 'known_hosts'), pin=False)
+
+    with pytest.raises(paramiko.SSHException):
+        store.verify('10.0.0.1', keys[0])
+    assert store.lookup('10.0.0.1') == {}
+
+
+@pytest.mark.parametrize('patterns, host, revoked', [
+    ('10.0.0.1', '10.0.0.1', True),
+    ('10.0.0.2,10.0.0.1', '10.0.0.1', True),
+    ('*', '[10.0.0.1]:2222', True),
+    ('10.0.0.?', '10.0.0.1', True),
+    ('[10.0.0.1]:2222', '[10.0.0.1]:2222', True),
+    ('[10.0.0.1]:2222', '1:2222', False),
+    ('10.0.0.2', '10.0.0.1', False),
+])
+def test_revoked_key_rejected(tmp_path, keys, patterns, host, revoked):
+    path = tmp_path / 'known_hosts'
+    # Even if the key is also pinned for the host
+    path.write_text('@revoked ' + line(patterns, keys[0]) + line(host, keys[0]))
+    store = HostKeyStore(str(path))
+
+    if revoked:
+        with pytest.raises(paramiko.SSHException, match='Revoked'):
+            store.verify(host, keys[0])
+    else:
+        store.verify(host, keys[0])
+
+
+@pytest.mark.parametrize('patterns, host, known', [
+    ('10.0.0.*', '10.0.0.1', True),
+    ('10.0.0.*,!10.0.0.2', '10.0.0.2', False),
+    ('!10.0.0.2,10.0.0.*', '10.0.0.3', True),
+    ('!10.0.0.1', '10.0.0.1', False),
+    ('[10.0.0.?]:2222', '[10.0.0.1]:2222', True),
+])
+def test_pattern_keys(tmp_path, keys, patterns, host, known):
+    path = tmp_path / 'known_hosts'
+    path.write_text(line(patterns, keys[0]))
+    store = HostKeyStore(str(path), pin=False)
+
+    assert len(store) == 0
+    if known:
+        assert store.lookup(host) == {keys[0].get_name(): keys[0].get_base64()}
+        store.verify(host, keys[0])
+        with pytest.raises(paramiko.BadHostKeyException):
+            store.verify(host, keys[1])
+    else:
+        assert store.lookup(host) == {}
+        with pytest.raises(paramiko.SSHException, match='Unknown'):
+            store.verify(host, keys[0])
+
+
+def test_negated_revoked_pattern(tmp_path, keys):
+    path = tmp_path / 'known_hosts'
+    path.write_text('@revoked ' + line('10.0.0.*,!10.0.0.2', keys[0]))
+    store = HostKeyStore(str(path))
+
+    with pytest.raises(paramiko.SSHException, match='Revoked'):
+        store.verify('10.0.0.1', keys[0])
+    store.verify('10.0.0.2', keys[0])
+    store.save()
+
+
+def test_atexit_registered_once(tmp_path, keys, monkeypatch):
+    registered = []
+    monkeypatch.setattr(hostkeys.atexit, 'register', registered.append)
+    stores = [HostKeyStore(str(tmp_path / f'known_hosts_{index}')) for index in range(3)]
+    assert registered == []
+
+    stores[0].verify('10.0.0.1', keys[0])
+    # Only the stores with pending keys are kept until exit
+    assert hostkeys._unsaved == {stores[0]}
+    hostkeys._save_stores()
+    assert hostkeys._unsaved == set()
+    assert (tmp_path / 'known_hosts_0').read_text() == line('10.0.0.1', keys[0])
+    assert not (tmp_path / 'known_hosts_1').exists()
@@ -0,0 +1,98 @@
+import json
+
+import pytest
+
+pytest.importorskip('numpy')
+
+from inventory import Inventory  # noqa: E402
+
+RECORDS = [
+    {'address': '10.20.1.2', 'site': 'X', 'role': 'fw'},
+    {'address': '10.20.1.1', 'site': 'Y', 'role': 'gw'},
+    {'address': 'fe80::1', 'site': 'X', 'role': 'gw'},
+    {'address': '10.24.0.1', 'site': 'X', 'role': 'fw'},
+    {'address': 'bad', 'site': 'X'},
+    {'address': '10.20.1.2', 'site': 'Z', 'role': 'dup'},
+    {'address': ' 192.168.0.1 ', 'site': None},
+]
+
+
+@pytest.fixture
+def inventory():
+    return Inventory(RECORDS)
+
+
+def test_hosts_sorted_and_deduplicated(inventory):
+    assert inventory.hosts == ['10.20.1.1', '10.20.1.2', '10.24.0.1', '192.168.0.1', 'fe80::1']
+    assert list(inventory.errors) == [4]
+    # The first record of a duplicate address is kept
+    assert inventory.record(1) == {'address': '10.20.1.2', 'site': 'X', 'role': 'fw'}
+    assert len(inventory) == 5
+
+
+@pytest.mark.parametrize('filters, hosts', [
+    ({}, ['10.20.1.1', '10.20.1.2', '10.24.0.1', '192.168.0.1', 'fe80::1']),
+    ({'cidr': '10.20.0.0/14'}, ['10.20.1.1', '10.20.1.2']),
+    ({'cidr': ['10.24.0.0/16', '192.168.0.0/24']}, ['10.24.0.1', '192.168.0.1']),
+    ({'cidr': '10.20.1.2/32'}, ['10.20.1.2']),
+    ({'cidr': 'fe80::/10'}, ['fe80::1']),
+    ({'cidr': '0.0.0.0/0'}, ['10.20.1.1', '10.20.1.2', '10.24.0.1', '192.168.0.1']),
+    ({'version': 4, 'site': 'X'}, ['10.20.1.2', '10.24.0.1']),
+    ({'version': 6}, ['fe80::1']),
+    ({'site': 'X', 'role': ['gw', 'fw']}, ['10.20.1.2', '10.24.0.1', 'fe80::1']),
+    ({'site': None}, ['192.168.0.1']),
+    ({'site': 'Z'}, []),
+    ({'cidr': '10.0.0.0/8', 'role': 'gw'}, ['10.20.1.1']),
+])
+def test_select(inventory, filters, hosts):
+    assert inventory.select(**filters) == hosts
+
+
+@pytest.mark.parametrize('filters', [
+    {'cidr': 'not-a-network'},
+    {'version': 5},
+    {'rack': 'A'},
+])
+def test_select_invalid_filter(inventory, filters):
+    with pytest.raises(ValueError):
+        inventory.select(**filters)
+
+
+def test_numeric_attribute_values():
+    inventory = Inventory([{'address': '10.0.0.1', 'rack': '7'}])
+
+    assert inventory.select(rack=7) == ['10.0.0.1']
+
+
+@pytest.mark.parametrize('name, content', [
+    ('inventory.csv', 'address,site\n10.0.0.2,X\n10.0.0.1,Y\n'),
+    ('inventory.json', json.dumps([{'address': '10.0.0.2', 'site': 'X'},
+                                   {'address': '10.0.0.1', 'site': 'Y'}])),
+    ('inventory.jsonl', '{"address": "10.0.0.2", "site": "X"}\n\n'
+                        '{"address": "10.0.0.1", "site": "Y"}\n'),
+])
+def test_load(tmp_path, name, content):
+    path = tmp_path / name
+    path.write_text(content)
+    inventory = Inventory.load(str(path))
+
+    assert inventory.hosts == ['10.0.0.1', '10.0.0.2']
+    assert inventory.select(site='X') == ['10.0.0.2']
+
+
+def test_load_unsupported_extension(tmp_path):
+    path = tmp_path / 'inventory.yaml'
+    path.write_text('')
+
+    with pytest.raises(ValueError):
+        Inventory.load(str(path))
+
+
+def test_large_inventory():
+    records = [{'address': f'10.{index >> 16 & 255}.{index >> 8 & 255}.{index & 255}',
+                'site': f'site-{index % 7}'} for index in range(100000)]
+    inventory = Inventory(records)
+
+    hosts = inventory.select(cidr='10.1.0.0/16', site='site-3')
+    assert len(hosts) == len([index for index in range(65536, 100000) if index % 7 == 3])
+    assert hosts[0] == '10.1.0.1'
@@ -0,0 +1,40 @@
+from exception import IKEAuthError, IKEUknownError
+from ipsechealth import TunnelHealth
+
+
+def make_health(client, **kwargs) -> TunnelHealth:
+    # `site-up` is INSTALLED, the other CHILD_SAs print a charon error
+    check_cmd = ('if [ {child_sa} = site-up ]; then echo INSTALLED; else '
+                 'echo "[IKE] <{child_sa}|1> received AUTHENTICATION_FAILED notify error"; '
+                 'exit 1; fi')
+    return TunnelHealth(client, max_workers=4, timeout=10, check_cmd=check_cmd, **kwargs)
+
+
+def test_sweep(client, jump_session):
+    report = make_health(client).sweep(jump_session, {
+        '127.0.0.20': ['site-up', 'site-auth'],
+        '127.0.0.21': ['site-up'],
+        })
+
+    assert report.counts == {'up': 2, 'IKEAuthError': 1}
+    failed, = report.failed
+    assert (failed.gateway, failed.child_sa) == ('127.0.0.20', 'site-auth')
+    assert isinstance(failed.error, IKEAuthError)
+    # The gateway sessions are given back to the pool
+    assert client.pool._checkouts == {jump_session: 1}
+
+
+def test_sweep_raising_gateway(client, jump_session, monkeypatch):
+    def fail(*args, **kwargs):
+        raise RuntimeError('boom')
+
+    monkeypatch.setattr(client, 'run_cmd_pipelined', fail)
+    results = list(make_health(client).iter_sweep(
+        jump_session, {'127.0.0.22': ['site-a', 'site-b']}))
+
+    result, = results
+    assert result.failed
+    assert result.error == 'RuntimeError: boom'
+    assert [tunnel.child_sa for tunnel in result.tunnels] == ['site-a', 'site-b']
+    assert all(isinstance(tunnel.error, IKEUknownError) for tunnel in result.tunnels)
+    assert client.pool._checkouts == {jump_session: 1}
@@ -0,0 +1,118 @@
+import threading
+
+import pytest
+
+from jumpbalancer import JumpBalancer
+from remoteclient import RemoteClient
+from retry import CircuitBreaker
+from sessionpool import SessionPool
+
+
+class FakeClient:
+    """RemoteClient connecting fake jump sessions, `down` hosts fail"""
+
+    def __init__(self, down=()):
+        self.down = set(down)
+        self.breaker = CircuitBreaker(failure_threshold=1)
+        self.connects = []
+        self.released = []
+        self.pool = self
+
+    def connect_jump_session(self, host):
+        self.connects.append(host)
+        return None if host in self.down else f'session-{host}'
+
+    def release(self, session):
+        self.released.append(session)
+
+
+def test_least_connections():
+    balancer = JumpBalancer(FakeClient(), ['a', 'b'])
+
+    with balancer.acquire() as first, balancer.acquire() as second:
+        assert {first, second} == {'session-a', 'session-b'}
+        assert balancer.active == {'a': 1, 'b': 1}
+    assert balancer.active == {'a': 0, 'b': 0}
+    assert sorted(balancer.client.released) == ['session-a', 'session-b']
+
+
+def test_round_robin():
+    balancer = JumpBalancer(FakeClient(), ['a', 'b', 'c'], strategy='round_robin')
+
+    sessions = []
+    for _ in range(4):
+        with balancer.acquire() as jump_session:
+            sessions.append(jump_session)
+    assert sessions == ['session-a', 'session-b', 'session-c', 'session-a']
+
+
+def test_failover_marks_host_down():
+    client = FakeClient(down={'a'})
+    balancer = JumpBalancer(client, ['a', 'b'], down_time=60)
+
+    with balancer.acquire() as jump_session:
+        assert jump_session == 'session-b'
+    with balancer.acquire() as jump_session:
+        assert jump_session == 'session-b'
+    # The down host is not retried during its down time
+    assert client.connects == ['a', 'b', 'b']
+    assert balancer.active == {'a': 0, 'b': 0}
+
+
+def test_no_jump_server_available():
+    balancer = JumpBalancer(FakeClient(down={'a', 'b'}), ['a', 'b'])
+
+    with pytest.raises(Exception, match='No jump server available'):
+        with balancer.acquire():
+            pass
+    assert balancer.active == {'a': 0, 'b': 0}
+
+
+def test_circuit_breaker_skips_host():
+    client = FakeClient()
+    client.breaker.record_failure('a')
+    balancer = JumpBalancer(client, ['a', 'b'])
+
+    with balancer.acquire() as jump_session:
+        assert jump_session == 'session-b'
+    assert client.connects == ['b']
+
+
+def test_max_channels_waits_for_release():
+    balancer = JumpBalancer(FakeClient(), ['a'], max_channels=1)
+
+    with balancer.acquire():
+        with pytest.raises(Exception, match='No free channel'):
+            with balancer.acquire(timeout=0.1):
+                pass
+
+    acquired = threading.Event()
+    with balancer.acquire():
+        def wait():
+            with balancer.acquire(timeout=10):
+                acquired.set()
+        thread = threading.Thread(target=wait)
+        thread.start()
+        assert not acquired.wait(0.2)
+    thread.join(10)
+    assert acquired.is_set()
+
+
+def test_jump_hosts_required():
+    with pytest.raises(ValueError):
+        JumpBalancer(FakeClient(), [])
+
+
+def test_run_cmd_many_through_balancer(ssh_config):
+    client = RemoteClient(pool=SessionPool(), ssh_config=ssh_config)
+    balancer = JumpBalancer(client, ['127.0.0.1', '127.0.0.2'], max_channels=2)
+    hosts = [f'127.0.0.{number}' for number in range(10, 16)]
+    try:
+        results = list(client.run_cmd_many(balancer, hosts, ['echo ok'], max_workers=4))
+    finally:
+        client.pool.clear()
+
+    assert sorted(result.host for result in results) == hosts
+    assert all(not result.failed for result in results)
+    assert [result.outputs[0].output.strip() for result in results] == ['ok'] * 6
+    assert balancer.active == {'127.0.0.1': 0, '127.0.0.2': 0}
@@ -0,0 +1,124 @@
+import gzip
+import json
+import threading
+
+import pytest
+
+import logger as logger_module
+from logger import AsyncSink, RotatingFileWriter, create_logger
+
+
+class SlowStream:
+    """Stream blocking its writes until released"""
+
+    def __init__(self):
+        self.released = threading.Event()
+        self.writes = []
+        self.closed = False
+
+    def write(self, text: str):
+        self.released.wait()
+        self.writes.append(text)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def loguru_logger():
+    """Restore the test logger configuration, i.e. no sinks"""
+    yield
+    logger_module.logger.remove()
+    logger_module._close_async_sinks()
+
+
+def test_rotating_file_writer(tmp_path):
+    path = str(tmp_path / 'logs' / 'app.log')
+    writer = RotatingFileWriter(path, max_bytes=10, backup_count=2)
+    for line in ('aaaaaaaa\n', 'bbbbbbbb\n', 'cccccccc\n', 'dddddddd\n'):
+        writer.write(line)
+    writer.close()
+
+    assert open(path).read() == 'dddddddd\n'
+    assert gzip.open(f'{path}.1.gz', 'rt').read() == 'cccccccc\n'
+    assert gzip.open(f'{path}.2.gz', 'rt').read() == 'bbbbbbbb\n'
+    assert sorted(p.name for p in (tmp_path / 'logs').iterdir()) == [
+        'app.log', 'app.log.1.gz', 'app.log.2.gz']
+
+
+def test_rotating_file_writer_uncompressed_append(tmp_path):
+    path = tmp_path / 'app.log'
+    path.write_text('old\n')
+    writer = RotatingFileWriter(str(path), max_bytes=8, backup_count=1, compress=False)
+    writer.write('new\n')
+    writer.write('next\n')
+    writer.close()
+
+    assert (tmp_path / 'app.log.1').read_text() == 'old\nnew\n'
+    assert path.read_text() == 'next\n'
+
+
+def test_rotating_file_writer_created_on_first_write(tmp_path):
+    path = tmp_path / 'logs' / 'app.log'
+    writer = RotatingFileWriter(str(path))
+    writer.flush()
+    writer.close()
+
+    assert not path.parent.exists()
+
+
+def test_async_sink_batches_and_closes():
+    stream = SlowStream()
+    stream.released.set()
+    sink = AsyncSink(stream, flush_interval=0.01)
+    for index in range(100):
+        sink(f'{index}\n')
+    sink.close()
+
+    assert ''.join(stream.writes) == ''.join(f'{index}\n' for index in range(100))
+    assert len(stream.writes) < 100
+    assert stream.closed
+
+
+@pytest.mark.parametrize('policy, kept', [
+    ('drop_new', ['0\n', '1\n']),
+    ('drop_old', ['3\n', '4\n']),
+])
+def test_async_sink_full_buffer(policy, kept):
+    stream = SlowStream()
+    sink = AsyncSink(stream, max_queue=2, policy=policy, flush_interval=0.01)
+    # The writer thread takes the first message and blocks writing it
+    sink('first\n')
+    while not sink._queue.empty():
+        threading.Event().wait(0.01)
+    for index in range(5):
+        sink(f'{index}\n')
+    stream.released.set()
+    sink.close()
+
+    assert sink.dropped == 3
+    written = ''.join(stream.writes)
+    assert written == 'first\n' + ''.join(kept) + '3 log messages dropped\n'
+
+
+@pytest.mark.parametrize('non_blocking', [False, True])
+def test_create_logger_json_sink(tmp_path, monkeypatch, loguru_logger, non_blocking):
+    stream = SlowStream()
+    stream.released.set()
+    monkeypatch.setattr('logger.stdout', stream)
+    error_path = tmp_path / 'errors.log'
+    json_path = tmp_path / 'logs.jsonl'
+    custom_logger = create_logger(non_blocking=non_blocking, error_path=str(error_path),
+                                  json_path=str(json_path))
+    custom_logger.bind(host='10.0.0.1').info('connected')
+    custom_logger.remove()
+    logger_module._close_async_sinks()
+
+    record = json.loads(json_path.read_text().splitlines()[0])['record']
+    assert record['message'] == 'connected'
+    assert record['extra'] == {'host': '10.0.0.1'}
+    # The error file is only created by the first error
+    assert not error_path.exists()
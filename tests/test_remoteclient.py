@@ -0,0 +1,259 @@
+import threading
+
+import pytest
+
+from remoteclient import HostResult, RemoteClient
+
+
+def test_run_cmd_many(client, jump_session):
+    hosts = ['127.0.0.1', '127.0.0.2', '127.0.0.3']
+    results = list(client.run_cmd_many(jump_session, hosts, ['echo ok'], max_workers=2))
+
+    assert sorted(result.host for result in results) == hosts
+    for result in results:
+        assert not result.failed
+        assert result.outputs[0].output.strip() == 'ok'
+
+
+def test_fan_out_reports_raising_worker_as_failed_host():
+    def worker(host):
+        if host == 'bad':
+            raise RuntimeError('boom')
+        return HostResult(host=host, outputs=[])
+
+    results = {result.host: result for result in RemoteClient.fan_out(
+        ['good', 'bad', 'other'], worker, max_workers=2)}
+
+    assert set(results) == {'good', 'bad', 'other'}
+    assert results['bad'].failed
+    assert results['bad'].error == 'RuntimeError: boom'
+    assert not results['good'].failed
+
+
+def test_fan_out_on_error_builds_the_failed_result():
+    def worker(host):
+        raise ValueError(host)
+
+    results = list(RemoteClient.fan_out(
+        ['a'], worker, max_workers=1,
+        on_error=lambda host, error: HostResult(host, ['partial'], error)))
+
+    assert results == [HostResult('a', ['partial'], 'ValueError: a')]
+
+
+@pytest.mark.parametrize('max_failures', [1, 2])
+def test_fan_out_failure_budget_counts_raising_workers(max_failures):
+    def worker(host):
+        raise RuntimeError(host)
+
+    results = list(RemoteClient.fan_out(
+        [str(index) for index in range(10)], worker, max_workers=1,
+        max_failures=max_failures))
+
+    assert len(results) == max_failures
+
+
+@pytest.mark.parametrize('merge', [False, True])
+def test_run_cmd_pipelined_keeps_command_order(client, remote_session, merge):
+    commands = [f'sleep 0.0{9 - index}; echo {index}' for index in range(10)]
+    outputs = client.run_cmd_pipelined(remote_session, commands, max_channels=4,
+                                       merge=merge)
+
+    assert [output.output for output in outputs] == [str(index) for index in range(10)]
+
+
+@pytest.mark.parametrize('merge', [False, True])
+def test_run_cmd_pipelined_failed_command(client, remote_session, merge):
+    import jumpssh.exception
+
+    outputs = client.run_cmd_pipelined(
+        remote_session, ['echo ok', 'echo failed >&2; exit 2'], merge=merge)
+    assert outputs[0].exit_code == 0
+    assert isinstance(outputs[1], jumpssh.exception.RunCmdError)
+    assert outputs[1].exit_code == 2 and outputs[1].error == 'failed'
+
+    outputs = client.run_cmd_pipelined(
+        remote_session, ['exit 2'], merge=merge, raise_if_error=False)
+    assert outputs[0].exit_code == 2
+
+
+def test_run_cmd_pipelined_timeout(client, remote_session):
+    import jumpssh.exception
+
+    outputs = client.run_cmd_pipelined(
+        remote_session, ['echo fast', 'sleep 5'], timeout=0.5)
+
+    assert outputs[0].output == 'fast'
+    assert isinstance(outputs[1], jumpssh.exception.TimeoutError)
+
+
+def drop(ssh_session):
+    """Close the transport of a session as a network drop would"""
+    try:
+        ssh_session.ssh_transport.close()
+    except EOFError:
+        # Closing the tunnel channel after the jump side closed it
+        pass
+
+
+@pytest.mark.parametrize('raise_if_error', [True, False])
+def test_run_cmd_resumes_after_drop(client, remote_session, tmp_path, raise_if_error):
+    marker = tmp_path / 'marker'
+    # The first run is interrupted by the drop, the retry completes
+    cmd = f'if [ -f {marker} ]; then echo resumed; else touch {marker}; sleep 10; fi'
+    timer = threading.Timer(1, drop, [remote_session])
+    timer.start()
+    try:
+        outputs = client.run_cmd(remote_session, ['echo first', cmd, 'echo last'],
+                                 raise_if_error=raise_if_error)
+    finally:
+        timer.cancel()
+
+    assert [output.output.strip() for output in outputs] == ['first', 'resumed', 'last']
+    assert remote_session.is_active()
+
+
+def test_run_cmd_gives_up_when_reconnect_fails(client, remote_session, monkeypatch):
+    monkeypatch.setattr(client, '_reconnect', lambda ssh_session: False)
+    timer = threading.Timer(1, drop, [remote_session])
+    timer.start()
+    try:
+        outputs = client.run_cmd(remote_session, ['sleep 10', 'echo never'])
+    finally:
+        timer.cancel()
+
+    assert outputs == []
+
+
+def test_run_cmd_waits_for_the_backoff_before_resuming(client, remote_session, tmp_path):
+    from retry import Backoff
+
+    delays = []
+    client.backoff = Backoff(retries=2, base_delay=0.2, jitter=False)
+    backoff_delays = client.backoff.delays
+    client.backoff.delays = lambda: (delays.append(delay) or delay
+                                     for delay in backoff_delays())
+    marker = tmp_path / 'marker'
+    cmd = f'if [ -f {marker} ]; then echo resumed; else touch {marker}; sleep 10; fi'
+    timer = threading.Timer(1, drop, [remote_session])
+    timer.start()
+    try:
+        outputs = client.run_cmd(remote_session, [cmd])
+    finally:
+        timer.cancel()
+
+    assert [output.output for output in outputs] == ['resumed']
+    assert delays == [0.2]
+
+
+def test_run_cmd_does_not_retry_channel_failures(client, remote_session, monkeypatch):
+    import paramiko
+
+    calls = []
+
+    def run_cmd(cmd, **kwargs):
+        calls.append(cmd)
+        raise paramiko.SSHException('Channel closed.')
+
+    monkeypatch.setattr(client, '_reconnect', lambda ssh_session: pytest.fail('reconnected'))
+    monkeypatch.setattr(remote_session, 'run_cmd', run_cmd)
+
+    assert client.run_cmd(remote_session, ['echo one', 'echo two']) == []
+    assert calls == ['echo one']
+    assert remote_session.is_active()
+
+
+@pytest.fixture
+def proxy_client(ssh_server, ssh_config, tmp_path):
+    from sessionpool import SessionPool
+    from sshconfig import SSHConfigResolver
+
+    config_file = tmp_path / 'proxy.cfg'
+    config_file.write_text(
+        'Host bastion-2\n    HostName 127.0.0.2\n    ProxyJump bastion-1\n'
+        'Host bastion-3\n    HostName 127.0.0.3\n    ProxyJump test@bastion-1:%d,bastion-2\n'
+        'Host loop\n    ProxyJump loop\n'
+        'Host bastion-*\n    HostName 127.0.0.1\n'
+        '%s' % (ssh_server.port, (tmp_path / 'setting.cfg').read_text()))
+    client = RemoteClient(pool=SessionPool(),
+                          ssh_config=SSHConfigResolver(paths=[str(config_file)]))
+    yield client
+    client.pool.clear()
+
+
+def test_hop_chain(proxy_client, ssh_server):
+    assert proxy_client._hop_chain('bastion-1') == ['bastion-1']
+    assert proxy_client._hop_chain('bastion-2') == ['bastion-1', 'bastion-2']
+    assert proxy_client._hop_chain('bastion-3') == [
+        f'test@bastion-1:{ssh_server.port}', 'bastion-2', 'bastion-3']
+    assert proxy_client._hop_chain('loop') is None
+
+
+@pytest.mark.parametrize('hop, expected', [
+    ('bastion', (None, 'bastion', None)),
+    ('admin@bastion:2222', ('admin', 'bastion', '2222')),
+    ('[fe80::1]:22', (None, 'fe80::1', '22')),
+    ('fe80::1', (None, 'fe80::1', None)),
+])
+def test_parse_hop(hop, expected):
+    from remoteclient import _parse_hop
+
+    assert _parse_hop(hop) == expected
+
+
+def test_connect_jump_session_through_proxy_jump(proxy_client, ssh_server):
+    from sessionpool import SessionPool
+
+    jump_session = proxy_client.connect_jump_session('bastion-3')
+    assert jump_session is not None
+    assert jump_session.host == '127.0.0.3'
+    assert jump_session.run_cmd('echo ok').output.strip() == 'ok'
+
+    # The first hop is pooled and kept while it tunnels the next hops
+    first_hop = proxy_client.pool.get(
+        SessionPool.make_key('127.0.0.1', None, 'test', ssh_server.port))
+    assert first_hop is not None and first_hop.is_active()
+    proxy_client.pool.release(first_hop)
+    assert not proxy_client.pool._evictable(first_hop)
+
+    results = list(proxy_client.run_cmd_many(jump_session, ['127.0.0.10'], ['echo ok']))
+    assert [result.outputs[0].output.strip() for result in results] == ['ok']
+    proxy_client.disconnect(jump_session)
+
+
+def test_host_session_releases_the_session(client, jump_session):
+    with client.host_session(jump_session, '127.0.0.30') as remote_session:
+        assert remote_session.is_active()
+        assert client.pool._checkouts[remote_session] == 1
+    assert remote_session not in client.pool._checkouts
+
+    with pytest.raises(RuntimeError):
+        with client.host_session(jump_session, '127.0.0.30') as pooled_session:
+            assert pooled_session is remote_session
+            raise RuntimeError('boom')
+    assert remote_session not in client.pool._checkouts
+
+
+def test_jump_channel(client, jump_session):
+    from jumpbalancer import JumpBalancer
+
+    with client.jump_channel(jump_session) as session:
+        assert session is jump_session
+
+    balancer = JumpBalancer(client, ['127.0.0.1'])
+    with client.jump_channel(balancer) as session:
+        assert session is jump_session
+        assert balancer.active == {'127.0.0.1': 1}
+    assert balancer.active == {'127.0.0.1': 0}
+
+
+def test_pool_key_includes_the_port(client, jump_session):
+    default_port = client._get_remote_session(jump_session, '127.0.0.50')
+    other_port = client._get_remote_session(jump_session, '127.0.0.50', port=2222)
+    assert default_port is not other_port
+    client.pool.release(default_port)
+    client.pool.release(other_port)
+
+    pooled = client._get_remote_session(jump_session, '127.0.0.50', port=2222)
+    assert pooled is other_port
+    client.pool.release(pooled)
@@ -0,0 +1,111 @@
+from remoteclient import RemoteClient
+from sessionpool import SessionPool
+
+
+class FakeSession:
+    """Stand-in `SSHSession` recording whether it was closed"""
+
+    def __init__(self, remote_sessions=None):
+        self.ssh_transport = None
+        self.ssh_remote_sessions = remote_sessions if remote_sessions is not None else {}
+        self.closed = False
+
+    def is_active(self):
+        return not self.closed
+
+    def close(self):
+        for remote_session in self.ssh_remote_sessions.values():
+            remote_session.close()
+        self.closed = True
+
+
+def test_get_hits_a_released_session():
+    pool = SessionPool()
+    session = FakeSession()
+    pool.put(('jump', 'a', 'root'), session)
+    pool.release(session)
+
+    assert pool.get(('jump', 'a', 'root')) is session
+    assert pool.get(('jump', 'b', 'root')) is None
+    assert pool.stats['hits'] == 1 and pool.stats['misses'] == 1
+
+
+def test_lru_eviction_skips_checked_out_sessions():
+    pool = SessionPool(max_size=2)
+    sessions = [FakeSession() for _ in range(3)]
+    for index, session in enumerate(sessions):
+        pool.put(('jump', str(index), 'root'), session)
+
+    # All checked out, the pool grows past max_size instead of closing them
+    assert len(pool) == 3
+    assert not any(session.closed for session in sessions)
+
+    pool.release(sessions[0])
+    pool.put(('jump', '3', 'root'), FakeSession())
+    assert sessions[0].closed
+    assert not sessions[1].closed and not sessions[2].closed
+
+
+def test_jump_session_tunneling_active_remote_sessions_is_kept():
+    remote_session = FakeSession()
+    jump_session = FakeSession({'a': remote_session})
+    pool = SessionPool(max_size=1)
+    pool.put(('jump', None, 'root'), jump_session)
+    pool.release(jump_session)
+    pool.put(('jump', 'a', 'root'), remote_session)
+
+    assert not jump_session.closed
+
+    pool.release(remote_session)
+    pool.put(('jump', 'b', 'root'), FakeSession())
+    assert remote_session.closed
+
+
+def test_idle_sweep_skips_checked_out_sessions():
+    pool = SessionPool(idle_timeout=0)
+    busy, idle = FakeSession(), FakeSession()
+    pool.put(('jump', 'busy', 'root'), busy)
+    pool.put(('jump', 'idle', 'root'), idle)
+    pool.release(idle)
+
+    pool.get(('jump', 'other', 'root'))
+    assert idle.closed
+    assert not busy.closed
+
+
+def test_clear_closes_sessions_in_use_once_released():
+    remote_session = FakeSession()
+    jump_session = FakeSession({'a': remote_session})
+    idle = FakeSession()
+    pool = SessionPool()
+    pool.put(('jump', None, 'root'), jump_session)
+    pool.put(('jump', 'a', 'root'), remote_session)
+    pool.put(('jump', 'idle', 'root'), idle)
+    pool.release(idle)
+    pool.release(jump_session)
+
+    pool.clear()
+    assert len(pool) == 0
+    assert idle.closed
+    assert not remote_session.closed and not jump_session.closed
+
+    pool.release(remote_session)
+    assert remote_session.closed and jump_session.closed
+
+
+def test_fan_out_over_more_hosts_than_max_size(ssh_config):
+    client = RemoteClient(pool=SessionPool(max_size=4), ssh_config=ssh_config)
+    jump_session = client.connect_jump_session('127.0.0.1')
+    hosts = [f'127.0.0.{index}' for index in range(1, 75)]
+    try:
+        results = list(client.run_cmd_many(
+            jump_session, hosts, ['echo ok'], max_workers=4))
+
+        assert sorted(result.host for result in results) == sorted(hosts)
+        assert not [result for result in results if result.failed]
+        assert jump_session.is_active()
+        # Sessions still in use during the last eviction stay pooled
+        assert len(client.pool) <= 4 + 4
+    finally:
+        client.pool.clear()
+        client.disconnect(jump_session)
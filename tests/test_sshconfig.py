@@ -0,0 +1,142 @@
+import os
+import threading
+
+import pytest
+
+from sshconfig import SSHConfigResolver
+
+
+@pytest.fixture
+def home(tmp_path, monkeypatch):
+    monkeypatch.setenv('HOME', str(tmp_path))
+    (tmp_path / '.ssh').mkdir()
+    return tmp_path
+
+
+def resolver(path, **kwargs):
+    return SSHConfigResolver(paths=[str(path)], check_interval=0, **kwargs)
+
+
+def touch_later(path, text):
+    """Rewrite a file with a later modification time"""
+    mtime = os.stat(path).st_mtime_ns if os.path.exists(path) else 0
+    path.write_text(text)
+    os.utime(path, ns=(mtime + 10 ** 9, mtime + 10 ** 9))
+
+
+def test_first_value_wins_across_files(home):
+    first, second = home / 'first.cfg', home / 'second.cfg'
+    first.write_text('Host jump\n    User admin\n')
+    second.write_text('User other\nPort 2222\n')
+    config = SSHConfigResolver(paths=[str(first), str(second), str(home / 'missing')])
+
+    assert config.lookup('jump') == {
+        'user': 'admin', 'port': '2222', 'hostname': 'jump'}
+    assert config.lookup('other')['user'] == 'other'
+
+
+def test_missing_files_raise(home):
+    with pytest.raises(FileNotFoundError):
+        resolver(home / 'missing').lookup('host')
+
+
+def test_include_applies_in_the_scope_of_its_block(home):
+    (home / '.ssh' / 'jump.conf').write_text('User admin\nHost *\n    Port 2200\n')
+    config_file = home / 'config'
+    config_file.write_text(
+        'Host jump\n'
+        '    Include jump.conf\n'
+        '    HostName jump.example.com\n'
+        'Host *\n'
+        '    User default\n'
+        '    Port 22\n')
+    config = resolver(config_file)
+
+    assert config.lookup('jump') == {
+        'user': 'admin', 'port': '2200', 'hostname': 'jump.example.com'}
+    # Pasting the file in place would leak its blocks out of `Host jump`
+    assert config.lookup('other') == {
+        'user': 'default', 'port': '22', 'hostname': 'other'}
+
+
+def test_lines_after_include_stay_at_top_level(home):
+    (home / '.ssh' / 'hosts.conf').write_text('Host db\n    Port 5022\n')
+    config_file = home / 'config'
+    config_file.write_text('Include hosts.conf\nUser admin\n')
+    config = resolver(config_file)
+
+    assert config.lookup('db')['port'] == '5022'
+    assert config.lookup('web') == {'user': 'admin', 'hostname': 'web'}
+
+
+def test_identity_files_add_up_across_includes(home):
+    (home / '.ssh' / 'keys.conf').write_text('IdentityFile ~/.ssh/second\n')
+    config_file = home / 'config'
+    config_file.write_text('IdentityFile ~/.ssh/first\nInclude keys.conf\n')
+
+    assert resolver(config_file).lookup('host')['identityfile'] == [
+        str(home / '.ssh' / 'first'), str(home / '.ssh' / 'second')]
+
+
+def test_new_file_matching_include_glob_is_loaded(home):
+    config_dir = home / '.ssh' / 'config.d'
+    config_dir.mkdir()
+    config_file = home / 'config'
+    config_file.write_text('Include config.d/*.conf\nUser default\n')
+    config = resolver(config_file)
+    assert config.lookup('db')['user'] == 'default'
+
+    (config_dir / 'db.conf').write_text('Host db\n    User dba\n')
+    assert config.lookup('db')['user'] == 'dba'
+
+    (config_dir / 'db.conf').unlink()
+    assert config.lookup('db')['user'] == 'default'
+
+
+def test_modified_file_is_reloaded(home):
+    config_file = home / 'config'
+    touch_later(config_file, 'User first\n')
+    config = resolver(config_file)
+    assert config.lookup('host')['user'] == 'first'
+
+    touch_later(config_file, 'User second\n')
+    assert config.lookup('host')['user'] == 'second'
+
+
+def test_concurrent_lookups_during_reload(home):
+    config_file = home / 'config'
+    touch_later(config_file, 'User admin\n')
+    config = resolver(config_file)
+    errors = []
+
+    def lookup():
+        try:
+            for index in range(200):
+                assert config.lookup(f'host{index}')['user'] == 'admin'
+                if index % 20 == 0:
+                    config.invalidate()
+        except Exception as err:
+            errors.append(err)
+
+    threads = [threading.Thread(target=lookup) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+
+
+def test_default_paths_follow_the_working_directory(tmp_path, monkeypatch):
+    monkeypatch.setenv('HOME', str(tmp_path))
+    for name in ('a', 'b'):
+        (tmp_path / name).mkdir()
+        (tmp_path / name / 'setting.cfg').write_text(f'User user-{name}\n')
+
+    monkeypatch.chdir(tmp_path / 'a')
+    resolver = SSHConfigResolver(check_interval=0)
+    monkeypatch.chdir(tmp_path / 'b')
+    assert resolver.lookup('host')['user'] == 'user-b'
+    monkeypatch.chdir(tmp_path / 'a')
+    assert resolver.lookup('host')['user'] == 'user-a'
+    assert resolver.paths[0] == str(tmp_path / 'a' / 'setting.cfg')
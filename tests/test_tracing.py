@@ -0,0 +1,57 @@
+import pytest
+
+from tracing import Histogram, Span, Tracer
+
+
+def test_histogram_percentiles_within_bucket_growth():
+    histogram = Histogram()
+    for value in range(1, 1001):
+        histogram.add(value / 1000)
+    summary = histogram.summary()
+
+    assert summary['count'] == 1000
+    assert summary['min'] == 0.001 and summary['max'] == 1.0
+    assert summary['mean'] == pytest.approx(0.5005)
+    assert summary['p50'] == pytest.approx(0.5, rel=Histogram.GROWTH - 1)
+    assert summary['p99'] == pytest.approx(0.99, rel=Histogram.GROWTH - 1)
+
+
+def test_empty_histogram():
+    assert Histogram().summary() == {
+        'count': 0, 'mean': 0.0, 'min': 0.0, 'max': 0.0, 'p50': 0.0, 'p95': 0.0, 'p99': 0.0}
+
+
+def test_span_records_error_and_totals():
+    spans = []
+    tracer = Tracer(hooks=[spans.append])
+    with tracer.span('output_transfer', 'host', bytes=10):
+        pass
+    with pytest.raises(ValueError):
+        with tracer.span('output_transfer', 'host', bytes=5):
+            raise ValueError
+
+    summary = tracer.summary()['output_transfer']
+    assert summary['count'] == 2
+    assert summary['bytes'] == 15
+    assert summary['errors'] == 1
+    assert spans[1].attributes['error'] == 'ValueError'
+
+
+def test_failing_hook_does_not_break_recording():
+    def hook(span):
+        raise RuntimeError
+
+    tracer = Tracer(hooks=[hook])
+    tracer.record(Span('run_cmd', 'host', 0, 0.1, {}))
+
+    assert tracer.summary()['run_cmd']['count'] == 1
+
+
+def test_remote_client_phases(client, remote_session):
+    client.tracer = tracer = Tracer()
+    client.run_cmd(remote_session, ['echo ok'])
+    list(client.stream_cmd(remote_session, 'echo ok'))
+
+    phases = tracer.summary()
+    assert {'run_cmd', 'channel_open', 'remote_exec', 'output_transfer'} <= set(phases)
+    assert phases['output_transfer']['bytes'] == 3
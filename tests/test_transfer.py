@@ -0,0 +1,108 @@
+import gzip
+import os
+import zlib
+
+import pytest
+
+from transfer import FileTransfer
+
+
+@pytest.fixture
+def payload(tmp_path):
+    path = tmp_path / 'payload.bin'
+    path.write_bytes(os.urandom(300000) + b'text ' * 100000)
+    return path
+
+
+@pytest.mark.parametrize('compress', [False, True])
+def test_put_then_get(client, remote_session, tmp_path, payload, compress):
+    remote_path = str(tmp_path / 'remote.bin')
+    local_path = str(tmp_path / 'local.bin')
+
+    result = client.put(remote_session, str(payload), remote_path, compress=compress)
+    assert not result.failed
+    assert result.bytes_transferred == payload.stat().st_size
+    assert open(remote_path, 'rb').read() == payload.read_bytes()
+
+    result = client.get(remote_session, remote_path, local_path, compress=compress)
+    assert not result.failed
+    assert result.bytes_transferred == payload.stat().st_size
+    assert open(local_path, 'rb').read() == payload.read_bytes()
+    assert not os.path.exists(local_path + '.gz.part')
+
+
+@pytest.mark.parametrize('compress', [False, True])
+def test_resume_get(remote_session, tmp_path, payload, compress):
+    local_path = tmp_path / 'local.bin'
+    local_path.write_bytes(payload.read_bytes()[:123457])
+
+    transferred = FileTransfer(remote_session).get(
+        str(payload), str(local_path), resume=True, compress=compress)
+
+    assert transferred == payload.stat().st_size - 123457
+    assert local_path.read_bytes() == payload.read_bytes()
+
+
+def test_resume_put(remote_session, tmp_path, payload):
+    remote_path = tmp_path / 'remote.bin'
+    remote_path.write_bytes(payload.read_bytes()[:99999])
+
+    transferred = FileTransfer(remote_session).put(str(payload), str(remote_path), resume=True)
+
+    assert transferred == payload.stat().st_size - 99999
+    assert remote_path.read_bytes() == payload.read_bytes()
+
+
+@pytest.mark.parametrize('compress', [False, True])
+def test_get_missing_file_fails(client, remote_session, tmp_path, compress):
+    local_path = tmp_path / 'local.bin'
+    result = client.get(remote_session, str(tmp_path / 'missing'), str(local_path),
+                        compress=compress)
+
+    assert result.failed
+    assert 'missing' in result.error
+    assert not local_path.exists()
+    assert not os.path.exists(f'{local_path}.gz.part')
+
+
+def test_get_missing_file_keeps_resumed_file(client, remote_session, tmp_path):
+    local_path = tmp_path / 'local.bin'
+    local_path.write_bytes(b'partial')
+    result = client.get(remote_session, str(tmp_path / 'missing'), str(local_path),
+                        compress=True, resume=True)
+
+    assert result.failed
+    assert local_path.read_bytes() == b'partial'
+
+
+def test_get_corrupt_compressed_stream_fails(client, remote_session, tmp_path, monkeypatch):
+    def corrupt(*args):
+        raise zlib.error('invalid stored block lengths')
+
+    monkeypatch.setattr(FileTransfer, '_decompress', corrupt)
+    remote_path = tmp_path / 'remote.bin'
+    remote_path.write_bytes(b'data')
+
+    result = client.get(remote_session, str(remote_path), str(tmp_path / 'local.bin'),
+                        compress=True)
+
+    assert result.failed
+    assert 'corrupt' in result.error
+
+
+def test_decompress_truncated_stream_raises(tmp_path):
+    spool_path = tmp_path / 'spool.gz'
+    spool_path.write_bytes(gzip.compress(os.urandom(100000))[:50000])
+
+    with pytest.raises(zlib.error):
+        FileTransfer(None, chunk_size=4096)._decompress(
+            str(spool_path), str(tmp_path / 'local.bin'), 0)
+
+
+def test_get_many(client, jump_session, tmp_path, payload):
+    hosts = ['127.0.0.1', '127.0.0.2']
+    results = list(client.get_many(jump_session, hosts, str(payload), str(tmp_path / 'out')))
+
+    assert not [result for result in results if result.failed]
+    for host in hosts:
+        assert (tmp_path / 'out' / host / 'payload.bin').read_bytes() == payload.read_bytes()
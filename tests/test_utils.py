@@ -0,0 +1,162 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from utils import LazyModule, TextFormatter, Validator, ValueIndex, lazy_import
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def colors():
+    enabled = TextFormatter.enabled
+    TextFormatter.set_color(True)
+    yield
+    TextFormatter.set_color(enabled)
+
+
+def test_format(colors):
+    assert TextFormatter.format('x', 'red') == '\033[91mx\033[0m'
+    assert TextFormatter.format('x', 'bold+red') == '\033[1m\033[91mx\033[0m'
+    assert TextFormatter.format('x', 'bold + red') == '\033[1m\033[91mx\033[0m'
+    assert TextFormatter.format('x', 'unknown') == 'x'
+
+
+def test_format_disabled(colors):
+    TextFormatter.set_color(False)
+
+    assert TextFormatter.format('x', 'bold+red') == 'x'
+    assert TextFormatter.format_many([('a', 'red'), 'b'], sep=' ') == 'a b'
+    assert TextFormatter.template('{cmd:4}{message}', cmd='bold') == '{cmd:4}{message}'
+
+
+def test_color_detection(monkeypatch):
+    enabled = TextFormatter.enabled
+    monkeypatch.setenv('NO_COLOR', '1')
+    try:
+        TextFormatter.set_color()
+        assert TextFormatter.enabled is False
+    finally:
+        TextFormatter.set_color(enabled)
+
+
+def test_format_many(colors):
+    assert TextFormatter.format_many(['a', ('b', 'green')], sep='-') \
+        == 'a-\033[92mb\033[0m'
+
+
+def test_template(colors):
+    line = TextFormatter.template('{cmd:4}{message} {cmd}', cmd='bold')
+
+    assert line.format(cmd='q', message='Quit') \
+        == '\033[1mq   \033[0mQuit \033[1mq\033[0m'
+    assert TextFormatter.template('{cmd}', cmd='unknown') == '{cmd}'
+
+
+@pytest.mark.parametrize('datatype, values, valid', [
+    ('integer', ['1', '-2', 'x', '1.5'], [1, 1, 0, 0]),
+    ('positive_integer', ['1', '-2', '0'], [1, 0, 0]),
+    ('float', ['1.5', 'nan?', '2'], [1, 0, 1]),
+    ('ipv4', ['10.0.0.1', '256.0.0.1', '::1', '10.0.0.2'], [1, 0, 0, 1]),
+    ('ipv6', ['::1', '10.0.0.1', 'fe80::1'], [1, 0, 1]),
+    ('ip', ['::1', '10.0.0.1', 'host'], [1, 1, 0]),
+])
+def test_validate_many_matches_validate(datatype, values, valid):
+    result = Validator.validate_many(values, datatype)
+
+    assert list(result.valid) == valid
+    for index, value in enumerate(values):
+        if valid[index]:
+            Validator.validate(value, datatype)
+        else:
+            assert value in result.errors[index]
+            with pytest.raises(ValueError):
+                Validator.validate(value, datatype)
+
+
+def test_validate_many_input_with_braces():
+    valid_values = ['{a}', 'b}', '{0}']
+    result = Validator.validate_many(['{a}', '{x}', '{0}'], 'input',
+                                     valid_values=valid_values)
+
+    assert list(result.valid) == [1, 0, 1]
+    assert result.errors == {
+        1: f"The value '{{x}}' is not valid. Valid values are {valid_values}."}
+
+
+def test_validate_many_index_of_valid_values():
+    index = ValueIndex(f'site-{number}' for number in range(1000))
+    result = Validator.validate_many(['site-1', 'site-1000'], 'input', valid_values=index)
+
+    assert list(result.valid) == [1, 0]
+
+
+def test_validate_many_numpy_addresses():
+    np = pytest.importorskip('numpy')
+    result = Validator.validate_many(['10.0.0.1', 'bad', '::1'], 'ip', numpy=True)
+
+    assert result.valid.tolist() == [True, False, True]
+    high, low = result.addresses
+    assert high.tolist() == [0, 0, 0]
+    assert low.tolist() == [0xffff0a000001, 0, 1]
+    assert high.dtype == np.uint64
+
+
+def test_validate_many_unknown_datatype():
+    with pytest.raises(ValueError):
+        Validator.validate_many(['x'], 'mac')
+
+
+def test_value_index_complete():
+    index = ValueIndex(['ab', 'abc', 'abd', 'b', 'ab'])
+
+    assert len(index) == 4
+    assert index.complete('ab') == ['ab', 'abc', 'abd']
+    assert index.complete('ab', limit=2) == ['ab', 'abc']
+    assert index.complete('ab', limit=0) == []
+    assert index.complete('abz') == []
+    assert index.complete('') == ['ab', 'abc', 'abd', 'b']
+    assert index.suggest('abx') == ['ab', 'abc', 'abd']
+    assert index.suggest('zz') == []
+
+
+def test_value_index_complete_large_index():
+    index = ValueIndex(f'host-{number:06d}' for number in range(200000))
+
+    assert index.complete('host-0001', limit=3) == [
+        'host-000100', 'host-000101', 'host-000102']
+    assert 'host-199999' in index
+
+
+def test_lazy_import():
+    module = lazy_import('json.decoder')
+
+    assert isinstance(module, LazyModule)
+    assert repr(module) == "<LazyModule 'json.decoder'>"
+    import json.decoder
+    assert module.JSONDecoder is json.decoder.JSONDecoder
+    assert 'JSONDecoder' in vars(module)
+    with pytest.raises(AttributeError):
+        module.missing
+
+
+def test_lazy_import_missing_module():
+    module = lazy_import('no_such_module_xyz')
+
+    with pytest.raises(ModuleNotFoundError):
+        module.attribute
+
+
+def test_import_defers_heavy_modules(tmp_path):
+    code = ('import sys; sys.path.insert(0, sys.argv[1]); '
+            'import remoteclient, sessionpool, transfer, cmdstream, cmdcache, '
+            'sshconfig, jumpbalancer, hostkeys, inventory, delta, ipsechealth, cli; '
+            'loaded = [name for name in ("paramiko", "jumpssh", "loguru", "numpy") '
+            'if name in sys.modules]; '
+            'assert not loaded, loaded')
+    subprocess.run([sys.executable, '-c', code, ROOT], check=True, cwd=tmp_path)
+
+    # The log files are only created once something is logged
+    assert not (tmp_path / 'logs').exists()
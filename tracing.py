@@ -0,0 +1,178 @@
+"""Timing spans of the RemoteClient phases with pluggable exporters and an
+in-memory histogram summary.
+"""
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, NamedTuple, Union
+
+from logger import logger
+
+
+class Span(NamedTuple):
+    """Span `namedtuple` class of a timed phase
+
+    :param name: a `str` phase name, e.g. `jump_handshake`, `remote_handshake`,
+        `channel_open`, `remote_exec`, `output_transfer` or `run_cmd`
+    :param host: a `str` host the phase ran against
+    :param start_time: wall clock start time in nanoseconds since the epoch
+    :param duration: duration in seconds
+    :param attributes: a `dict` of attributes such as `bytes`, `exit_code`,
+        `retries` or `error`
+    """
+    name: str
+    host: str
+    start_time: int
+    duration: float
+    attributes: dict
+
+
+class Histogram:
+    """Bounded-memory latency histogram with logarithmic buckets
+
+    Buckets grow by 10% so percentiles are accurate within 10%.
+    """
+
+    GROWTH = 1.1
+    MIN_VALUE = 1e-6
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+        self._buckets = {}
+
+    def add(self, value: float):
+        """Record a value in seconds"""
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        bucket = int(math.log(max(value, self.MIN_VALUE) / self.MIN_VALUE, self.GROWTH))
+        self._buckets[bucket] = self._buckets.get(bucket, 0) + 1
+
+    def percentile(self, percent: float) -> float:
+        """Get the approximate value below which `percent`% of values fall"""
+        if not self.count:
+            return 0.0
+        rank = percent / 100 * self.count
+        seen = 0
+        for bucket in sorted(self._buckets):
+            seen += self._buckets[bucket]
+            if seen >= rank:
+                return min(self.max, self.MIN_VALUE * self.GROWTH ** (bucket + 1))
+        return self.max
+
+    def summary(self) -> dict:
+        """Get count, mean, min, max and p50/p95/p99 in seconds"""
+        return {
+            'count': self.count,
+            'mean': self.total / self.count if self.count else 0.0,
+            'min': self.min if self.count else 0.0,
+            'max': self.max,
+            'p50': self.percentile(50),
+            'p95': self.percentile(95),
+            'p99': self.percentile(99),
+            }
+
+
+class Tracer:
+    """Record timing spans, export them to hooks and aggregate histograms
+
+    :param hooks: a `list` of callables called with each finished `Span`,
+        e.g. an `OpenTelemetryExporter`
+
+    :Example:
+
+        tracer = Tracer(hooks=[print])
+        ssh_client = RemoteClient(tracer=tracer)
+        ...
+        tracer.dump()
+    """
+
+    def __init__(self, hooks: Union[list, None]=None):
+        self.hooks = list(hooks) if hooks else []
+        self.histograms = {}
+        self.totals = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name: str, host: str, **attributes) -> Iterator[dict]:
+        """Time the enclosed block as a span
+
+        :param name: a `str` phase name
+        :param host: a `str` host
+        :param **attributes: initial span attributes
+        :return: a context manager yielding the mutable attribute `dict`
+        """
+        start_time = time.time_ns()
+        start = time.perf_counter()
+        try:
+            yield attributes
+        except BaseException as err:
+            attributes.setdefault('error', type(err).__name__)
+            raise
+        finally:
+            self.record(Span(name, host, start_time,
+                             time.perf_counter() - start, attributes))
+
+    def record(self, span: Span):
+        """Aggregate a finished span and pass it to the hooks"""
+        with self._lock:
+            histogram = self.histograms.get(span.name)
+            if histogram is None:
+                histogram = self.histograms[span.name] = Histogram()
+            histogram.add(span.duration)
+            totals = self.totals.setdefault(span.name, {})
+            for key in ('bytes', 'retries'):
+                if key in span.attributes:
+                    totals[key] = totals.get(key, 0) + span.attributes[key]
+            if 'error' in span.attributes:
+                totals['errors'] = totals.get('errors', 0) + 1
+
+        for hook in self.hooks:
+            try:
+                hook(span)
+            except Exception as err:
+                logger.error(f'Tracing hook {hook} failed: {err}')
+
+    def summary(self) -> dict:
+        """Get the histogram summary and totals of each phase"""
+        with self._lock:
+            return {name: {**histogram.summary(), **self.totals.get(name, {})}
+                    for name, histogram in self.histograms.items()}
+
+    def dump(self):
+        """Log the summary of each phase"""
+        for name, summary in self.summary().items():
+            logger.info(
+                f"{name}: count={summary['count']} mean={summary['mean']:.4f}s "
+                f"p50={summary['p50']:.4f}s p95={summary['p95']:.4f}s "
+                f"p99={summary['p99']:.4f}s max={summary['max']:.4f}s"
+                + ''.join(f' {key}={summary[key]}' for key in ('bytes', 'retries', 'errors')
+                          if key in summary))
+
+
+class OpenTelemetryExporter:
+    """Tracer hook exporting spans to OpenTelemetry
+
+    Requires the `opentelemetry-api` package.
+
+    :param tracer_name: a `str` OpenTelemetry instrumentation name
+    """
+
+    def __init__(self, tracer_name: str='pyutils.remoteclient'):
+        from opentelemetry import trace
+
+        self._tracer = trace.get_tracer(tracer_name)
+
+    def __call__(self, span: Span):
+        attributes = {'net.peer.name': span.host}
+        attributes.update({key: value for key, value in span.attributes.items()
+                           if isinstance(value, (str, bool, int, float))})
+        otel_span = self._tracer.start_span(
+            span.name, start_time=span.start_time, attributes=attributes)
+        otel_span.end(end_time=span.start_time + int(span.duration * 1e9))
+
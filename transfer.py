@@ -0,0 +1,273 @@
+"""File transfer over SFTP through a jump server session, with parallel
+pipelined chunks, resume and on-the-fly compression.
+"""
+from __future__ import annotations
+
+import errno
+import os
+import shlex
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple, TYPE_CHECKING, Union
+
+from utils import lazy_import
+
+if TYPE_CHECKING:
+    from jumpssh import SSHSession
+
+exception = lazy_import('jumpssh.exception')
+
+
+class TransferResult(NamedTuple):
+    """TransferResult `namedtuple` class
+
+    :param host: a `str` host the file was transferred to/from
+    :param local_path: a `str` local file path
+    :param remote_path: a `str` remote file path
+    :param bytes_transferred: number of file bytes transferred
+    :param error: a `str` error if the transfer failed, otherwise `None`
+    """
+    host: str
+    local_path: str
+    remote_path: str
+    bytes_transferred: int = 0
+    error: Union[str, None] = None
+
+    @property
+    def failed(self) -> bool:
+        """`True` if the transfer failed"""
+        return self.error is not None
+
+
+class FileTransfer:
+    """Transfer files to/from the host of a `SSHSession`
+
+    :param ssh_session: a `SSHSession`, a remote session is tunneled through
+        its jump server
+    :param streams: number of SFTP channels moving chunks in parallel
+    :param chunk_size: number of bytes per read/write request
+    """
+
+    def __init__(self, ssh_session: SSHSession, streams: int=4,
+                 chunk_size: int=32768):
+        self.ssh_session = ssh_session
+        self.streams = max(1, streams)
+        self.chunk_size = chunk_size
+
+    def put(self, local_path: str, remote_path: str, resume=False,
+            compress=False) -> int:
+        """Upload a local file
+
+        :param local_path: a `str` local file path
+        :param remote_path: a `str` remote file path
+        :param resume: if `True`, append to an existing remote file from its
+            current size. Resumable transfers use a single stream so that an
+            interrupted transfer always leaves a contiguous prefix.
+        :param compress: if `True`, gzip the file on the fly and decompress it
+            on the remote host, the remote host must have `gzip`
+        :return: number of file bytes transferred
+        """
+        size = os.path.getsize(local_path)
+        offset = self._remote_size(remote_path, missing_ok=True) if resume else 0
+        if offset > size:
+            offset = 0
+
+        if compress:
+            return self._put_compressed(local_path, remote_path, offset)
+
+        sftp = self.ssh_session.get_sftp_client()
+        try:
+            if offset == 0:
+                sftp.open(remote_path, 'w').close()
+        finally:
+            sftp.close()
+
+        streams = 1 if resume else self.streams
+        self._run_ranges(self._put_range, local_path, remote_path,
+                         offset, size, streams)
+        return size - offset
+
+    def get(self, remote_path: str, local_path: str, resume=False,
+            compress=False) -> int:
+        """Download a remote file
+
+        :param remote_path: a `str` remote file path
+        :param local_path: a `str` local file path
+        :param resume: if `True`, append to an existing local file from its
+            current size, using a single stream
+        :param compress: if `True`, gzip the file on the fly on the remote
+            host and decompress it locally, the remote host must have `gzip`
+        :raise FileNotFoundError: if the remote file does not exist
+        :return: number of file bytes transferred
+        """
+        offset = 0
+        if resume and os.path.isfile(local_path):
+            offset = os.path.getsize(local_path)
+
+        if compress:
+            return self._get_compressed(remote_path, local_path, offset)
+
+        size = self._remote_size(remote_path)
+        if offset > size:
+            offset = 0
+        with open(local_path, 'r+b' if offset else 'wb') as local_file:
+            local_file.truncate(size if not resume else offset)
+
+        streams = 1 if resume else self.streams
+        self._run_ranges(self._get_range, local_path, remote_path,
+                         offset, size, streams)
+        return size - offset
+
+    def _run_ranges(self, func, local_path: str, remote_path: str,
+                    start: int, end: int, streams: int):
+        """Split [start, end) in `streams` ranges transferred in parallel"""
+        if start >= end:
+            return
+        step = -(-(end - start) // streams)
+        ranges = [(lo, min(lo + step, end)) for lo in range(start, end, step)]
+        if len(ranges) == 1:
+            func(local_path, remote_path, *ranges[0])
+            return
+        with ThreadPoolExecutor(max_workers=len(ranges)) as executor:
+            futures = [executor.submit(func, local_path, remote_path, lo, hi)
+                       for lo, hi in ranges]
+            for future in futures:
+                future.result()
+
+    def _put_range(self, local_path: str, remote_path: str, lo: int, hi: int):
+        """Upload the bytes [lo, hi) on a dedicated SFTP channel"""
+        sftp = self.ssh_session.get_sftp_client()
+        try:
+            with open(local_path, 'rb') as local_file, \
+                    sftp.open(remote_path, 'r+') as remote_file:
+                # Do not wait for each write acknowledgement
+                remote_file.set_pipelined(True)
+                local_file.seek(lo)
+                remote_file.seek(lo)
+                while lo < hi:
+                    data = local_file.read(min(self.chunk_size, hi - lo))
+                    if not data:
+                        break
+                    remote_file.write(data)
+                    lo += len(data)
+        finally:
+            sftp.close()
+
+    def _get_range(self, local_path: str, remote_path: str, lo: int, hi: int):
+        """Download the bytes [lo, hi) on a dedicated SFTP channel"""
+        sftp = self.ssh_session.get_sftp_client()
+        try:
+            with sftp.open(remote_path, 'r') as remote_file, \
+                    open(local_path, 'r+b') as local_file:
+                local_file.seek(lo)
+                chunks = [(offset, min(self.chunk_size, hi - offset))
+                          for offset in range(lo, hi, self.chunk_size)]
+                # readv pipelines all read requests of the range
+                for data in remote_file.readv(chunks):
+                    local_file.write(data)
+        finally:
+            sftp.close()
+
+    def _put_compressed(self, local_path: str, remote_path: str,
+                        offset: int) -> int:
+        """Upload a gzip stream decompressed by the remote host"""
+        self.ssh_session.open()
+        redirect = '>>' if offset else '>'
+        channel = self.ssh_session.ssh_transport.open_session()
+        try:
+            channel.exec_command(f'gzip -dc {redirect} {shlex.quote(remote_path)}')
+            compressor = zlib.compressobj(wbits=31)
+            with open(local_path, 'rb') as local_file:
+                local_file.seek(offset)
+                sent = 0
+                while data := local_file.read(self.chunk_size):
+                    channel.sendall(compressor.compress(data))
+                    sent += len(data)
+            channel.sendall(compressor.flush())
+            channel.shutdown_write()
+            exit_code = channel.recv_exit_status()
+        finally:
+            channel.close()
+
+        if exit_code != 0:
+            raise exception.SSHException(
+                f"Compressed upload to '{remote_path}' exited with status {exit_code}")
+        return sent
+
+    def _get_compressed(self, remote_path: str, local_path: str,
+                        offset: int) -> int:
+        """Download a gzip stream produced by the remote host
+
+        The stream is spooled next to the local file and only decompressed
+        once the remote command succeeded, so a failed download does not
+        write its error output into the local file.
+        """
+        path = shlex.quote(remote_path)
+        cmd = (f'test -r {path} || {{ echo Cannot read {path} >&2; exit 1; }}; '
+               + (f'tail -c +{offset + 1} {path} | gzip -c' if offset else f'gzip -c < {path}'))
+        spool_path = f'{local_path}.gz.part'
+        try:
+            self.ssh_session.open()
+            channel = self.ssh_session.ssh_transport.open_session()
+            try:
+                channel.exec_command(cmd)
+                with open(spool_path, 'wb') as spool:
+                    while data := channel.recv(self.chunk_size):
+                        spool.write(data)
+                exit_code = channel.recv_exit_status()
+                error = b''
+                while data := channel.recv_stderr(self.chunk_size):
+                    error += data
+            finally:
+                channel.close()
+
+            if exit_code != 0:
+                raise exception.SSHException(
+                    f"Compressed download of '{remote_path}' exited with status "
+                    f"{exit_code}: {error.decode(errors='replace').strip()}")
+            try:
+                return self._decompress(spool_path, local_path, offset)
+            except zlib.error as err:
+                raise exception.SSHException(
+                    f"Compressed download of '{remote_path}' is corrupt: {err}") from err
+        finally:
+            if os.path.exists(spool_path):
+                os.remove(spool_path)
+
+    def _decompress(self, spool_path: str, local_path: str, offset: int) -> int:
+        """Decompress a gzip file into the local file, `chunk_size` bytes at
+        a time
+
+        :raise zlib.error: if the gzip stream is corrupt or truncated
+        :return: number of decompressed bytes written
+        """
+        decompressor = zlib.decompressobj(wbits=31)
+        written = 0
+        with open(spool_path, 'rb') as spool, \
+                open(local_path, 'ab' if offset else 'wb') as local_file:
+            while data := spool.read(self.chunk_size):
+                while data:
+                    written += local_file.write(decompressor.decompress(data, self.chunk_size))
+                    data = decompressor.unconsumed_tail
+            written += local_file.write(decompressor.flush())
+        if not decompressor.eof:
+            raise zlib.error('truncated gzip stream')
+        return written
+
+    def _remote_size(self, remote_path: str, missing_ok=False) -> int:
+        """Get the size of a remote file
+
+        :param missing_ok: if `True`, return `0` for a missing file
+        :raise FileNotFoundError: if the remote file does not exist
+        """
+        sftp = self.ssh_session.get_sftp_client()
+        try:
+            return sftp.stat(remote_path).st_size
+        except FileNotFoundError:
+            if missing_ok:
+                return 0
+            raise FileNotFoundError(
+                errno.ENOENT, f'No such remote file on {self.ssh_session.host}',
+                remote_path) from None
+        finally:
+            sftp.close()
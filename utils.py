@@ -1,9 +1,49 @@
 """Utilities modules to store other functions and classes."""
+import importlib
+import os
+import re
+import socket
+import sys
+from bisect import bisect_left
+from functools import lru_cache
 from ipaddress import ip_address, IPv4Address, IPv6Address
+from typing import Iterable, NamedTuple, Union
+
+
+def _color_enabled() -> bool:
+    """Detect whether escape codes should be emitted
+
+    Colors are disabled when `NO_COLOR` is set or stdout is not a TTY.
+    """
+    if os.environ.get('NO_COLOR'):
+        return False
+    isatty = getattr(sys.stdout, 'isatty', None)
+    return bool(isatty and isatty())
 
 
 class TextFormatter:
-    """Text formatter module used to format text."""
+    """Text formatter module used to format text.
+
+    Styles can be combined with `+`, e.g. `'bold+red'`. When colors are
+    disabled (`NO_COLOR` set or stdout not a TTY), text is returned untouched.
+    """
+
+    STYLES = {
+        'purple': '\033[95m',
+        'cyan': '\033[96m',
+        'darkcyan': '\033[36m',
+        'blue': '\033[94m',
+        'green': '\033[92m',
+        'yellow': '\033[93m',
+        'red': '\033[91m',
+        'bold': '\033[1m',
+        'underline': '\033[4m',
+        'end': '\033[0m'
+        }
+    END = '\033[0m'
+    enabled = _color_enabled()
+    # style -> escape codes prefix, '' for unknown styles
+    _prefixes = dict(STYLES)
 
     @staticmethod
     def format(text, color):
@@ -12,23 +52,150 @@ class TextFormatter:
         *color*, a ``str` color value. The available text formats:
             - red, blue, green, yellow, purple, cyan, darkcyan
             - bold, underline
+            - combined formats, e.g. bold+red
+        """
+        if not TextFormatter.enabled:
+            return text
+        prefix = TextFormatter._prefixes.get(color)
+        if prefix is None:
+            prefix = TextFormatter._compile(color)
+        if not prefix:
+            return text
+        return f"{prefix}{text}{TextFormatter.END}"
+
+    @staticmethod
+    def format_many(parts: Iterable, sep: str='') -> str:
+        """Format and join many texts into one string
+
+        :param parts: an iterable of `str` texts or (text, color) `tuple`
+        :param sep: a `str` separator
+        :return: the joined `str`
+        """
+        return sep.join(
+            part if isinstance(part, str) else TextFormatter.format(*part)
+            for part in parts)
+
+    @staticmethod
+    def template(fmt: str, **styles) -> str:
+        """Get a `str.format` template with styled fields, compiled once
+
+        :param fmt: a `str.format` template
+        :param **styles: the color of each field name
+        :return: the `str` template with escape codes around the styled fields
+
+        :Example:
+
+            line = TextFormatter.template('{cmd:4}{message}', cmd='bold')
+            line.format(cmd='q', message='Quit')
+        """
+        return _compile_template(fmt, tuple(sorted(styles.items())),
+                                 TextFormatter.enabled)
+
+    @staticmethod
+    def set_color(enabled: Union[bool, None]=None):
+        """Force colors on/off, or detect them again with `None`"""
+        TextFormatter.enabled = _color_enabled() if enabled is None else enabled
+
+    @staticmethod
+    def _compile(color: str) -> str:
+        """Compile and cache the escape codes of a combined style"""
+        prefix = ''.join(TextFormatter.STYLES.get(style.strip(), '')
+                         for style in str(color).split('+'))
+        TextFormatter._prefixes[color] = prefix
+        return prefix
+
+
+@lru_cache(maxsize=256)
+def _compile_template(fmt: str, styles: tuple, enabled: bool) -> str:
+    """Wrap the styled fields of a `str.format` template with escape codes"""
+    if not enabled:
+        return fmt
+    for name, color in styles:
+        prefix = TextFormatter._prefixes.get(color)
+        if prefix is None:
+            prefix = TextFormatter._compile(color)
+        if prefix:
+            fmt = re.sub(r'\{' + re.escape(name) + r'(?:[!:][^{}]*)?\}',
+                         lambda match: f'{prefix}{match.group(0)}{TextFormatter.END}',
+                         fmt)
+    return fmt
+
+
+class ValueIndex:
+    """Precompiled index of valid values
+
+    Membership is a hash lookup and prefix lookups are binary searches of a
+    sorted copy, so both stay fast with 100k+ values.
+
+    :param values: an iterable of `str` valid values
+    """
+
+    def __init__(self, values: Iterable):
+        self._values = tuple(dict.fromkeys(values))
+        self._set = frozenset(self._values)
+        self._sorted = sorted(self._set)
+
+    def __contains__(self, value) -> bool:
+        return value in self._set
+
+    def __iter__(self):
+        return iter(self._values)
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def __repr__(self) -> str:
+        if len(self._values) <= 20:
+            return repr(list(self._values))
+        shown = ', '.join(repr(value) for value in self._values[:20])
+        return f'[{shown}, ... ({len(self._values)} values)]'
+
+    def complete(self, prefix: str, limit: int=10) -> list:
+        """Get the values starting with `prefix`, e.g. for tab-completion
+
+        :param prefix: a `str` prefix
+        :param limit: maximum number of values returned
+        :return: a sorted `list` of `str` values
+        """
+        matches = []
+        start = bisect_left(self._sorted, prefix)
+        for index in range(start, min(len(self._sorted), start + limit)):
+            value = self._sorted[index]
+            if not value.startswith(prefix):
+                break
+            matches.append(value)
+        return matches
+
+    def suggest(self, value: str, limit: int=5) -> list:
+        """Get the values sharing the longest prefix with `value`
+
+        :param value: a `str` invalid value
+        :param limit: maximum number of suggestions
+        :return: a sorted `list` of `str` suggestions, empty if none
         """
-        colors = [
-            {'purple': '\033[95m'},
-            {'cyan': '\033[96m'},
-            {'darkcyan': '\033[36m'},
-            {'blue': '\033[94m'},
-            {'green': '\033[92m'},
-            {'yellow': '\033[93m'},
-            {'red': '\033[91m'},
-            {'bold': '\033[1m'},
-            {'underline': '\033[4m'},
-            {'end': '\033[0m'}
-            ]
-        for color_dict in colors:
-            if color_dict.get(color):
-                return f"{color_dict[color]}{text}{colors[-1]['end']}"
-        return text
+        value = value.strip()
+        for length in range(len(value), 0, -1):
+            matches = self.complete(value[:length], limit)
+            if matches:
+                return matches
+        return []
+
+
+class ValidationResult(NamedTuple):
+    """ValidationResult `namedtuple` class returned by `Validator.validate_many`
+
+    :param valid: a `bytearray` mask with `1` for each valid value, or a NumPy
+        `bool` array with `numpy=True`
+    :param errors: a `dict` of error messages keyed by the invalid value index
+    :param addresses: with `numpy=True`, the parsed addresses of the valid
+        values (`0` for invalid ones):
+            - ipv4: a `uint32` array
+            - ipv6/ip: a (high, low) `tuple` of `uint64` arrays, IPv4
+              addresses are IPv4-mapped (::ffff:a.b.c.d) with `ip`
+    """
+    valid: Union[bytearray, object]
+    errors: dict
+    addresses: Union[object, tuple, None] = None
 
 
 class Validator:
@@ -65,6 +232,71 @@ class Validator:
         except ValueError as err:
             raise ValueError(err) from err
 
+    @staticmethod
+    def validate_many(values: Iterable, datatype: str, numpy=False,
+                      **kwargs) -> ValidationResult:
+        """Validate many values without raising an exception per value
+
+        :param values: an iterable of `str` values
+        :param datatype: a data type supported by `validate`
+        :param numpy: if `True`, return NumPy arrays and the parsed addresses
+            of 'ip', 'ipv4' and 'ipv6' values. Requires `numpy`.
+        :param valid_values: a `list` of valid values used with 'input' datatype
+        :raise ValueError: if `datatype` is not supported
+        :return: a `ValidationResult`
+        :rtype: `ValidationResult`
+        """
+        match datatype:
+            case 'number' | 'integer' | 'positive_integer' | 'negative_integer' | 'float':
+                parse = lambda x: _parse_number(x, datatype)
+                message = lambda x: f"'{x}' is not a valid {datatype}."
+            case 'ip':
+                parse = _parse_ip
+                message = lambda x: f"'{x}' does not appear to be a valid IPv4/IPv6 address."
+            case 'ipv4':
+                parse = _parse_ipv4
+                message = lambda x: f"'{x}' does not appear to be a valid IPv4 address."
+            case 'ipv6':
+                parse = _parse_ipv6
+                message = lambda x: f"'{x}' does not appear to be a valid IPv6 address."
+            case 'input':
+                valid_values = kwargs['valid_values']
+                valid_set = valid_values if isinstance(
+                    valid_values, ValueIndex) else frozenset(valid_values)
+                parse = lambda x: True if x.strip() in valid_set else None
+                message = lambda x: (f"The value '{x}' is not valid. "
+                                     f'Valid values are {valid_values}.')
+            case _:
+                raise ValueError(f"Invalid data type '{datatype}'")
+
+        valid = bytearray()
+        errors = {}
+        parsed = []
+        for index, value in enumerate(values):
+            result = parse(value)
+            if numpy:
+                parsed.append(result)
+            if result is None:
+                valid.append(0)
+                errors[index] = message(value)
+            else:
+                valid.append(1)
+
+        if not numpy:
+            return ValidationResult(valid=valid, errors=errors)
+
+        import numpy as np
+
+        addresses = None
+        if datatype == 'ipv4':
+            addresses = np.array([x or 0 for x in parsed], dtype=np.uint32)
+        elif datatype in ('ip', 'ipv6'):
+            ints = [x or 0 for x in parsed]
+            addresses = (np.array([x >> 64 for x in ints], dtype=np.uint64),
+                         np.array([x & 0xffffffffffffffff for x in ints], dtype=np.uint64))
+        return ValidationResult(valid=np.frombuffer(bytes(valid), dtype=np.bool_),
+                                errors=errors, addresses=addresses)
+
 
 def is_ip_addr(ip_addr: str, addr_type: str='ip') -> bool:
     """Validate IPv4 address
@@ -173,17 +405,126 @@ def is_positive_int(x: str) -> bool:
         pass
     raise ValueError(f"'{x}' is not a valid positive integer.")
 
-def is_valid_value(x: str, valid_values: list) -> bool:
+def is_valid_value(x: str, valid_values: Union[list, ValueIndex]) -> bool:
     """Validate a value against a defined valid values
 
     :param x: a `str` value to be validated against a defined valid values
-    :param valid_values: a `list` of valid values
+    :param valid_values: a `list` or a `ValueIndex` of valid values. With a
+        `ValueIndex` the lookup is O(1) and the error suggests close values.
     :raise ValueError: if a value is not valid
     :return: `True` bool value if the x value is valid
     """
     if x.strip() in valid_values:
         return True
+    if isinstance(valid_values, ValueIndex):
+        suggestions = valid_values.suggest(x)
+        if suggestions:
+            raise ValueError(
+                    f"The value '{x}' is not valid. "
+                    f'Did you mean {suggestions}?'
+                    )
     raise ValueError(
             f"The value '{x}' is not valid. "
             f'Valid values are {valid_values}.'
             )
+
+_OCTET = r'(?:25[0-5]|2[0-4]\d|1\d\d|[1-9]?\d)'
+_IPV4_PATTERN = re.compile(rf'{_OCTET}\.{_OCTET}\.{_OCTET}\.{_OCTET}', re.ASCII)
+
+def _parse_ipv4(ip_addr: str) -> Union[int, None]:
+    """Parse a dotted-quad IPv4 address without raising
+
+    Same rules as `ipaddress.IPv4Address`: 4 decimal octets of 0-255 without
+    leading zeros. The strict pattern is checked first, so the address can be
+    converted by the C `inet_aton`.
+
+    :return: the `int` address or `None` if it is not a valid IPv4 address
+    """
+    if _IPV4_PATTERN.fullmatch(ip_addr) is None:
+        return None
+    return int.from_bytes(socket.inet_aton(ip_addr), 'big')
+
+def _parse_ipv6(ip_addr: str) -> Union[int, None]:
+    """Parse an IPv6 address without raising
+
+    :return: the `int` address or `None` if it is not a valid IPv6 address
+    """
+    if ':' not in ip_addr:
+        return None
+    try:
+        return int(IPv6Address(ip_addr))
+    except ValueError:
+        return None
+
+def _parse_ip(ip_addr: str) -> Union[int, None]:
+    """Parse an IPv4 or IPv6 address without raising
+
+    :return: the `int` IPv6 address, IPv4-mapped (::ffff:a.b.c.d) for an IPv4
+        address, or `None` if it is not a valid IP address
+    """
+    if ':' in ip_addr:
+        return _parse_ipv6(ip_addr)
+    address = _parse_ipv4(ip_addr)
+    return None if address is None else 0xffff00000000 | address
+
+def _parse_number(number: str, num_type: str) -> Union[int, float, None]:
+    """Parse a number matched with `num_type` without raising
+
+    Same rules as `is_number`.
+
+    :return: the `int`/`float` number or `None` if it is not valid
+    """
+    if num_type in ('number', 'float'):
+        try:
+            return float(number)
+        except ValueError:
+            return None
+
+    if number.isdigit() and number.isascii():
+        value = int(number)
+    else:
+        try:
+            value = int(number)
+        except ValueError:
+            return None
+    match num_type:
+        case 'positive_integer':
+            return value if value > 0 else None
+        case 'negative_integer':
+            return value if value < 0 else None
+    return value
+
+
+class LazyModule:
+    """Module proxy importing the module on first attribute access
+
+    :param name: a `str` absolute module name, e.g. `jumpssh.exception`
+    """
+
+    def __init__(self, name: str):
+        self.__name = name
+
+    def __getattr__(self, attr: str):
+        module = importlib.import_module(self.__name)
+        # Later lookups of the same attribute skip __getattr__
+        value = getattr(module, attr)
+        setattr(self, attr, value)
+        return value
+
+    def __repr__(self):
+        return f'<LazyModule {self.__name!r}>'
+
+
+def lazy_import(name: str) -> LazyModule:
+    """Defer the import of a heavy module until it is used
+
+    :Example:
+
+        paramiko = lazy_import('paramiko')
+        # paramiko is imported here
+        ssh_config = paramiko.SSHConfig()
+
+    :param name: a `str` absolute module name
+    :return: a `LazyModule` proxy of the module
+    """
+    return LazyModule(name)